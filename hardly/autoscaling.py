@@ -0,0 +1,165 @@
+# Copyright Contributors to the Packit project.
+# SPDX-License-Identifier: MIT
+
+"""
+Export the signal for autoscaling the heavy and light workers (e.g. by KEDA):
+queue depth, age of the oldest message and estimated work in the backlog.
+
+    python -m hardly.autoscaling --port 8000
+"""
+
+import argparse
+import json
+import logging
+import time
+from typing import Dict, Iterator, List, Optional
+
+from prometheus_client import REGISTRY, start_http_server
+from prometheus_client.core import GaugeMetricFamily
+
+from hardly.cache import get_redis
+from hardly.constants import HEAVY_TASKS_QUEUE, LIGHT_TASKS_QUEUE
+from hardly.handlers.abstract import TaskName
+from hardly.scheduling import LOWEST_PRIORITY
+
+logger = logging.getLogger(__name__)
+
+HEAVY_TASKS = (TaskName.dist_git_pr, TaskName.update_source_git)
+# Celery's task_routes
+TASK_ROUTES = {
+    task_name.value: {
+        "queue": HEAVY_TASKS_QUEUE if task_name in HEAVY_TASKS else LIGHT_TASKS_QUEUE
+    }
+    for task_name in TaskName
+}
+# Message header with the time the task has been published
+PUBLISHED_HEADER = "hardly_published"
+# Task name -> exponentially weighted moving average of its duration
+DURATIONS_KEY = "hardly:task-durations"
+# Weight of the latest duration in the average
+DURATION_WEIGHT = 0.1
+# Duration assumed for tasks which haven't run yet
+DEFAULT_DURATION = 10.0
+# At most this many messages of a queue are read to estimate the work in it
+SAMPLE_SIZE = 1000
+
+_started: Dict[str, float] = {}
+
+
+def record_published(headers: Optional[dict] = None, **_):
+    """before_task_publish signal handler"""
+    if headers is not None:
+        headers[PUBLISHED_HEADER] = time.time()
+
+
+def record_started(task_id: str, **_):
+    """task_prerun signal handler"""
+    _started[task_id] = time.monotonic()
+
+
+def record_finished(task_id: str, task, **_):
+    """task_postrun signal handler: update the average duration of the task."""
+    if (started := _started.pop(task_id, None)) is None:
+        return
+    duration = time.monotonic() - started
+    average = get_redis().hget(DURATIONS_KEY, task.name)
+    if average is not None:
+        duration = DURATION_WEIGHT * duration + (1 - DURATION_WEIGHT) * float(average)
+    get_redis().hset(DURATIONS_KEY, task.name, duration)
+
+
+def get_queue_keys(queue: str) -> List[str]:
+    """Redis lists of the queue, one per priority (see hardly.tasks)."""
+    return [queue] + [
+        f"{queue}:{priority}" for priority in range(1, LOWEST_PRIORITY + 1)
+    ]
+
+
+class QueueStats:
+    """Depth, oldest message and estimated work of a queue."""
+
+    def __init__(self, queue: str):
+        self.queue = queue
+        self.depth = 0
+        self.oldest_message_age = 0.0
+        self.work_seconds = 0.0
+
+    def collect(self, durations: Dict[str, float]) -> "QueueStats":
+        redis = get_redis()
+        now = time.time()
+        sampled: List[dict] = []
+        for key in get_queue_keys(self.queue):
+            if not (depth := redis.llen(key)):
+                continue
+            self.depth += depth
+            # messages are pushed to the left and taken from the right
+            oldest = self.get_headers(redis.lindex(key, -1))
+            if published := oldest.get(PUBLISHED_HEADER):
+                self.oldest_message_age = max(self.oldest_message_age, now - published)
+            sampled += [
+                self.get_headers(message)
+                for message in redis.lrange(key, -min(depth, SAMPLE_SIZE), -1)
+            ]
+        if sampled:
+            sampled_work = sum(
+                durations.get(headers.get("task"), DEFAULT_DURATION)
+                for headers in sampled
+            )
+            self.work_seconds = sampled_work * self.depth / len(sampled)
+        return self
+
+    @staticmethod
+    def get_headers(message: Optional[str]) -> dict:
+        try:
+            return json.loads(message).get("headers") or {}
+        except (TypeError, ValueError):
+            return {}
+
+
+class BacklogCollector:
+    """Prometheus collector reading the queues on each scrape."""
+
+    def __init__(self, queues: List[str]):
+        self.queues = queues
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        durations = {
+            task: float(duration)
+            for task, duration in get_redis().hgetall(DURATIONS_KEY).items()
+        }
+        depth = GaugeMetricFamily(
+            "hardly_queue_depth", "Messages waiting in the queue", labels=["queue"]
+        )
+        age = GaugeMetricFamily(
+            "hardly_queue_oldest_message_age_seconds",
+            "Time the oldest message has been waiting in the queue",
+            labels=["queue"],
+        )
+        work = GaugeMetricFamily(
+            "hardly_queue_backlog_work_seconds",
+            "Estimated time needed to process all messages in the queue",
+            labels=["queue"],
+        )
+        for queue in self.queues:
+            stats = QueueStats(queue).collect(durations)
+            depth.add_metric([queue], stats.depth)
+            age.add_metric([queue], stats.oldest_message_age)
+            work.add_metric([queue], stats.work_seconds)
+        yield from (depth, age, work)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    REGISTRY.register(BacklogCollector([HEAVY_TASKS_QUEUE, LIGHT_TASKS_QUEUE]))
+    start_http_server(args.port)
+    logger.info(f"Serving autoscaling metrics on port {args.port}.")
+    while True:
+        time.sleep(3600)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,445 @@
+# Copyright Contributors to the Packit project.
+# SPDX-License-Identifier: MIT
+
+"""
+Re-sync dist-git CI results to source-git MRs for events which were missed,
+e.g. because the worker was down or fedora-messaging lagged.
+
+    python -m hardly.backfill --state-file /tmp/backfill.json
+"""
+
+import argparse
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set, Type
+
+from hardly.cache import FanoutDistGitMRs, get_redis
+from hardly.handlers.distgit import (
+    SyncFromDistGitPRHandler,
+    SyncFromGitlabMRHandler,
+    SyncFromPagurePRHandler,
+)
+from hardly.ratelimit import install_rate_limiters
+from ogr.abstract import PRStatus, PullRequest
+from ogr.services.gitlab import GitlabProject
+from ogr.services.pagure import PagureProject
+from packit_service.config import ServiceConfig
+from packit_service.models import (
+    PullRequestModel,
+    SourceGitPRDistGitPRModel,
+    sa_session_transaction,
+)
+from redis.exceptions import LockError
+from redis.lock import Lock
+
+logger = logging.getLogger(__name__)
+
+# Which handler knows how to read the CI results from the dist-git forge
+STATUS_SYNC_HANDLERS = {
+    GitlabProject: SyncFromGitlabMRHandler,
+    PagureProject: SyncFromPagurePRHandler,
+}
+# Forget the reconciliation state of shards which are not reconciled anymore,
+# e.g. after RECONCILE_SHARDS has been changed
+RECONCILE_STATE_TTL = 7 * 24 * 3600
+# Reconciliation of a shard holding its lock longer is assumed to have crashed
+RECONCILE_LOCK_TIMEOUT = 3600
+
+
+class SourceGitDistGitPair(NamedTuple):
+    """Plain copy of SourceGitPRDistGitPRModel usable outside of the db session."""
+
+    id: int
+    source_git_project_url: str
+    source_git_pr_id: int
+    dist_git_project_url: str
+    dist_git_pr_id: int
+
+    @classmethod
+    def from_model(cls, model: SourceGitPRDistGitPRModel) -> "SourceGitDistGitPair":
+        return cls(
+            id=model.id,
+            source_git_project_url=model.source_git_pull_request.project.project_url,
+            source_git_pr_id=model.source_git_pull_request.pr_id,
+            dist_git_project_url=model.dist_git_pull_request.project.project_url,
+            dist_git_pr_id=model.dist_git_pull_request.pr_id,
+        )
+
+
+def iter_pair_pages(
+    after_id: int = 0, page_size: int = 100, shard: int = 0, shards: int = 1
+) -> Iterator[List[SourceGitDistGitPair]]:
+    """Iterate over pages of source-git/dist-git PR pairs, ordered by their ID.
+
+    Args:
+        after_id: Start with the first pair with a higher ID than this.
+        page_size: How many pairs are loaded from the database at once.
+        shard: Only pairs whose dist-git project ID modulo `shards` is this,
+            i.e. all pairs of one dist-git repository are in one shard.
+        shards: Number of shards.
+    """
+    while True:
+        with sa_session_transaction() as session:
+            query = session.query(SourceGitPRDistGitPRModel).filter(
+                SourceGitPRDistGitPRModel.id > after_id
+            )
+            if shards > 1:
+                query = query.join(
+                    SourceGitPRDistGitPRModel.dist_git_pull_request
+                ).filter(PullRequestModel.project_id % shards == shard)
+            pairs = [
+                SourceGitDistGitPair.from_model(model)
+                for model in query.order_by(SourceGitPRDistGitPRModel.id).limit(
+                    page_size
+                )
+            ]
+        if not pairs:
+            return
+        yield pairs
+        after_id = pairs[-1].id
+
+
+def iter_pairs(
+    after_id: int = 0, page_size: int = 100
+) -> Iterator[SourceGitDistGitPair]:
+    """Iterate over all source-git/dist-git PR pairs, ordered by their ID."""
+    for page in iter_pair_pages(after_id=after_id, page_size=page_size):
+        yield from page
+
+
+def reconcile_pair(
+    service_config: ServiceConfig,
+    pair: SourceGitDistGitPair,
+    dry_run: bool = False,
+    only_changed: bool = False,
+) -> Optional[int]:
+    """Report the current dist-git CI results in the source-git MR.
+
+    Results of the dist-git PRs created for the other fan-out branches
+    of the source-git MR are reported too.
+
+    Args:
+        service_config: Service configuration used to get the projects.
+        pair: Source-git and dist-git PRs to reconcile.
+        dry_run: Only log what would be reported.
+        only_changed: Report only statuses which differ from what has been
+            reported in the source-git MR already.
+
+    Returns:
+        Number of statuses reported, None for closed/merged dist-git PRs.
+    """
+    dist_git_project = service_config.get_project(url=pair.dist_git_project_url)
+    handler: Optional[Type[SyncFromDistGitPRHandler]] = next(
+        (
+            handler
+            for project_class, handler in STATUS_SYNC_HANDLERS.items()
+            if isinstance(dist_git_project, project_class)
+        ),
+        None,
+    )
+    if not handler:
+        logger.debug(f"Don't know how to get CI results from {dist_git_project}")
+        return 0
+
+    dist_git_pr = dist_git_project.get_pr(pair.dist_git_pr_id)
+    if dist_git_pr.status != PRStatus.open:
+        return None
+
+    # branch -> dist-git PR, the one stored in the db has no branch in its check names
+    dist_git_prs: Dict[Optional[str], PullRequest] = {None: dist_git_pr}
+    fanout_mrs = FanoutDistGitMRs(pair.source_git_project_url, pair.source_git_pr_id)
+    for branch, fanout_mr in fanout_mrs.get_all().items():
+        fanout_pr = service_config.get_project(
+            url=fanout_mr.dist_git_project_url
+        ).get_pr(fanout_mr.dist_git_pr_id)
+        if fanout_pr.status == PRStatus.open:
+            dist_git_prs[branch] = fanout_pr
+
+    reported = 0
+    for branch, pr in dist_git_prs.items():
+        if not (statuses := handler.get_dist_git_statuses(pr)):
+            continue
+        logger.info(f"Reconciling {statuses} from {pr.url}")
+        if dry_run:
+            reported += len(statuses)
+            continue
+        reported += handler.report_statuses(
+            service_config=service_config,
+            source_git_project_url=pair.source_git_project_url,
+            source_git_pr_id=pair.source_git_pr_id,
+            statuses=statuses,
+            only_changed=only_changed,
+            branch=branch,
+        )
+    return reported
+
+
+class ShardState:
+    """What the reconciliation of one shard has learned, kept in Redis.
+
+    Pairs whose dist-git PR has been closed/merged are skipped in the next runs:
+    all pairs up to the watermark are inactive, the inactive pairs above it
+    are in a sorted set scored by their ID, pruned as the watermark moves on.
+    """
+
+    def __init__(self, shard: int, shards: int):
+        prefix = f"hardly:reconcile:{shards}:{shard}"
+        self.watermark_key = f"{prefix}:watermark"
+        self.inactive_key = f"{prefix}:inactive"
+        self.lock_key = f"{prefix}:lock"
+
+    def get_watermark(self) -> int:
+        return int(get_redis().get(self.watermark_key) or 0)
+
+    def get_inactive(self, pairs: List[SourceGitDistGitPair]) -> Set[int]:
+        """IDs of the inactive pairs among the pairs ordered by their ID."""
+        return {
+            int(pair_id)
+            for pair_id in get_redis().zrangebyscore(
+                self.inactive_key, pairs[0].id, pairs[-1].id
+            )
+        }
+
+    def add_inactive(self, pair_id: int):
+        get_redis().zadd(self.inactive_key, {str(pair_id): pair_id})
+
+    def set_watermark(self, watermark: int):
+        pipe = get_redis().pipeline()
+        pipe.set(self.watermark_key, watermark, ex=RECONCILE_STATE_TTL)
+        pipe.zremrangebyscore(self.inactive_key, "-inf", watermark)
+        pipe.expire(self.inactive_key, RECONCILE_STATE_TTL)
+        pipe.execute()
+
+    def lock(self) -> Lock:
+        return get_redis().lock(self.lock_key, timeout=RECONCILE_LOCK_TIMEOUT)
+
+
+def reconcile_shard(service_config: ServiceConfig, shard: int, shards: int) -> int:
+    """Reconcile the open PR pairs of one shard, reporting only what changed.
+
+    Skipped if the previous run of the shard is still running.
+
+    Returns:
+        Number of statuses reported.
+    """
+    state = ShardState(shard, shards)
+    lock = state.lock()
+    if not lock.acquire(blocking=False):
+        logger.info(f"Shard {shard}/{shards} is still being reconciled, skipping.")
+        return 0
+    try:
+        watermark = state.get_watermark()
+        active_seen = False
+        reported = 0
+        for page in iter_pair_pages(after_id=watermark, shard=shard, shards=shards):
+            inactive = state.get_inactive(page)
+            for pair in page:
+                if pair.id not in inactive:
+                    try:
+                        count = reconcile_pair(service_config, pair, only_changed=True)
+                    except Exception as ex:
+                        logger.warning(f"Failed to reconcile {pair}: {ex}")
+                        count = 0
+                    if count is not None:
+                        reported += count
+                        active_seen = True
+                        continue
+                    state.add_inactive(pair.id)
+                if not active_seen:
+                    watermark = pair.id
+        state.set_watermark(watermark)
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            logger.warning(f"Lock of shard {shard}/{shards} expired while running.")
+    logger.info(f"Shard {shard}/{shards}: {reported} statuses reported.")
+    return reported
+
+
+def get_response_code(ex: Optional[BaseException]) -> Optional[int]:
+    """HTTP status of the failed forge request, possibly wrapped (e.g. by ogr)."""
+    while ex:
+        try:
+            # ogr and python-gitlab exceptions
+            code = getattr(ex, "response_code", None)
+        except NotImplementedError:
+            # ogr's generic APIException
+            code = None
+        # requests.HTTPError
+        code = code or getattr(getattr(ex, "response", None), "status_code", None)
+        if code:
+            return int(code)
+        ex = ex.__cause__
+    return None
+
+
+def is_rate_limited(ex: Exception) -> bool:
+    """Tell if the forge refused a request because of its rate limit."""
+    return get_response_code(ex) == 429
+
+
+@dataclass
+class BackfillProgress:
+    """What has been done so far, saved after each batch to make the run resumable."""
+
+    last_id: int = 0
+    reconciled: int = 0
+    statuses_reported: int = 0
+    failed: List[int] = field(default_factory=list)
+
+    @classmethod
+    def load(cls, path: Optional[Path]) -> "BackfillProgress":
+        if path and path.is_file():
+            return cls(**json.loads(path.read_text()))
+        return cls()
+
+    def save(self, path: Optional[Path]):
+        if not path:
+            return
+        # write the whole file at once, so that an interrupted run can't corrupt it
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(asdict(self)))
+        tmp.replace(path)
+
+
+class Backfill:
+    """Reconcile all source-git/dist-git PR pairs in batches.
+
+    Pairs in a batch are processed concurrently. Batches are spread so that
+    no more than `pairs_per_minute` pairs are processed and when a forge
+    answers with its rate limit, the rate limited pairs are retried after
+    a backoff, at most `max_rate_limited` times.
+
+    Only statuses which haven't been reported in the source-git MR yet
+    are reported, unless `report_all` is set.
+    """
+
+    def __init__(
+        self,
+        service_config: ServiceConfig,
+        state_file: Optional[Path] = None,
+        concurrency: int = 4,
+        batch_size: int = 20,
+        pairs_per_minute: int = 60,
+        max_backoff: int = 600,
+        max_rate_limited: int = 5,
+        dry_run: bool = False,
+        report_all: bool = False,
+    ):
+        self.service_config = service_config
+        self.state_file = state_file
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.pairs_per_minute = pairs_per_minute
+        self.max_backoff = max_backoff
+        self.max_rate_limited = max_rate_limited
+        self.dry_run = dry_run
+        self.report_all = report_all
+        self.progress = BackfillProgress.load(state_file)
+
+    def batches(self) -> Iterator[List[SourceGitDistGitPair]]:
+        batch: List[SourceGitDistGitPair] = []
+        for pair in iter_pairs(after_id=self.progress.last_id):
+            batch.append(pair)
+            if len(batch) == self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def process_batch(self, batch: List[SourceGitDistGitPair]) -> None:
+        backoff = 60
+        pending = batch
+        # pair ID -> how many times it's been rate limited
+        rate_limited: Dict[int, int] = {}
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while pending:
+                futures = {
+                    pair: executor.submit(
+                        reconcile_pair,
+                        self.service_config,
+                        pair,
+                        dry_run=self.dry_run,
+                        only_changed=not self.report_all,
+                    )
+                    for pair in pending
+                }
+                pending = []
+                for pair, future in futures.items():
+                    try:
+                        self.progress.statuses_reported += future.result() or 0
+                        self.progress.reconciled += 1
+                    except Exception as ex:
+                        if is_rate_limited(ex):
+                            rate_limited[pair.id] = rate_limited.get(pair.id, 0) + 1
+                            if rate_limited[pair.id] <= self.max_rate_limited:
+                                pending.append(pair)
+                                continue
+                        logger.error(f"Failed to reconcile {pair}: {ex}")
+                        self.progress.failed.append(pair.id)
+                if pending:
+                    logger.info(
+                        f"Rate limited, retrying {len(pending)} pairs in {backoff}s."
+                    )
+                    time.sleep(backoff)
+                    backoff = min(backoff * 2, self.max_backoff)
+
+    def run(self) -> BackfillProgress:
+        if self.progress.last_id:
+            logger.info(f"Resuming after pair {self.progress.last_id}.")
+        min_batch_duration = 60 * self.batch_size / self.pairs_per_minute
+        for batch in self.batches():
+            started = time.monotonic()
+            self.process_batch(batch)
+            self.progress.last_id = batch[-1].id
+            self.progress.save(self.state_file)
+            logger.info(
+                f"Reconciled {self.progress.reconciled} pairs, "
+                f"{len(self.progress.failed)} failed, last one {self.progress.last_id}."
+            )
+            if (elapsed := time.monotonic() - started) < min_batch_duration:
+                time.sleep(min_batch_duration - elapsed)
+        return self.progress
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument(
+        "--state-file",
+        type=Path,
+        help="Where to save the progress, an interrupted run resumes from it.",
+    )
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--pairs-per-minute", type=int, default=60)
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument(
+        "--report-all",
+        action="store_true",
+        help="Report also the statuses which have already been reported.",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    service_config = ServiceConfig.get_service_config()
+    # share the forges' rate limits with the workers
+    install_rate_limiters(service_config)
+    progress = Backfill(
+        service_config=service_config,
+        state_file=args.state_file,
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+        pairs_per_minute=args.pairs_per_minute,
+        dry_run=args.dry_run,
+        report_all=args.report_all,
+    ).run()
+    logger.info(f"Done: {progress}")
+
+
+if __name__ == "__main__":
+    main()
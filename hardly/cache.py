@@ -0,0 +1,154 @@
+# Copyright Contributors to the Packit project.
+# SPDX-License-Identifier: MIT
+
+import json
+from functools import lru_cache
+from os import getenv
+from typing import Callable, Dict, Iterable, NamedTuple, Optional
+
+from redis import Redis
+
+from hardly.constants import BRANCHES_CACHE_TTL
+
+
+@lru_cache(maxsize=None)
+def get_redis() -> Redis:
+    """Redis client for state shared by all hardly workers.
+
+    It's the same Redis which is used as Celery broker.
+    """
+    return Redis(
+        host=getenv("REDIS_SERVICE_HOST", "redis"),
+        port=int(getenv("REDIS_SERVICE_PORT", "6379")),
+        db=int(getenv("REDIS_SERVICE_DB", "0")),
+        decode_responses=True,
+    )
+
+
+class ReportedStatuses:
+    """What hardly has reported in a source-git MR, check name -> fingerprint.
+
+    Commit statuses can't be read back when the status reporter falls back
+    to commit comments, so we remember them ourselves.
+    """
+
+    # forget MRs which haven't been updated for a month
+    ttl = 30 * 24 * 3600
+
+    def __init__(self, project_url: str, pr_id: int):
+        self.key = f"hardly:reported:{project_url}:{pr_id}"
+
+    def get(self, check_name: str) -> Optional[str]:
+        return get_redis().hget(self.key, check_name)
+
+    def set(self, check_name: str, fingerprint: str):
+        pipe = get_redis().pipeline()
+        pipe.hset(self.key, check_name, fingerprint)
+        pipe.expire(self.key, self.ttl)
+        pipe.execute()
+
+
+class FanoutDistGitMR(NamedTuple):
+    """Dist-git MR created for one of the fan-out branches of a source-git MR."""
+
+    source_git_project_url: str
+    source_git_pr_id: int
+    branch: str
+    dist_git_project_url: str
+    dist_git_pr_id: int
+
+
+class FanoutDistGitMRs:
+    """Dist-git MRs created for the other (fan-out) branches of a source-git MR.
+
+    Only one dist-git MR per source-git MR can be stored in the db,
+    the others are remembered here, so that their CI results are synced too.
+    """
+
+    # forget MRs which haven't been updated for a month
+    ttl = 30 * 24 * 3600
+
+    def __init__(self, source_git_project_url: str, source_git_pr_id: int):
+        self.source_git_project_url = source_git_project_url
+        self.source_git_pr_id = source_git_pr_id
+        self.key = f"hardly:fanout:{source_git_project_url}:{source_git_pr_id}"
+
+    @staticmethod
+    def dist_git_key(dist_git_project_url: str, dist_git_pr_id: int) -> str:
+        return f"hardly:fanout-of:{dist_git_project_url}:{dist_git_pr_id}"
+
+    def add(self, branch: str, dist_git_project_url: str, dist_git_pr_id: int):
+        mr = FanoutDistGitMR(
+            self.source_git_project_url,
+            self.source_git_pr_id,
+            branch,
+            dist_git_project_url,
+            dist_git_pr_id,
+        )
+        dist_git_key = self.dist_git_key(dist_git_project_url, dist_git_pr_id)
+        pipe = get_redis().pipeline()
+        pipe.hset(self.key, branch, json.dumps(mr))
+        pipe.expire(self.key, self.ttl)
+        pipe.set(dist_git_key, json.dumps(mr), ex=self.ttl)
+        pipe.execute()
+
+    def get_all(self) -> Dict[str, FanoutDistGitMR]:
+        """Branch -> the dist-git MR created for it."""
+        pipe = get_redis().pipeline()
+        pipe.hgetall(self.key)
+        pipe.expire(self.key, self.ttl)
+        mrs, _ = pipe.execute()
+        return {branch: FanoutDistGitMR(*json.loads(mr)) for branch, mr in mrs.items()}
+
+    @classmethod
+    def get(
+        cls, dist_git_project_url: str, dist_git_pr_id: int
+    ) -> Optional[FanoutDistGitMR]:
+        """The fan-out dist-git MR, None if it hasn't been created as one."""
+        key = cls.dist_git_key(dist_git_project_url, dist_git_pr_id)
+        pipe = get_redis().pipeline()
+        pipe.get(key)
+        pipe.expire(key, cls.ttl)
+        mr, _ = pipe.execute()
+        return FanoutDistGitMR(*json.loads(mr)) if mr else None
+
+
+class BranchesCache:
+    """Branches of a git project cached for BRANCHES_CACHE_TTL seconds.
+
+    Invalidated whenever a push to the project is received,
+    so that newly created branches are seen right away.
+    """
+
+    # marks a cached (possibly empty) listing, can't be a branch name
+    sentinel = ""
+
+    def __init__(self, project_url: str):
+        self.key = f"hardly:branches:{self.normalize_url(project_url)}"
+
+    @staticmethod
+    def normalize_url(url: str) -> str:
+        url = url.rstrip("/")
+        return url[: -len(".git")] if url.endswith(".git") else url
+
+    def contains(self, branch: str, get_branches: Callable[[], Iterable[str]]) -> bool:
+        """Tell if the branch exists.
+
+        Args:
+            branch: Name of the branch.
+            get_branches: Lists the branches if they are not cached.
+        """
+        if not BRANCHES_CACHE_TTL:
+            return branch in get_branches()
+
+        redis = get_redis()
+        if not redis.exists(self.key):
+            pipe = redis.pipeline()
+            pipe.delete(self.key)
+            pipe.sadd(self.key, self.sentinel, *get_branches())
+            pipe.expire(self.key, BRANCHES_CACHE_TTL)
+            pipe.execute()
+        return bool(redis.sismember(self.key, branch))
+
+    def invalidate(self):
+        get_redis().delete(self.key)
@@ -0,0 +1,216 @@
+# Copyright Contributors to the Packit project.
+# SPDX-License-Identifier: MIT
+
+import json
+import os
+import re
+import shutil
+import time
+from dataclasses import asdict, dataclass, field
+from hashlib import sha256
+from logging import getLogger
+from pathlib import Path
+from typing import List, Optional
+
+from git import Repo
+from git.exc import GitError
+
+from hardly.constants import CLONE_STRATEGIES, CLONE_STRATEGY_OVERRIDES
+from hardly.monitoring import pushgateway
+
+logger = getLogger(__name__)
+
+
+@dataclass
+class CloneStrategy:
+    """How much of a repository is cloned.
+
+    Attributes:
+        depth: Clone only this many latest commits of the branch (shallow clone).
+        filter: Partial clone filter, e.g. "blob:none" fetches file contents
+            only when they are needed.
+        sparse_paths: Check out only these directories, e.g. [".distro/"].
+    """
+
+    depth: Optional[int] = None
+    filter: Optional[str] = None
+    sparse_paths: List[str] = field(default_factory=list)
+
+    @classmethod
+    def get(cls, kind: str, url: str) -> "CloneStrategy":
+        """Strategy for cloning a repository.
+
+        Args:
+            kind: "source-git" or "dist-git", see CLONE_STRATEGIES.
+            url: URL of the repository, matched against CLONE_STRATEGY_OVERRIDES.
+        """
+        options = dict(CLONE_STRATEGIES.get(kind, {}))
+        for pattern, override in CLONE_STRATEGY_OVERRIDES.items():
+            if re.fullmatch(pattern, url):
+                options.update(override.get(kind, {}))
+        return cls(**options)
+
+    def get_clone_args(self, branch: Optional[str] = None) -> List[str]:
+        args = []
+        if branch:
+            args += ["--branch", branch]
+        if self.depth:
+            # --depth implies --single-branch
+            args += ["--depth", str(self.depth)]
+        if self.filter:
+            args += ["--filter", self.filter]
+        if self.sparse_paths:
+            args += ["--sparse"]
+        return args
+
+
+def get_disk_usage(path: Path) -> int:
+    """Size of all files in the directory tree in bytes."""
+    return sum(
+        (Path(root) / name).lstat().st_size
+        for root, _, files in os.walk(path)
+        for name in files
+    )
+
+
+class Checkout:
+    """Clone of a repository made according to its CloneStrategy.
+
+    A checkout left in the path by a previous job (see hardly.workdir.WorkDirPool)
+    is reset and reused instead of being cloned again.
+    Clone time, reuse and disk usage are reported as metrics.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        url: str,
+        path: Path,
+        branch: Optional[str] = None,
+        strategy: Optional[CloneStrategy] = None,
+    ):
+        self.kind = kind
+        self.url = url
+        self.path = Path(path)
+        self.branch = branch
+        self.strategy = strategy or CloneStrategy.get(kind, url)
+        self.clone_duration: Optional[float] = None
+        self.reused = False
+
+    @classmethod
+    def in_work_dir(
+        cls, work_dir: Path, kind: str, url: str, branch: Optional[str] = None
+    ) -> "Checkout":
+        """Checkout in a directory of the work directory named after the repository
+        (and branch), so that a work directory can hold more warm repositories.
+        """
+        digest = sha256(f"{url}#{branch or ''}".encode()).hexdigest()[:16]
+        return cls(
+            kind=kind, url=url, path=work_dir / f"{kind}-{digest}", branch=branch
+        )
+
+    @property
+    def name(self) -> str:
+        """Human-readable name, e.g. for reports."""
+        return f"{self.kind}-{self.branch}" if self.branch else self.kind
+
+    @property
+    def strategy_file(self) -> Path:
+        return self.path / ".git" / "hardly-strategy.json"
+
+    def clone(self) -> Repo:
+        repo = self.reset() if (self.path / ".git").is_dir() else None
+        self.reused = repo is not None
+        pushgateway.work_dir_checkouts.labels(
+            kind=self.kind, reused=str(self.reused).lower()
+        ).inc()
+        if not repo:
+            if self.path.exists():
+                shutil.rmtree(self.path)
+            repo = self._clone()
+        # the least recently used checkouts are removed first
+        os.utime(self.path)
+        return repo
+
+    def _clone(self) -> Repo:
+        logger.info(f"Cloning {self.url} into {self.path} using {self.strategy}")
+        started = time.monotonic()
+        repo = Repo.clone_from(
+            self.url,
+            self.path,
+            multi_options=self.strategy.get_clone_args(self.branch),
+        )
+        if self.strategy.sparse_paths:
+            repo.git.sparse_checkout("set", *self.strategy.sparse_paths)
+        self.strategy_file.write_text(json.dumps(asdict(self.strategy)))
+        self.clone_duration = time.monotonic() - started
+        pushgateway.clone_duration.labels(kind=self.kind).observe(self.clone_duration)
+        return repo
+
+    def reset(self) -> Optional[Repo]:
+        """Bring the checkout left by a previous job to the state of a fresh clone.
+
+        Only the new objects are fetched, everything the previous job left behind
+        (local branches, remotes, worktrees, changed and untracked files) is dropped.
+
+        Returns:
+            The repository, None if it has been cloned from elsewhere
+            or in a different way and can't be reused.
+        """
+        started = time.monotonic()
+        try:
+            repo = Repo(self.path)
+            if (
+                "origin" not in repo.remotes
+                or repo.remotes.origin.url != self.url
+                or not self.strategy_file.is_file()
+                or json.loads(self.strategy_file.read_text()) != asdict(self.strategy)
+            ):
+                logger.info(f"Can't reuse {self.path} for {self.url}.")
+                return None
+
+            shutil.rmtree(self.path / ".git" / "hardly-worktrees", ignore_errors=True)
+            repo.git.worktree("prune")
+            for remote in repo.remotes:
+                if remote.name != "origin":
+                    repo.delete_remote(remote)
+            fetch_args = (
+                ["--depth", str(self.strategy.depth)] if self.strategy.depth else []
+            )
+            repo.git.fetch("--prune", "--force", *fetch_args, "origin")
+            branch = (
+                self.branch
+                or repo.git.symbolic_ref("--short", "refs/remotes/origin/HEAD").split(
+                    "/", 1
+                )[1]
+            )
+            repo.git.checkout("--force", "-B", branch, f"origin/{branch}")
+            for head in repo.heads:
+                if head.name != branch:
+                    repo.delete_head(head, force=True)
+            repo.git.clean("-ffdx")
+        except (GitError, ValueError) as ex:
+            logger.warning(f"Failed to reset {self.path}: {ex}")
+            return None
+
+        reset_duration = time.monotonic() - started
+        logger.info(f"Reset {self.path} in {reset_duration:.1f}s")
+        pushgateway.work_dir_reset_duration.labels(kind=self.kind).observe(
+            reset_duration
+        )
+        return repo
+
+    def report(self) -> dict:
+        """Report the clone time and current disk usage of the checkout."""
+        disk_usage = get_disk_usage(self.path) if self.path.is_dir() else 0
+        pushgateway.checkout_disk_usage.labels(kind=self.kind).observe(disk_usage)
+        logger.info(
+            f"{self.kind} checkout {self.path}: "
+            + ("reused" if self.reused else f"cloned in {self.clone_duration}s")
+            + f", {disk_usage} bytes on disk"
+        )
+        return {
+            "clone_seconds": self.clone_duration,
+            "reused": self.reused,
+            "disk_bytes": disk_usage,
+        }
@@ -0,0 +1,237 @@
+# Copyright Contributors to the Packit project.
+# SPDX-License-Identifier: MIT
+
+"""
+Circuit breakers of hardly's dependencies, shared by all workers via Redis.
+
+When a dependency (gitlab, pagure, postgresql, git remotes) fails repeatedly,
+its circuit opens and calls of it fail fast with CircuitOpenError.
+Each git remote host has its own circuit, e.g. git:gitlab.com.
+Tasks failing so are deferred until the circuit closes again instead of
+retrying (see HandlerTaskWithRetry). After the reset timeout the circuit is
+half-open: calls are let through, the first failure opens it again,
+the first success closes it.
+"""
+
+import re
+import time
+from enum import IntEnum
+from functools import lru_cache
+from logging import getLogger
+from typing import Callable, Optional
+from urllib.parse import urlparse
+
+from git.exc import GitCommandError
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from requests.exceptions import Timeout
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from hardly.cache import get_redis
+from hardly.constants import (
+    CIRCUIT_BREAKER_RESET_TIMEOUT,
+    CIRCUIT_BREAKER_THRESHOLD,
+    CIRCUIT_BREAKER_WINDOW,
+)
+from hardly.monitoring import pushgateway
+
+logger = getLogger(__name__)
+
+# How long (in seconds) is the state read from Redis reused
+STATE_CACHE_TIMEOUT = 1
+# Git failures meaning the remote is unavailable (not e.g. a rejected push)
+GIT_UNAVAILABLE_RE = re.compile(
+    r"Could not resolve host|Connection (timed out|refused|reset)|"
+    r"Failed to connect|early EOF|The requested URL returned error: 5\d\d|"
+    r"RPC failed|Operation timed out|service unavailable",
+    flags=re.IGNORECASE,
+)
+
+
+class CircuitState(IntEnum):
+    closed = 0
+    half_open = 1
+    open = 2
+
+
+class CircuitOpenError(Exception):
+    """A dependency is unavailable, don't call it for `retry_in` seconds."""
+
+    def __init__(self, dependency: str, retry_in: float):
+        super().__init__(f"Circuit of {dependency} is open for {retry_in:.0f}s.")
+        self.dependency = dependency
+        self.retry_in = retry_in
+
+
+def is_unavailable(ex: Optional[BaseException]) -> bool:
+    """Tell if the exception (or the one it's been raised from) means
+    that the HTTP API is unavailable.
+
+    Other failures (e.g. not found) don't count.
+    """
+    while ex:
+        if isinstance(ex, (RequestsConnectionError, Timeout)):
+            return True
+        ex = ex.__cause__ or ex.__context__
+    return False
+
+
+def is_git_unavailable(ex: Optional[BaseException]) -> bool:
+    """Tell if the exception (or the one it's been raised from) means
+    that the git remote is unavailable.
+
+    Other failures (e.g. rejected push, failing forge API calls) don't count.
+    """
+    while ex:
+        if isinstance(ex, GitCommandError) and GIT_UNAVAILABLE_RE.search(
+            str(ex.stderr)
+        ):
+            return True
+        ex = ex.__cause__ or ex.__context__
+    return False
+
+
+# Which failures of a dependency (without the host of git remotes) count,
+# when its breaker is used as a context manager
+FAILURE_CLASSIFIERS = {"git": is_git_unavailable}
+
+
+def find_circuit_open_error(ex: Optional[BaseException]) -> Optional[CircuitOpenError]:
+    """Find CircuitOpenError, possibly wrapped (e.g. by ogr) into another exception."""
+    while ex:
+        if isinstance(ex, CircuitOpenError):
+            return ex
+        ex = ex.__cause__ or ex.__context__
+    return None
+
+
+class CircuitBreaker:
+    """Circuit breaker of one dependency.
+
+    Can be used as a context manager around calls of the dependency,
+    exceptions for which `is_failure` is true are counted as failures.
+    """
+
+    def __init__(
+        self,
+        dependency: str,
+        is_failure: Callable[[Optional[BaseException]], bool] = is_unavailable,
+    ):
+        self.dependency = dependency
+        self.is_failure = is_failure
+        self.open_key = f"hardly:circuit:{dependency}:open"
+        self.half_open_key = f"hardly:circuit:{dependency}:half-open"
+        self.failures_key = f"hardly:circuit:{dependency}:failures"
+        self.state = CircuitState.closed
+        self.retry_in = 0.0
+        self._read_at = 0.0
+
+    def read_state(self) -> CircuitState:
+        if time.monotonic() - self._read_at < STATE_CACHE_TIMEOUT:
+            return self.state
+        pipe = get_redis().pipeline()
+        pipe.pttl(self.open_key)
+        pipe.exists(self.half_open_key)
+        open_ttl, half_open = pipe.execute()
+        if open_ttl > 0:
+            self.state, self.retry_in = CircuitState.open, open_ttl / 1000
+        elif half_open:
+            self.state, self.retry_in = CircuitState.half_open, 0.0
+        else:
+            self.state, self.retry_in = CircuitState.closed, 0.0
+        self._read_at = time.monotonic()
+        pushgateway.circuit_breaker_state.labels(dependency=self.dependency).set(
+            self.state
+        )
+        return self.state
+
+    def check(self):
+        """Raise CircuitOpenError if the circuit is open."""
+        if not CIRCUIT_BREAKER_THRESHOLD:
+            return
+        if self.read_state() == CircuitState.open:
+            pushgateway.circuit_breaker_rejections.labels(
+                dependency=self.dependency
+            ).inc()
+            raise CircuitOpenError(self.dependency, self.retry_in)
+
+    def open(self):
+        logger.warning(
+            f"Opening circuit of {self.dependency} for {CIRCUIT_BREAKER_RESET_TIMEOUT}s."
+        )
+        pipe = get_redis().pipeline()
+        pipe.set(self.open_key, 1, ex=CIRCUIT_BREAKER_RESET_TIMEOUT)
+        pipe.set(self.half_open_key, 1)
+        pipe.delete(self.failures_key)
+        pipe.execute()
+        self._read_at = 0.0
+
+    def record_failure(self):
+        if not CIRCUIT_BREAKER_THRESHOLD:
+            return
+        if self.read_state() == CircuitState.half_open:
+            self.open()
+            return
+        failures = get_redis().incr(self.failures_key)
+        if failures == 1:
+            get_redis().expire(self.failures_key, CIRCUIT_BREAKER_WINDOW)
+        if failures >= CIRCUIT_BREAKER_THRESHOLD:
+            self.open()
+
+    def record_success(self):
+        # cheap when closed, no Redis call
+        if CIRCUIT_BREAKER_THRESHOLD and self.read_state() == CircuitState.half_open:
+            logger.info(f"Closing circuit of {self.dependency}.")
+            get_redis().delete(self.half_open_key)
+            self._read_at = 0.0
+
+    def __enter__(self):
+        self.check()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc is None:
+            self.record_success()
+        elif self.is_failure(exc):
+            self.record_failure()
+        return False
+
+
+@lru_cache(maxsize=None)
+def get_circuit_breaker(dependency: str) -> CircuitBreaker:
+    kind = dependency.split(":", 1)[0]
+    return CircuitBreaker(
+        dependency, is_failure=FAILURE_CLASSIFIERS.get(kind, is_unavailable)
+    )
+
+
+def get_git_host(url: str) -> str:
+    """Host of a git remote URL, also in the scp-like syntax ([user@]host:path)."""
+    if "://" not in url and (m := re.fullmatch(r"(?:[^@/]+@)?([^:/]+):.*", url)):
+        return m[1]
+    return urlparse(url).hostname or url
+
+
+def get_git_circuit_breaker(url: str) -> CircuitBreaker:
+    """Circuit breaker of the host of a git remote, other hosts aren't affected."""
+    return get_circuit_breaker(f"git:{get_git_host(url)}")
+
+
+def install_database_circuit_breaker():
+    """Guard all database queries with the postgresql circuit breaker."""
+    breaker = get_circuit_breaker("postgresql")
+
+    @event.listens_for(Engine, "before_cursor_execute")
+    def check(*_, **__):
+        breaker.check()
+
+    @event.listens_for(Engine, "after_cursor_execute")
+    def succeeded(*_, **__):
+        breaker.record_success()
+
+    @event.listens_for(Engine, "handle_error")
+    def failed(context):
+        # Lost connections and failures to connect (no connection yet),
+        # not e.g. deadlocks or lock timeouts.
+        if context.is_disconnect or context.connection is None:
+            breaker.record_failure()
@@ -0,0 +1,123 @@
+# Copyright Contributors to the Packit project.
+# SPDX-License-Identifier: MIT
+
+import json
+import re
+from logging import getLogger
+from pathlib import Path
+from typing import Dict, Optional
+
+from git import Repo
+from packit.constants import FROM_DIST_GIT_TOKEN
+
+from hardly.cache import get_redis
+
+logger = getLogger(__name__)
+
+
+def get_trailer(message: str, token: str) -> Optional[str]:
+    """Get the commit hash from the last `<token>: <hash>` trailer of a commit message."""
+    matches = re.findall(rf"^{token}: *([0-9a-f]{{40}}) *$", message, re.MULTILINE)
+    return matches[-1] if matches else None
+
+
+class CommitMapping:
+    """Mapping of dist-git commits to the source-git commits they were converted to.
+
+    One mapping is kept per dist-git/source-git branch pair and persisted as JSON,
+    so that each dist-git push converts only commits which haven't been converted yet.
+    If the file is lost, the mapping is rebuilt from the From-dist-git-commit
+    trailers of the source-git commits.
+
+    With `state_key`, the latest dist-git commits and the pending PR are kept
+    in Redis instead, shared by the workers which don't share the file.
+
+    Attributes:
+        commits: Dist-git commit hash -> source-git commit hash.
+        merged_dist_git_commit: Latest dist-git commit whose source-git counterpart
+            is in the source-git branch.
+        last_dist_git_commit: Latest dist-git commit converted,
+            either merged or waiting in the pending PR.
+        scanned_source_git_commit: Source-git commit up to which the history
+            has already been searched for trailers.
+        pending_pr_id: ID of the open source-git PR with converted commits.
+    """
+
+    # Attributes kept in Redis with state_key
+    shared_attributes = (
+        "merged_dist_git_commit",
+        "last_dist_git_commit",
+        "pending_pr_id",
+    )
+
+    def __init__(self, path: Path, state_key: Optional[str] = None):
+        self.path = path
+        self.state_key = state_key
+        data = json.loads(path.read_text()) if path.is_file() else {}
+        if state_key and (shared := get_redis().hgetall(state_key)):
+            data.update({key: value or None for key, value in shared.items()})
+        self.commits: Dict[str, str] = data.get("commits", {})
+        self.merged_dist_git_commit: Optional[str] = data.get("merged_dist_git_commit")
+        self.last_dist_git_commit: Optional[str] = data.get("last_dist_git_commit")
+        self.scanned_source_git_commit: Optional[str] = data.get(
+            "scanned_source_git_commit"
+        )
+        self.pending_pr_id: Optional[int] = (
+            int(data["pending_pr_id"]) if data.get("pending_pr_id") else None
+        )
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(
+            json.dumps(
+                {
+                    "commits": self.commits,
+                    "merged_dist_git_commit": self.merged_dist_git_commit,
+                    "last_dist_git_commit": self.last_dist_git_commit,
+                    "scanned_source_git_commit": self.scanned_source_git_commit,
+                    "pending_pr_id": self.pending_pr_id,
+                }
+            )
+        )
+        tmp.replace(self.path)
+        if self.state_key:
+            get_redis().hset(
+                self.state_key,
+                mapping={
+                    attribute: getattr(self, attribute) or ""
+                    for attribute in self.shared_attributes
+                },
+            )
+
+    def add(self, dist_git_commit: str, source_git_commit: str):
+        self.commits[dist_git_commit] = source_git_commit
+        self.last_dist_git_commit = dist_git_commit
+
+    def add_converted(self, repo: Repo, rev: str):
+        """Add source-git commits in the revision range converted from dist-git."""
+        for commit in repo.iter_commits(rev, reverse=True):
+            if dist_git_commit := get_trailer(commit.message, FROM_DIST_GIT_TOKEN):
+                self.add(dist_git_commit, commit.hexsha)
+
+    def scan_source_git(self, repo: Repo, ref: str):
+        """Learn which dist-git commits have been merged in the source-git branch.
+
+        Only commits added since the last scan are read.
+        """
+        head = repo.commit(ref).hexsha
+        if head == self.scanned_source_git_commit:
+            return
+        rev = ref
+        if self.scanned_source_git_commit and repo.is_ancestor(
+            self.scanned_source_git_commit, head
+        ):
+            rev = f"{self.scanned_source_git_commit}..{head}"
+        for commit in repo.iter_commits(rev, reverse=True):
+            if dist_git_commit := get_trailer(commit.message, FROM_DIST_GIT_TOKEN):
+                self.commits[dist_git_commit] = commit.hexsha
+                self.merged_dist_git_commit = dist_git_commit
+        self.scanned_source_git_commit = head
+        logger.debug(
+            f"Source-git {ref} is in sync with dist-git {self.merged_dist_git_commit}"
+        )
@@ -0,0 +1,110 @@
+# Copyright Contributors to the Packit project.
+# SPDX-License-Identifier: MIT
+
+import json
+from os import getenv
+from pathlib import Path
+
+# How often (in seconds) are the CI results of the open dist-git PRs reconciled
+# with what's been reported in source-git MRs. 0 disables the reconciliation.
+RECONCILE_INTERVAL = int(getenv("RECONCILE_INTERVAL", "0"))
+# Into how many tasks is one reconciliation run split
+RECONCILE_SHARDS = int(getenv("RECONCILE_SHARDS", "4"))
+# With the reconciliation enabled, don't sync intermediate (pending/running)
+# dist-git CI states via events, the reconciler picks them up on its next run.
+RECONCILE_ONLY_INTERMEDIATE_STATES = (
+    getenv("RECONCILE_ONLY_INTERMEDIATE_STATES", "false").lower() == "true"
+)
+
+# Dist-git → source-git sync. A dist-git project URL matching the pattern
+# gets its pushed commits synced to the source-git repository
+# made from the template, e.g.
+#   DIST_GIT_REPO_PATTERN="https://gitlab.com/redhat/centos-stream/rpms/(?P<package>.+)"
+#   SOURCE_GIT_URL_TEMPLATE="https://gitlab.com/redhat/centos-stream/src/{package}"
+DIST_GIT_REPO_PATTERN = getenv("DIST_GIT_REPO_PATTERN", "")
+SOURCE_GIT_URL_TEMPLATE = getenv("SOURCE_GIT_URL_TEMPLATE", "")
+# Persistent data (e.g. warm repositories) kept between the tasks.
+# Don't put it into command_handler_work_dir, which is cleaned after each task.
+HARDLY_CACHE_DIR = Path(getenv("HARDLY_CACHE_DIR", Path.home() / ".cache" / "hardly"))
+# Repositories of UpdateSourceGitHandler, one directory per source-git repository.
+# Those not used for SOURCE_GIT_SYNC_MAX_AGE seconds and the least recently used
+# ones exceeding SOURCE_GIT_SYNC_QUOTA bytes are removed after each task. 0 = no limit.
+SOURCE_GIT_SYNC_DIR = HARDLY_CACHE_DIR / "source-git-sync"
+SOURCE_GIT_SYNC_QUOTA = int(getenv("SOURCE_GIT_SYNC_QUOTA", str(10 * 1024**3)))
+SOURCE_GIT_SYNC_MAX_AGE = int(getenv("SOURCE_GIT_SYNC_MAX_AGE", str(30 * 24 * 3600)))
+
+# Source-git target branch -> dist-git branches to create the MRs against,
+# e.g. '{"c9s": ["c9s", "c10s"]}'. Branches not listed map to themselves.
+# CI results of the MRs for the other branches are reported in the source-git MR
+# with the branch in the check name, e.g. "Dist-git MR CI Pipeline (c10s)".
+DIST_GIT_BRANCHES_FANOUT = json.loads(getenv("DIST_GIT_BRANCHES_FANOUT", "{}"))
+
+# How long (in seconds) are the branches of dist-git projects cached. 0 disables it.
+BRANCHES_CACHE_TTL = int(getenv("BRANCHES_CACHE_TTL", "300"))
+
+# How the repositories are cloned, per kind ("source-git", "dist-git"), e.g.
+# '{"dist-git": {"depth": 1}, "source-git": {"filter": "blob:none"}}'
+# see hardly.checkout.CloneStrategy for the options.
+CLONE_STRATEGIES = json.loads(
+    getenv("CLONE_STRATEGIES", '{"source-git": {"filter": "blob:none"}}')
+)
+# Per-repository overrides, repository URL regex -> strategies as above
+CLONE_STRATEGY_OVERRIDES = json.loads(getenv("CLONE_STRATEGY_OVERRIDES", "{}"))
+
+# Work directories of DistGitMRHandler, see hardly.workdir.WorkDirPool.
+# Like HARDLY_CACHE_DIR, they have to be kept between the tasks.
+WORK_DIR_POOL = Path(getenv("WORK_DIR_POOL", HARDLY_CACHE_DIR / "work-dirs"))
+# Number of slots, one is claimed by each worker process
+WORK_DIR_SLOTS = int(getenv("WORK_DIR_SLOTS", "8"))
+# Disk space (in bytes) the checkouts in a slot can take after a task. 0 = no limit.
+WORK_DIR_SLOT_QUOTA = int(getenv("WORK_DIR_SLOT_QUOTA", str(5 * 1024**3)))
+# Checkouts not used for longer (in seconds) are removed. 0 = kept regardless of age.
+WORK_DIR_MAX_AGE = int(getenv("WORK_DIR_MAX_AGE", str(7 * 24 * 3600)))
+
+# How long (in seconds) is a package config passed to the tasks
+# by reference kept in Redis, see hardly.payload.
+PACKAGE_CONFIG_TTL = int(getenv("PACKAGE_CONFIG_TTL", str(7 * 24 * 3600)))
+
+# How long (in seconds) are the results of the tasks which store them
+# (dist-git MR creation, source-git update) kept in the result backend,
+# never longer than Celery's result_expires (1 day by default)
+RESULT_TTL = int(getenv("RESULT_TTL", str(6 * 3600)))
+
+# Fair share: every FAIR_SHARE_LIMIT tasks enqueued for one repository within
+# FAIR_SHARE_WINDOW seconds lower the priority of its next tasks by one step,
+# by up to FAIR_SHARE_MAX_PENALTY steps. FAIR_SHARE_LIMIT=0 disables it.
+FAIR_SHARE_WINDOW = int(getenv("FAIR_SHARE_WINDOW", "300"))
+FAIR_SHARE_LIMIT = int(getenv("FAIR_SHARE_LIMIT", "20"))
+FAIR_SHARE_MAX_PENALTY = int(getenv("FAIR_SHARE_MAX_PENALTY", "3"))
+
+# Requests per second (rate) and burst size allowed for a forge instance,
+# shared by all workers using the same token, e.g.
+# '{"gitlab.com": {"rate": 5, "burst": 50}}'. Instances not listed aren't limited.
+FORGE_RATE_LIMITS = json.loads(getenv("FORGE_RATE_LIMITS", "{}"))
+# Max. number of keep-alive connections to a forge kept by a worker process
+FORGE_POOL_MAXSIZE = int(getenv("FORGE_POOL_MAXSIZE", "10"))
+
+# Queues of the clone-heavy tasks (dist-git MRs, source-git updates) and of
+# the light ones (status syncs, ...), so that their workers can be scaled apart
+HEAVY_TASKS_QUEUE = getenv("HEAVY_TASKS_QUEUE", "long-running")
+LIGHT_TASKS_QUEUE = getenv("LIGHT_TASKS_QUEUE", "short-running")
+
+# Profiling of handler tasks, see hardly.profiling:
+# fraction of tasks profiled with cProfile (0 = none, 1 = all)
+PROFILE_SAMPLE_RATE = float(getenv("PROFILE_SAMPLE_RATE", "0"))
+# stacks of tasks running longer than this (in seconds) are saved, 0 disables it
+PROFILE_LATENCY_THRESHOLD = float(getenv("PROFILE_LATENCY_THRESHOLD", "0"))
+# how often (in seconds) are the stacks sampled
+PROFILE_SAMPLING_INTERVAL = float(getenv("PROFILE_SAMPLING_INTERVAL", "0.01"))
+PROFILE_DIR = Path(getenv("PROFILE_DIR", HARDLY_CACHE_DIR / "profiles"))
+# only this many latest profiles are kept
+PROFILE_MAX_FILES = int(getenv("PROFILE_MAX_FILES", "200"))
+
+# Circuit breakers of the dependencies (gitlab, pagure, postgresql, git),
+# see hardly.circuit_breaker: so many failures within the window (in seconds)
+# open the circuit for CIRCUIT_BREAKER_RESET_TIMEOUT seconds. 0 disables them.
+CIRCUIT_BREAKER_THRESHOLD = int(getenv("CIRCUIT_BREAKER_THRESHOLD", "5"))
+CIRCUIT_BREAKER_WINDOW = int(getenv("CIRCUIT_BREAKER_WINDOW", "60"))
+CIRCUIT_BREAKER_RESET_TIMEOUT = int(getenv("CIRCUIT_BREAKER_RESET_TIMEOUT", "120"))
+# How many times a task is deferred (open circuit, busy handler) before it fails
+MAX_TASK_DEFERRALS = int(getenv("MAX_TASK_DEFERRALS", "30"))
@@ -5,10 +5,12 @@ from hardly.handlers.distgit import (
     DistGitMRHandler,
     SyncFromGitlabMRHandler,
     SyncFromPagurePRHandler,
+    UpdateSourceGitHandler,
 )
 
 __all__ = [
     DistGitMRHandler.__name__,
     SyncFromGitlabMRHandler.__name__,
     SyncFromPagurePRHandler.__name__,
+    UpdateSourceGitHandler.__name__,
 ]
@@ -2,9 +2,53 @@
 # SPDX-License-Identifier: MIT
 
 from enum import Enum
+from typing import Optional, Tuple
+
+from celery import Signature
+
+from hardly.payload import slim_event, store_package_config
+from packit.config.job_config import JobConfig
+from packit_service.worker.events import Event
+from packit_service.worker.handlers import JobHandler
 
 
 class TaskName(str, Enum):
     dist_git_pr = "task.run_dist_git_pr_handler"
     sync_from_gitlab_mr = "task.run_sync_from_gitlab_mr_handler"
     sync_from_pagure_pr = "task.run_sync_from_pagure_pr_handler"
+    update_source_git = "task.run_update_source_git_handler"
+    reconcile_dist_git_statuses = "task.run_reconcile_dist_git_statuses"
+    reconcile_dist_git_statuses_shard = "task.run_reconcile_dist_git_statuses_shard"
+
+
+class HandlerBusyError(Exception):
+    """The handler can't run now (e.g. another task holds its lock).
+
+    Its task is run again in `retry_in` seconds, without using up its retries.
+    """
+
+    def __init__(self, reason: str, retry_in: float):
+        super().__init__(reason)
+        self.retry_in = retry_in
+
+
+class SlimJobHandler(JobHandler):
+    """Handler whose task gets only the parts of the event it needs.
+
+    Attributes:
+        event_fields: Event fields the handler reads in addition to those
+            read by EventData, see hardly.payload.
+    """
+
+    event_fields: Tuple[str, ...] = ()
+
+    @classmethod
+    def get_signature(cls, event: Event, job: Optional[JobConfig]) -> Signature:
+        signature = super().get_signature(event=event, job=job)
+        signature.kwargs["event"] = slim_event(
+            signature.kwargs["event"], cls.event_fields
+        )
+        signature.kwargs["package_config"] = store_package_config(
+            signature.kwargs["package_config"]
+        )
+        return signature
@@ -1,39 +1,131 @@
 # Copyright Contributors to the Packit project.
 # SPDX-License-Identifier: MIT
 
+import fcntl
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
 from logging import getLogger
-from os import getenv
+from os import getenv, utime
+from pathlib import Path
 from re import fullmatch
-from typing import Optional
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import quote
 
-from hardly.handlers.abstract import TaskName
-from ogr.abstract import PullRequest
+from git import Repo
+from hardly.cache import (
+    BranchesCache,
+    FanoutDistGitMRs,
+    ReportedStatuses,
+    get_redis,
+)
+from hardly.checkout import Checkout, CloneStrategy
+from hardly.circuit_breaker import CircuitOpenError, get_git_circuit_breaker
+from hardly.commit_mapping import CommitMapping, get_trailer
+from hardly.constants import (
+    DIST_GIT_BRANCHES_FANOUT,
+    DIST_GIT_REPO_PATTERN,
+    RECONCILE_INTERVAL,
+    SOURCE_GIT_SYNC_DIR,
+    SOURCE_GIT_SYNC_MAX_AGE,
+    SOURCE_GIT_SYNC_QUOTA,
+    SOURCE_GIT_URL_TEMPLATE,
+)
+from hardly.handlers.abstract import HandlerBusyError, SlimJobHandler, TaskName
+from hardly.monitoring import pushgateway
+from hardly.workdir import evict, work_dir_pool
+from ogr.abstract import PRStatus, PullRequest
 from packit.api import PackitAPI
+from packit.constants import FROM_SOURCE_GIT_TOKEN
 from packit.config.job_config import JobConfig
-from packit.config.package_config import PackageConfig
+from packit.config.package_config import PackageConfig, get_local_package_config
 from packit.local_project import LocalProject
+from packit_service.config import ServiceConfig
 from packit_service.models import PullRequestModel, SourceGitPRDistGitPRModel
-from packit_service.worker.events import MergeRequestGitlabEvent, PipelineGitlabEvent
+from packit_service.worker.events import (
+    MergeRequestGitlabEvent,
+    PipelineGitlabEvent,
+    PushGitlabEvent,
+)
 from packit_service.worker.events.enums import GitlabEventAction
-from packit_service.worker.events.pagure import PullRequestFlagPagureEvent
-from packit_service.worker.handlers import JobHandler
+from packit_service.worker.events.pagure import (
+    PullRequestFlagPagureEvent,
+    PushPagureEvent,
+)
 from packit_service.worker.handlers.abstract import (
     reacts_to,
 )
 from packit_service.worker.reporting import StatusReporter, BaseCommitStatus
 from packit_service.worker.result import TaskResults
+from redis.exceptions import LockError
 
 logger = getLogger(__name__)
 
 
+class DistGitStatus(NamedTuple):
+    """CI status of a dist-git PR as it should be reported in the source-git MR."""
+
+    state: BaseCommitStatus
+    description: str
+    check_name: str
+    url: str
+
+
+# One Bugzilla or Jira reference
+ISSUE_REF = (
+    r"(?:https?://bugzilla\.redhat\.com/(?:(?P<bz_short_url>\d+)"
+    r"|\S*?[?&]id=(?P<bz_url>\d+))(?:#[^\s,]*)?"
+    r"|https?://issues\.redhat\.com/browse/(?P<jira_url>[A-Z][A-Z0-9]+-\d+)"
+    r"|(?P<jira>[A-Z][A-Z0-9]+-\d+)"
+    r"|(?:rh)?bz#(?P<bz>\d+)"
+    r"|(?P<bz_id>\d+))"
+)
+ISSUE_REF_RE = re.compile(ISSUE_REF)
+# Group names can't repeat in one pattern
+ANY_ISSUE_REF = re.sub(r"\(\?P<\w+>", "(?:", ISSUE_REF)
+# Trailer line with one or more references (separated by commas and/or spaces)
+# and possibly an explanation after them, CRLF line endings are kept
+ISSUE_TRAILER_RE = re.compile(
+    r"^(?P<keyword>Bugzilla|Resolves|Related|Jira):[ \t]+"
+    rf"(?P<refs>{ANY_ISSUE_REF}(?:(?:[ \t]*,[ \t]*|[ \t]+){ANY_ISSUE_REF})*)"
+    r"(?P<tail>[ \t]+\S[^\r\n]*)?(?P<cr>\r?)$",
+    flags=re.MULTILINE,
+)
+
+
+def _fix_issue_trailer(match: re.Match) -> str:
+    keyword = "Related" if match["keyword"] == "Related" else "Resolves"
+    lines = []
+    for ref in ISSUE_REF_RE.finditer(match["refs"]):
+        if bz_id := ref["bz_short_url"] or ref["bz_url"] or ref["bz"]:
+            lines.append(f"{keyword}: bz#{bz_id}")
+        elif jira := ref["jira_url"] or ref["jira"]:
+            lines.append(f"{keyword}: {jira}")
+        elif match["keyword"] == "Bugzilla":
+            lines.append(f"{keyword}: bz#{ref['bz_id']}")
+        else:
+            # a bare number is a Bugzilla ID only in the Bugzilla: trailer
+            return match[0]
+    lines[-1] += match["tail"] or ""
+    return f"{match['cr']}\n".join(lines) + match["cr"]
+
+
 def fix_bz_refs(message: str) -> str:
-    """Convert Bugzilla references to the format accepted by BZ checks
+    """Convert Bugzilla and Jira references to the format accepted by BZ checks
 
     From
-        Bugzilla: <bzid or bzlin>
-    to
+        Bugzilla: <bzid or bzlink>
+        Resolves: rhbz#<bzid>, <bzlink>
+        Related: <bzlink> <bzlink>
+        Jira: <jira key or link>
+    to one reference per line
         Resolves: bz#<bzid>
+        Related: bz#<bzid>
+        Resolves: <jira key>
+
+    Trailers with anything else than the references (and an explanation
+    after them) are left as they are.
 
     Args:
         message: Multiline string in which Bugzilla references are converted.
@@ -41,15 +133,23 @@ def fix_bz_refs(message: str) -> str:
     Returns:
         Multiline string with BZ refs in the required format.
     """
-    pattern = r"^Bugzilla: +(https://.+id=)?(\d+)"
-    repl = r"Resolves: bz#\2"
-    return re.sub(pattern, repl, message, flags=re.MULTILINE)
+    return ISSUE_TRAILER_RE.sub(_fix_issue_trailer, message)
 
 
 # @configured_as(job_type=JobType.dist_git_pr)  # Requires a change in packit
 @reacts_to(event=MergeRequestGitlabEvent)
-class DistGitMRHandler(JobHandler):
+class DistGitMRHandler(SlimJobHandler):
     task_name = TaskName.dist_git_pr
+    event_fields = (
+        "action",
+        "title",
+        "description",
+        "url",
+        "source_project_url",
+        "target_repo_namespace",
+        "target_repo_name",
+        "target_repo_branch",
+    )
 
     def __init__(
         self,
@@ -72,12 +172,15 @@ class DistGitMRHandler(JobHandler):
             f"{event['target_repo_namespace']}/{event['target_repo_name']}"
         )
         self.target_repo_branch = event["target_repo_branch"]
+        # the dist-git branch self.packit is set up for
+        self.dist_git_branch = self.target_repo_branch
 
         # lazy
         self._source_git_pr_model = None
         self._dist_git_pr_model = None
         self._dist_git_pr = None
         self._packit = None
+        self.checkouts: List[Checkout] = []
 
     @property
     def source_git_pr_model(self) -> PullRequestModel:
@@ -108,30 +211,95 @@ class DistGitMRHandler(JobHandler):
             self._dist_git_pr = dist_git_project.get_pr(self.dist_git_pr_model.pr_id)
         return self._dist_git_pr
 
+    @property
+    def work_dir(self) -> Path:
+        """Where the repositories are cloned, see WorkDirPool."""
+        return work_dir_pool.get()
+
+    def clean(self):
+        super().clean()
+        work_dir_pool.release()
+
     @property
     def packit(self) -> PackitAPI:
         if not self._packit:
             source_project = self.service_config.get_project(
                 url=self.source_project_url
             )
+            # The upstream source-git repository, not the contributor's fork,
+            # so that it can be reused for MRs from other forks.
+            url = self.project.get_git_urls()["git"]
+            checkout = Checkout.in_work_dir(self.work_dir, kind="source-git", url=url)
+            self.checkouts.append(checkout)
+            with get_git_circuit_breaker(url):
+                git_repo = checkout.clone()
+                # GitLab keeps the MR commits in the target project.
+                # We also need the tags from the upstream source-git repo
+                # Details: https://github.com/packit/hardly/issues/61
+                git_repo.git.fetch(
+                    "--tags",
+                    "--force",
+                    "origin",
+                    f"refs/merge-requests/{self.mr_identifier}/head",
+                )
             local_project = LocalProject(
+                git_repo=git_repo,
+                working_dir=checkout.path,
                 git_project=source_project,
                 ref=self.data.commit_sha,
-                working_dir=self.service_config.command_handler_work_dir,
             )
-            # We need to fetch tags from the upstream source-git repo
-            # Details: https://github.com/packit/hardly/issues/61
-            local_project.fetch(self.project.get_web_url(), force=True)
 
             self._packit = PackitAPI(
                 config=self.service_config,
                 package_config=self.package_config,
                 upstream_local_project=local_project,
+                downstream_local_project=self.get_dist_git_local_project(
+                    self.dist_git_branch
+                ),
             )
         return self._packit
 
+    def get_dist_git_local_project(self, branch: str) -> LocalProject:
+        """Clone the dist-git repository, e.g. only the tip of the branch.
+
+        See CLONE_STRATEGIES.
+        """
+        url = self.package_config.dist_git_package_url
+        checkout = Checkout.in_work_dir(
+            self.work_dir, kind="dist-git", url=url, branch=branch
+        )
+        self.checkouts.append(checkout)
+        with get_git_circuit_breaker(url):
+            git_repo = checkout.clone()
+        return LocalProject(
+            git_repo=git_repo,
+            working_dir=checkout.path,
+            git_project=self.service_config.get_project(url=url),
+        )
+
+    @property
+    def dist_git_branches(self) -> List[str]:
+        """Dist-git branches to create the MRs against, see DIST_GIT_BRANCHES_FANOUT."""
+        return DIST_GIT_BRANCHES_FANOUT.get(
+            self.target_repo_branch, [self.target_repo_branch]
+        )
+
+    def get_sibling_dist_git_prs(self) -> List[PullRequest]:
+        """Dist-git PRs created for the other fan-out branches.
+
+        Only one dist-git PR per source-git PR is stored in db,
+        the others are found by the link to the source-git MR in their description.
+        """
+        if len(self.dist_git_branches) < 2 or not self.dist_git_pr:
+            return []
+        return [
+            pr
+            for pr in self.dist_git_pr.target_project.get_pr_list(status=PRStatus.open)
+            if pr.id != self.dist_git_pr.id and f"({self.mr_url})" in pr.description
+        ]
+
     def handle_existing_dist_git_pr(self) -> bool:
-        """Sync changes in source-git PR to already existing dist-git PR.
+        """Sync changes in source-git PR to already existing dist-git PR(s).
 
         Returns:
             was the sync successful
@@ -140,31 +308,35 @@ class DistGitMRHandler(JobHandler):
             f"{self.source_git_pr_model} already has corresponding {self.dist_git_pr_model}"
         )
         if self.dist_git_pr:
-            msg = ""
-            if self.action == GitlabEventAction.closed.value:
-                msg = f"[Source-git MR]({self.mr_url}) has been closed."
-                self.dist_git_pr.close()
-            elif self.action == GitlabEventAction.reopen.value:
-                msg = f"[Source-git MR]({self.mr_url}) has been reopened."
-                # https://github.com/packit/ogr/pull/714
-                # self.dist_git_pr.reopen()
-            elif self.action == GitlabEventAction.update.value:
-                msg = f"[Source-git MR]({self.mr_url}) has been updated."
-                # TODO: update the dist-git PR?
-            elif self.action == GitlabEventAction.opened.value:
+            if self.action == GitlabEventAction.opened.value:
                 # Are you trying to re-send a webhook payload to the endpoint manually?
                 # If so and you expect a new dist-git PR being opened, you first
                 # have to remove the old relation from db.
                 logger.error(f"[Source-git MR]({self.mr_url}) opened. (again???)")
                 return False
-            logger.info(msg)
-            self.dist_git_pr.comment(msg)
+            for dist_git_pr in [self.dist_git_pr] + self.get_sibling_dist_git_prs():
+                msg = ""
+                if self.action == GitlabEventAction.closed.value:
+                    msg = f"[Source-git MR]({self.mr_url}) has been closed."
+                    dist_git_pr.close()
+                elif self.action == GitlabEventAction.reopen.value:
+                    msg = f"[Source-git MR]({self.mr_url}) has been reopened."
+                    # https://github.com/packit/ogr/pull/714
+                    # dist_git_pr.reopen()
+                elif self.action == GitlabEventAction.update.value:
+                    msg = f"[Source-git MR]({self.mr_url}) has been updated."
+                    # TODO: update the dist-git PR?
+                logger.info(msg)
+                dist_git_pr.comment(msg)
         return True
 
     def run(self) -> TaskResults:
         """
         If user creates a merge-request on the source-git repository,
         create a matching merge-request to the dist-git repository.
+
+        With DIST_GIT_BRANCHES_FANOUT configured, a merge-request is created
+        for each of the dist-git branches.
         """
         if not self.handle_target():
             logger.debug(
@@ -180,19 +352,141 @@ class DistGitMRHandler(JobHandler):
             logger.debug("No package config found.")
             return TaskResults(success=True)
 
-        if (
-            self.target_repo_branch
-            not in self.packit.dg.local_project.git_project.get_branches()
-        ):
+        # Check the branches before self.packit clones anything.
+        dist_git_project_url = self.package_config.dist_git_package_url
+        branches_cache = BranchesCache(dist_git_project_url)
+        branches = []
+        for branch in self.dist_git_branches:
+            if branches_cache.contains(
+                branch,
+                lambda: self.service_config.get_project(
+                    url=dist_git_project_url
+                ).get_branches(),
+            ):
+                branches.append(branch)
+                continue
             msg = (
                 "Can't create a dist-git pull/merge request out of this contribution "
-                f"because matching {self.target_repo_branch} branch does not exist "
+                f"because matching {branch} branch does not exist "
                 f"in dist-git {self.target_repo} repo."
             )
             self.project.get_pr(int(self.mr_identifier)).comment(msg)
             logger.info(msg)
+        if not branches:
             return TaskResults(success=True)
 
+        logger.info(f"About to create a dist-git MR from source-git MR {self.mr_url}")
+
+        self.dist_git_branch = branches[0]
+        if len(branches) == 1:
+            results = {
+                branches[0]: (self.create_dist_git_mr(self.packit, branches[0]), None)
+            }
+        else:
+            results = self.create_dist_git_mrs(branches)
+
+        # Only one dist-git MR can be stored per source-git MR in the db,
+        # prefer the one for the branch the source-git MR targets.
+        created = {branch: dg_mr for branch, (dg_mr, _) in results.items() if dg_mr}
+        if created:
+            stored_branch = (
+                self.target_repo_branch
+                if self.target_repo_branch in created
+                else next(iter(created))
+            )
+            dg_mr = created.pop(stored_branch)
+            SourceGitPRDistGitPRModel.get_or_create(
+                self.mr_identifier,
+                self.project.namespace,
+                self.project.repo,
+                self.project.get_web_url(),
+                dg_mr.id,
+                dg_mr.target_project.namespace,
+                dg_mr.target_project.repo,
+                dg_mr.target_project.get_web_url(),
+            )
+        fanout_mrs = FanoutDistGitMRs(
+            self.project.get_web_url(), int(self.mr_identifier)
+        )
+        for branch, dg_mr in created.items():
+            fanout_mrs.add(branch, dg_mr.target_project.get_web_url(), dg_mr.id)
+
+        return TaskResults(
+            success=all(error is None for _, error in results.values()),
+            details={
+                "branches": {
+                    branch: {
+                        "dist_git_mr": dg_mr.url if dg_mr else None,
+                        "error": error,
+                    }
+                    for branch, (dg_mr, error) in results.items()
+                },
+                "checkouts": {
+                    checkout.name: checkout.report() for checkout in self.checkouts
+                },
+            },
+        )
+
+    def create_dist_git_mrs(
+        self, branches: List[str]
+    ) -> Dict[str, Tuple[Optional[PullRequest], Optional[str]]]:
+        """Create dist-git MRs for more branches in parallel.
+
+        The source-git repository is cloned (and tags fetched) only once,
+        the other branches get their own worktree of the clone.
+        Each branch has its own dist-git clone.
+
+        Returns:
+            Branch -> created MR (if any) and the error message if the creation failed.
+        """
+        packits = {branches[0]: self.packit}
+        packits.update(
+            {branch: self.get_packit_with_worktree(branch) for branch in branches[1:]}
+        )
+        with ThreadPoolExecutor(max_workers=len(branches)) as executor:
+            futures = {
+                branch: executor.submit(self.create_dist_git_mr, packit, branch)
+                for branch, packit in packits.items()
+            }
+        results: Dict[str, Tuple[Optional[PullRequest], Optional[str]]] = {}
+        for branch, future in futures.items():
+            try:
+                results[branch] = future.result(), None
+            except CircuitOpenError:
+                # the whole task is deferred until the circuit closes
+                raise
+            except Exception as ex:
+                # Don't let one branch fail (and retry) the others.
+                logger.error(f"Creating dist-git MR for {branch} failed: {ex}")
+                results[branch] = None, str(ex)
+        return results
+
+    def get_packit_with_worktree(self, branch: str) -> PackitAPI:
+        upstream = self.packit.up.local_project
+        # Inside .git, so that the main worktree stays clean.
+        path = Path(upstream.working_dir) / ".git" / "hardly-worktrees" / branch
+        upstream.git_repo.git.worktree(
+            "add", "--force", "--detach", str(path), self.data.commit_sha
+        )
+        return PackitAPI(
+            config=self.service_config,
+            package_config=self.package_config,
+            upstream_local_project=LocalProject(
+                git_repo=Repo(path),
+                working_dir=path,
+                git_project=upstream.git_project,
+            ),
+            downstream_local_project=self.get_dist_git_local_project(branch),
+        )
+
+    def create_dist_git_mr(
+        self, packit: PackitAPI, branch: str
+    ) -> Optional[PullRequest]:
+        """Create a dist-git MR for one branch and let the contributor know.
+
+        Returns:
+            Created MR, if any.
+        """
         dg_mr_info = f"""###### Info for package maintainer
 This MR has been automatically created from
 [this source-git MR]({self.mr_url})."""
@@ -201,38 +495,36 @@ This MR has been automatically created from
 Please review the contribution and once you are comfortable with the content,
 you should trigger a CI pipeline run via `Pipelines → Run pipeline`."""
 
-        logger.info(f"About to create a dist-git MR from source-git MR {self.mr_url}")
+        started = time.monotonic()
+        result = "failure"
+        try:
+            # pushes to the dist-git fork
+            with get_git_circuit_breaker(self.package_config.dist_git_package_url):
+                dg_mr = packit.sync_release(
+                    dist_git_branch=branch,
+                    version=packit.up.get_specfile_version(),
+                    add_new_sources=False,
+                    title=self.mr_title,
+                    description=f"{fix_bz_refs(self.mr_description)}\n\n---\n{dg_mr_info}",
+                    sync_default_files=False,
+                    # we rely on this in PipelineHandler below
+                    local_pr_branch_suffix=f"src-{self.mr_identifier}",
+                    mark_commit_origin=True,
+                )
+            result = "success"
+        finally:
+            pushgateway.dist_git_mr_branch_duration.labels(
+                branch=branch, result=result
+            ).observe(time.monotonic() - started)
 
-        if dg_mr := self.packit.sync_release(
-            dist_git_branch=self.target_repo_branch,
-            version=self.packit.up.get_specfile_version(),
-            add_new_sources=False,
-            title=self.mr_title,
-            description=f"{fix_bz_refs(self.mr_description)}\n\n---\n{dg_mr_info}",
-            sync_default_files=False,
-            # we rely on this in PipelineHandler below
-            local_pr_branch_suffix=f"src-{self.mr_identifier}",
-            mark_commit_origin=True,
-        ):
+        if dg_mr:
             comment = f"""[Dist-git MR #{dg_mr.id}]({dg_mr.url})
 has been created for sake of triggering the downstream checks.
 It ensures that your contribution is valid and can be incorporated in
 dist-git as it is still the authoritative source for the distribution.
 We want to run checks there only so they don't need to be reimplemented in source-git as well."""
             self.project.get_pr(int(self.mr_identifier)).comment(comment)
-
-            SourceGitPRDistGitPRModel.get_or_create(
-                self.mr_identifier,
-                self.project.namespace,
-                self.project.repo,
-                self.project.get_web_url(),
-                dg_mr.id,
-                dg_mr.target_project.namespace,
-                dg_mr.target_project.repo,
-                dg_mr.target_project.get_web_url(),
-            )
-
-        return TaskResults(success=True)
+        return dg_mr
 
     def handle_target(self) -> bool:
         """Tell if a target repo and branch pair of an MR should be handled or ignored."""
@@ -250,7 +542,255 @@ We want to run checks there only so they don't need to be reimplemented in sourc
         return False
 
 
-class SyncFromDistGitPRHandler(JobHandler):
+def is_locked(cache_dir: Path) -> bool:
+    """Tell if a task (in this or another process) is using the repositories."""
+    if not (cache_dir / "lock").is_file():
+        return False
+    with open(cache_dir / "lock", "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        fcntl.flock(lock, fcntl.LOCK_UN)
+    return False
+
+
+def get_warm_repo(kind: str, url: str, path: Path, branch: str) -> Repo:
+    """Get a clean checkout of the branch, reusing the repository from previous runs.
+
+    Only the new objects are fetched if the repository has already been cloned.
+    """
+    with get_git_circuit_breaker(url):
+        if (path / ".git").is_dir():
+            repo = Repo(path)
+            repo.remotes.origin.set_url(url)
+            repo.remotes.origin.fetch(prune=True)
+        else:
+            # The whole history and tree is needed to convert the commits,
+            # only partial clone can be used.
+            strategy = CloneStrategy(filter=CloneStrategy.get(kind, url).filter)
+            repo = Checkout(kind=kind, url=url, path=path, strategy=strategy).clone()
+    repo.git.checkout("-B", branch, f"origin/{branch}")
+    repo.git.reset("--hard", f"origin/{branch}")
+    repo.git.clean("-ffdx")
+    return repo
+
+
+# @configured_as(job_type=JobType.sync_from_downstream)  # Requires a change in packit
+@reacts_to(event=PushGitlabEvent)
+@reacts_to(event=PushPagureEvent)
+class UpdateSourceGitHandler(SlimJobHandler):
+    """Open a source-git PR with the commits pushed to dist-git.
+
+    Only dist-git commits which haven't been converted yet are converted,
+    see CommitMapping. The repositories are kept in SOURCE_GIT_SYNC_DIR
+    between the runs and only fetched.
+    """
+
+    task_name = TaskName.update_source_git
+    sync_branch_prefix = "sync-from-dist-git"
+    # Seconds a task syncing a branch can hold its lock
+    lock_timeout = 3600
+    # Seconds a task waits for the lock before it's deferred by busy_retry_in seconds
+    lock_wait = 10
+    busy_retry_in = 60
+
+    def __init__(
+        self,
+        package_config: PackageConfig,
+        job_config: JobConfig,
+        event: dict,
+    ):
+        super().__init__(
+            package_config=package_config,
+            job_config=job_config,
+            event=event,
+        )
+        self.dist_git_project_url = event["project_url"]
+        # GitLab sends full refs
+        self.branch = re.sub(r"^refs/heads/", "", event["git_ref"])
+        self.commit_sha = event["commit_sha"]
+        self.sync_branch = f"{self.sync_branch_prefix}-{self.branch}"
+
+    @staticmethod
+    def get_source_git_url(dist_git_project_url: str) -> Optional[str]:
+        """Source-git repository corresponding to the dist-git one, if configured."""
+        if not (
+            SOURCE_GIT_URL_TEMPLATE
+            and (m := re.fullmatch(DIST_GIT_REPO_PATTERN, dist_git_project_url))
+        ):
+            return None
+        return SOURCE_GIT_URL_TEMPLATE.format(package=m["package"])
+
+    def run(self) -> TaskResults:
+        if not (source_git_url := self.get_source_git_url(self.dist_git_project_url)):
+            logger.debug(f"{self.dist_git_project_url} is not a dist-git repository.")
+            return TaskResults(success=True)
+
+        cache_dir = (
+            SOURCE_GIT_SYNC_DIR / sha256(source_git_url.encode()).hexdigest()[:16]
+        )
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        # used now, see evict()
+        utime(cache_dir)
+        state_key = f"hardly:source-git-sync:{source_git_url}:{self.branch}"
+        # One task at a time (in all workers) pushes to the branch's sync branch
+        # and the repositories are shared by the tasks of all branches in this worker.
+        # Tasks which would have to wait longer are deferred.
+        lock = get_redis().lock(f"{state_key}:lock", timeout=self.lock_timeout)
+        if not lock.acquire(blocking_timeout=self.lock_wait):
+            raise HandlerBusyError(
+                f"{source_git_url} {self.branch} is being synced by another task.",
+                retry_in=self.busy_retry_in,
+            )
+        try:
+            with open(cache_dir / "lock", "w") as cache_lock:
+                try:
+                    fcntl.flock(cache_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    raise HandlerBusyError(
+                        f"Repositories of {source_git_url} are used by another task.",
+                        retry_in=self.busy_retry_in,
+                    ) from None
+                result = self.update_source_git(source_git_url, cache_dir, state_key)
+                evict(
+                    SOURCE_GIT_SYNC_DIR,
+                    quota=SOURCE_GIT_SYNC_QUOTA,
+                    max_age=SOURCE_GIT_SYNC_MAX_AGE,
+                    in_use=is_locked,
+                )
+                return result
+        finally:
+            try:
+                lock.release()
+            except LockError:
+                logger.warning(f"Lock of {state_key} expired while syncing.")
+
+    def update_source_git(
+        self, source_git_url: str, cache_dir: Path, state_key: str
+    ) -> TaskResults:
+        source_git_project = self.service_config.get_project(url=source_git_url)
+        dist_git_project = self.service_config.get_project(
+            url=self.dist_git_project_url
+        )
+        if self.branch not in source_git_project.get_branches():
+            logger.info(f"No {self.branch} branch in {source_git_url}, not syncing.")
+            return TaskResults(success=True)
+
+        dist_git_repo = get_warm_repo(
+            "dist-git",
+            dist_git_project.get_git_urls()["git"],
+            cache_dir / "dist-git",
+            self.branch,
+        )
+        source_git_repo = get_warm_repo(
+            "source-git",
+            source_git_project.get_git_urls()["git"],
+            cache_dir / "source-git",
+            self.branch,
+        )
+        mapping = CommitMapping(
+            cache_dir / f"{quote(self.branch, safe='')}.json", state_key=state_key
+        )
+        mapping.scan_source_git(source_git_repo, f"origin/{self.branch}")
+
+        pending_pr = (
+            source_git_project.get_pr(mapping.pending_pr_id)
+            if mapping.pending_pr_id
+            else None
+        )
+        if pending_pr and pending_pr.status == PRStatus.open:
+            # Add the new commits on top of those waiting in the PR,
+            # possibly pushed by another worker (GitLab MR ref).
+            base = mapping.last_dist_git_commit
+            with get_git_circuit_breaker(source_git_url):
+                source_git_repo.git.fetch(
+                    "origin", f"refs/merge-requests/{pending_pr.id}/head"
+                )
+            source_git_repo.git.checkout("-B", self.sync_branch, "FETCH_HEAD")
+        else:
+            pending_pr = mapping.pending_pr_id = None
+            base = mapping.merged_dist_git_commit
+            source_git_repo.git.checkout("-B", self.sync_branch)
+
+        if not base:
+            logger.info(
+                f"{source_git_url} has never been synced from dist-git, "
+                "can't tell which commits are new."
+            )
+            return TaskResults(success=True)
+        if base == self.commit_sha or dist_git_repo.is_ancestor(self.commit_sha, base):
+            logger.debug(f"{self.commit_sha} has already been synced.")
+            return TaskResults(success=True)
+
+        # Commits which came from source-git (via a dist-git MR) are there already.
+        runs: List[List[str]] = [[]]
+        for commit in dist_git_repo.iter_commits(
+            f"{base}..{self.commit_sha}", reverse=True
+        ):
+            if source_git_commit := get_trailer(commit.message, FROM_SOURCE_GIT_TOKEN):
+                mapping.commits[commit.hexsha] = source_git_commit
+                runs.append([])
+            else:
+                runs[-1].append(commit.hexsha)
+        runs = [run for run in runs if run]
+
+        if not runs:
+            logger.info(f"All commits up to {self.commit_sha} came from source-git.")
+            mapping.last_dist_git_commit = self.commit_sha
+            if not pending_pr:
+                mapping.merged_dist_git_commit = self.commit_sha
+            mapping.save()
+            return TaskResults(success=True)
+
+        packit = PackitAPI(
+            config=self.service_config,
+            # The config lives in source-git, not in the dist-git the event came from.
+            package_config=self.package_config
+            or get_local_package_config(source_git_repo.working_dir),
+            upstream_local_project=LocalProject(
+                git_repo=source_git_repo,
+                working_dir=source_git_repo.working_dir,
+                git_project=source_git_project,
+            ),
+            downstream_local_project=LocalProject(
+                git_repo=dist_git_repo,
+                working_dir=dist_git_repo.working_dir,
+                git_project=dist_git_project,
+            ),
+        )
+        for run in runs:
+            logger.info(f"Converting dist-git commits {run[0]}..{run[-1]}")
+            packit.update_source_git(revision_range=f"{run[0]}~1..{run[-1]}")
+        mapping.add_converted(source_git_repo, f"origin/{self.branch}..HEAD")
+        mapping.last_dist_git_commit = self.commit_sha
+
+        with get_git_circuit_breaker(source_git_url):
+            packit.up.push_to_fork(self.sync_branch, force=True)
+        if not pending_pr:
+            pending_pr = packit.up.create_pull(
+                pr_title=f"Sync the {self.branch} branch from dist-git",
+                pr_description=(
+                    "This PR has been automatically created from commits pushed "
+                    f"to the [dist-git repository]({self.dist_git_project_url})."
+                ),
+                source_branch=self.sync_branch,
+                target_branch=self.branch,
+            )
+            mapping.pending_pr_id = pending_pr.id
+        mapping.save()
+        logger.info(f"Source-git {pending_pr.url} updated up to {self.commit_sha}")
+
+        return TaskResults(
+            success=True,
+            details={
+                "source_git_pr": pending_pr.url,
+                "converted": sum(len(run) for run in runs),
+            },
+        )
+
+
+class SyncFromDistGitPRHandler(SlimJobHandler):
     def __init__(
         self,
         package_config: PackageConfig,
@@ -279,17 +819,69 @@ class SyncFromDistGitPRHandler(JobHandler):
         if not (dist_git_pr_model := self.dist_git_pr_model()):
             logger.debug("No dist-git PR model.")
             return TaskResults(success=True)
-        if not (
-            sg_dg := SourceGitPRDistGitPRModel.get_by_dist_git_id(dist_git_pr_model.id)
+        if sg_dg := SourceGitPRDistGitPRModel.get_by_dist_git_id(dist_git_pr_model.id):
+            source_git_pr_model = sg_dg.source_git_pull_request
+            source_git_project_url = source_git_pr_model.project.project_url
+            source_git_pr_id = source_git_pr_model.pr_id
+            branch = None
+        elif fanout_mr := FanoutDistGitMRs.get(
+            dist_git_pr_model.project.project_url, dist_git_pr_model.pr_id
         ):
+            source_git_project_url = fanout_mr.source_git_project_url
+            source_git_pr_id = fanout_mr.source_git_pr_id
+            branch = fanout_mr.branch
+        else:
             logger.debug(f"Source-git PR for {dist_git_pr_model} not found.")
             return TaskResults(success=True)
 
-        source_git_pr_model = sg_dg.source_git_pull_request
-        source_git_project = self.service_config.get_project(
-            url=source_git_pr_model.project.project_url
+        self.report_statuses(
+            service_config=self.service_config,
+            source_git_project_url=source_git_project_url,
+            source_git_pr_id=source_git_pr_id,
+            statuses=[
+                DistGitStatus(
+                    state=self.status_state,
+                    description=self.status_description,
+                    check_name=self.status_check_name,
+                    url=self.status_url,
+                )
+            ],
+            branch=branch,
+        )
+        return TaskResults(success=True)
+
+    @staticmethod
+    def report_statuses(
+        service_config: ServiceConfig,
+        source_git_project_url: str,
+        source_git_pr_id: int,
+        statuses: List[DistGitStatus],
+        only_changed: bool = False,
+        branch: Optional[str] = None,
+    ) -> int:
+        """Report dist-git CI statuses in the source-git MR.
+
+        Args:
+            service_config: Service configuration used to get the source-git project.
+            source_git_project_url: URL of the source-git project.
+            source_git_pr_id: ID of the source-git MR.
+            statuses: Dist-git CI statuses to be reported.
+            only_changed: Skip statuses which have already been reported
+                for the current head commit of the MR.
+            branch: Dist-git branch of a fan-out dist-git PR, added to the check
+                names so that the PRs for the branches don't override each other.
+
+        Returns:
+            Number of statuses reported.
+        """
+        source_git_project = service_config.get_project(url=source_git_project_url)
+        source_git_pr = source_git_project.get_pr(source_git_pr_id)
+        # Remembered only when the reconciler or the backfill read it.
+        reported = (
+            ReportedStatuses(source_git_project_url, source_git_pr_id)
+            if RECONCILE_INTERVAL or only_changed
+            else None
         )
-        source_git_pr = source_git_project.get_pr(source_git_pr_model.pr_id)
 
         status_reporter = StatusReporter.get_instance(
             project=source_git_project,
@@ -299,24 +891,70 @@ class SyncFromDistGitPRHandler(JobHandler):
             commit_sha=source_git_pr.head_commit,
             pr_id=source_git_pr.id,
         )
-        # Our account(s) have no access (unless it's manually added) into the fork repos,
-        # to set the commit status (which would look like a Pipeline result)
-        # so the status reporter fallbacks to adding a commit comment.
-        # To not pollute MRs with too many comments, we might later skip
-        # the 'Pipeline is pending/running' events.
-        # See also https://github.com/packit/packit-service/issues/1411
-        status_reporter.set_status(
-            state=self.status_state,
-            description=self.status_description,
-            check_name=self.status_check_name,
-            url=self.status_url,
-        )
-        return TaskResults(success=True)
+        count = 0
+        for status in statuses:
+            if branch:
+                status = status._replace(check_name=f"{status.check_name} ({branch})")
+            fingerprint = (
+                f"{source_git_pr.head_commit}:{status.state.name}:{status.url}"
+            )
+            if (
+                only_changed
+                and reported
+                and reported.get(status.check_name) == fingerprint
+            ):
+                continue
+            # Our account(s) have no access (unless it's manually added) into the fork
+            # repos, to set the commit status (which would look like a Pipeline result)
+            # so the status reporter fallbacks to adding a commit comment.
+            # To not pollute MRs with too many comments, we might later skip
+            # the 'Pipeline is pending/running' events.
+            # See also https://github.com/packit/packit-service/issues/1411
+            status_reporter.set_status(
+                state=status.state,
+                description=status.description,
+                check_name=status.check_name,
+                url=status.url,
+            )
+            if reported:
+                reported.set(status.check_name, fingerprint)
+            count += 1
+        return count
+
+    @classmethod
+    def get_dist_git_statuses(cls, dist_git_pr: PullRequest) -> List[DistGitStatus]:
+        """Get the current CI statuses of a dist-git PR directly from the forge.
+
+        Used to reconcile the source-git MR when the events were missed.
+        """
+        raise NotImplementedError("This should have been implemented.")
 
 
 @reacts_to(event=PipelineGitlabEvent)
 class SyncFromGitlabMRHandler(SyncFromDistGitPRHandler):
     task_name = TaskName.sync_from_gitlab_mr
+    event_fields = (
+        "status",
+        "detailed_status",
+        "pipeline_id",
+        "source",
+        "merge_request_url",
+    )
+    check_name = "Dist-git MR CI Pipeline"
+    # https://docs.gitlab.com/ee/api/pipelines.html#list-project-pipelines -> status
+    pipeline_states = {
+        "pending": BaseCommitStatus.pending,
+        "created": BaseCommitStatus.pending,
+        "waiting_for_resource": BaseCommitStatus.pending,
+        "preparing": BaseCommitStatus.pending,
+        "scheduled": BaseCommitStatus.pending,
+        "manual": BaseCommitStatus.pending,
+        "running": BaseCommitStatus.running,
+        "success": BaseCommitStatus.success,
+        "skipped": BaseCommitStatus.success,
+        "failed": BaseCommitStatus.failure,
+        "canceled": BaseCommitStatus.failure,
+    }
 
     def __init__(
         self,
@@ -330,22 +968,9 @@ class SyncFromGitlabMRHandler(SyncFromDistGitPRHandler):
             event=event,
         )
 
-        # https://docs.gitlab.com/ee/api/pipelines.html#list-project-pipelines -> status
-        self.status_state: BaseCommitStatus = {
-            "pending": BaseCommitStatus.pending,
-            "created": BaseCommitStatus.pending,
-            "waiting_for_resource": BaseCommitStatus.pending,
-            "preparing": BaseCommitStatus.pending,
-            "scheduled": BaseCommitStatus.pending,
-            "manual": BaseCommitStatus.pending,
-            "running": BaseCommitStatus.running,
-            "success": BaseCommitStatus.success,
-            "skipped": BaseCommitStatus.success,
-            "failed": BaseCommitStatus.failure,
-            "canceled": BaseCommitStatus.failure,
-        }[event["status"]]
+        self.status_state: BaseCommitStatus = self.pipeline_states[event["status"]]
         self.status_description: str = f"Changed status to {event['detailed_status']}"
-        self.status_check_name: str = "Dist-git MR CI Pipeline"
+        self.status_check_name: str = self.check_name
         self.status_url: str = (
             f"{event['project_url']}/-/pipelines/{event['pipeline_id']}"
         )
@@ -369,10 +994,39 @@ class SyncFromGitlabMRHandler(SyncFromDistGitPRHandler):
                 )
         return None
 
+    @classmethod
+    def get_dist_git_statuses(cls, dist_git_pr: PullRequest) -> List[DistGitStatus]:
+        # ogr doesn't expose pipelines, the MR from the API carries the latest one
+        if not (pipeline := dist_git_pr._raw_pr.head_pipeline):
+            return []
+        if not (state := cls.pipeline_states.get(pipeline["status"])):
+            logger.debug(f"Unknown pipeline status {pipeline['status']!r}, skipping")
+            return []
+        detailed_status = (pipeline.get("detailed_status") or {}).get(
+            "text", pipeline["status"]
+        )
+        return [
+            DistGitStatus(
+                state=state,
+                description=f"Changed status to {detailed_status}",
+                check_name=cls.check_name,
+                url=pipeline["web_url"],
+            )
+        ]
+
 
 @reacts_to(event=PullRequestFlagPagureEvent)
 class SyncFromPagurePRHandler(SyncFromDistGitPRHandler):
     task_name = TaskName.sync_from_pagure_pr
+    event_fields = ("status", "comment", "username", "url")
+    # https://pagure.io/api/0/#pull_requests-tab -> "Flag a pull-request" -> status
+    flag_states = {
+        "pending": BaseCommitStatus.pending,
+        "success": BaseCommitStatus.success,
+        "error": BaseCommitStatus.error,
+        "failure": BaseCommitStatus.failure,
+        "canceled": BaseCommitStatus.failure,
+    }
 
     def __init__(
         self,
@@ -386,17 +1040,23 @@ class SyncFromPagurePRHandler(SyncFromDistGitPRHandler):
             event=event,
         )
 
-        # https://pagure.io/api/0/#pull_requests-tab -> "Flag a pull-request" -> status
-        self.status_state = {
-            "pending": BaseCommitStatus.pending,
-            "success": BaseCommitStatus.success,
-            "error": BaseCommitStatus.error,
-            "failure": BaseCommitStatus.failure,
-            "canceled": BaseCommitStatus.failure,
-        }[event["status"]]
+        self.status_state = self.flag_states[event["status"]]
         self.status_description = event["comment"]
         self.status_check_name = event["username"]
         self.status_url = event["url"]
 
     def dist_git_pr_model(self) -> Optional[PullRequestModel]:
         return self.data.db_trigger
+
+    @classmethod
+    def get_dist_git_statuses(cls, dist_git_pr: PullRequest) -> List[DistGitStatus]:
+        return [
+            DistGitStatus(
+                state=cls.flag_states[flag["status"]],
+                description=flag["comment"],
+                check_name=flag["username"],
+                url=flag["url"],
+            )
+            for flag in dist_git_pr.get_flags()
+            if flag["status"] in cls.flag_states
+        ]
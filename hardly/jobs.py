@@ -2,22 +2,32 @@
 # SPDX-License-Identifier: MIT
 
 from logging import getLogger
-from typing import List
+from typing import List, Optional, Type
 
+from hardly.cache import BranchesCache
+from hardly.constants import RECONCILE_INTERVAL, RECONCILE_ONLY_INTERMEDIATE_STATES
 from hardly.handlers import (
     DistGitMRHandler,
     SyncFromGitlabMRHandler,
     SyncFromPagurePRHandler,
+    UpdateSourceGitHandler,
 )
+from hardly.handlers.abstract import SlimJobHandler
+from hardly.scheduling import INTERMEDIATE_STATES, get_priority
 from packit_service.worker.events import (
     Event,
     MergeRequestGitlabEvent,
     PipelineGitlabEvent,
+    PushGitlabEvent,
+)
+from packit_service.worker.events.pagure import (
+    PullRequestFlagPagureEvent,
+    PushPagureEvent,
 )
-from packit_service.worker.events.pagure import PullRequestFlagPagureEvent
 from packit_service.worker.handlers import JobHandler
 from packit_service.worker.jobs import SteveJobs
 from packit_service.worker.parser import Parser
+from packit_service.worker.reporting import BaseCommitStatus
 from packit_service.worker.result import TaskResults
 
 logger = getLogger(__name__)
@@ -63,21 +73,68 @@ class StreamJobs(SteveJobs):
 
         # Handlers are (for now) run even the job is not configured in a package.
         if isinstance(event_object, MergeRequestGitlabEvent):
-            DistGitMRHandler.get_signature(
-                event=event_object,
-                job=None,
-            ).apply_async()
+            self.enqueue(
+                DistGitMRHandler, event_object, action=event_object.action.value
+            )
+
+        if self.left_to_reconciler(event_object):
+            logger.debug(f"Syncing of {event_object} is left to the reconciler.")
+            return self.process_jobs(event_object)
 
         if isinstance(event_object, PipelineGitlabEvent):
-            SyncFromGitlabMRHandler.get_signature(
-                event=event_object,
-                job=None,
-            ).apply_async()
+            self.enqueue(
+                SyncFromGitlabMRHandler,
+                event_object,
+                ci_state=self.get_ci_state(event_object),
+            )
 
         if isinstance(event_object, PullRequestFlagPagureEvent):
-            SyncFromPagurePRHandler.get_signature(
-                event=event_object,
-                job=None,
-            ).apply_async()
+            self.enqueue(
+                SyncFromPagurePRHandler,
+                event_object,
+                ci_state=self.get_ci_state(event_object),
+            )
+
+        if isinstance(event_object, (PushGitlabEvent, PushPagureEvent)):
+            # A branch might have been created.
+            BranchesCache(event_object.project_url).invalidate()
+
+        if isinstance(
+            event_object, (PushGitlabEvent, PushPagureEvent)
+        ) and UpdateSourceGitHandler.get_source_git_url(event_object.project_url):
+            self.enqueue(UpdateSourceGitHandler, event_object)
 
         return self.process_jobs(event_object)
+
+    @staticmethod
+    def enqueue(
+        handler: Type[SlimJobHandler],
+        event: Event,
+        action: Optional[str] = None,
+        ci_state: Optional[BaseCommitStatus] = None,
+    ):
+        """Run the handler in a task with the priority given by hardly.scheduling."""
+        priority = get_priority(
+            handler.task_name,
+            project_url=event.project_url,
+            action=action,
+            ci_state=ci_state,
+        )
+        logger.debug(f"Enqueueing {handler.task_name} with priority {priority}.")
+        handler.get_signature(event=event, job=None).apply_async(priority=priority)
+
+    @staticmethod
+    def get_ci_state(event: Event) -> Optional[BaseCommitStatus]:
+        """State of a dist-git CI pipeline/flag event, None if unknown."""
+        if isinstance(event, PipelineGitlabEvent):
+            return SyncFromGitlabMRHandler.pipeline_states.get(event.status)
+        if isinstance(event, PullRequestFlagPagureEvent):
+            return SyncFromPagurePRHandler.flag_states.get(event.status)
+        return None
+
+    @classmethod
+    def left_to_reconciler(cls, event: Event) -> bool:
+        """Tell if syncing of the dist-git CI state can wait for the reconciler."""
+        if not (RECONCILE_INTERVAL and RECONCILE_ONLY_INTERMEDIATE_STATES):
+            return False
+        return cls.get_ci_state(event) in INTERMEDIATE_STATES
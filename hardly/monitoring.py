@@ -0,0 +1,112 @@
+# Copyright Contributors to the Packit project.
+# SPDX-License-Identifier: MIT
+
+import logging
+from os import getenv
+
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    push_to_gateway,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Pushgateway:
+    """Hardly's own metrics, pushed to the Pushgateway packit-service pushes to.
+
+    The metrics are collected during the whole life of the worker process
+    and pushed after each task.
+    """
+
+    def __init__(self):
+        self.pushgateway_address = getenv("PUSHGATEWAY_ADDRESS")
+        # so that workers don't overwrite each other's metrics,
+        # the job name corresponds to worker name (e.g. hardly-worker-0)
+        self.worker_name = getenv("HOSTNAME")
+        self.registry = CollectorRegistry()
+
+        self.dist_git_mr_branch_duration = Histogram(
+            "hardly_dist_git_mr_branch_duration_seconds",
+            "Time of creating a dist-git MR for one dist-git branch",
+            ["branch", "result"],
+            registry=self.registry,
+            buckets=(10, 30, 60, 120, 300, 600, 1200, float("inf")),
+        )
+        self.clone_duration = Histogram(
+            "hardly_clone_duration_seconds",
+            "Time of cloning a source-git or dist-git repository",
+            ["kind"],
+            registry=self.registry,
+            buckets=(1, 5, 10, 30, 60, 120, 300, 600, float("inf")),
+        )
+        self.checkout_disk_usage = Histogram(
+            "hardly_checkout_disk_usage_bytes",
+            "Disk usage of a source-git or dist-git checkout at the end of a job",
+            ["kind"],
+            registry=self.registry,
+            buckets=tuple(2**exp for exp in range(20, 35, 2)) + (float("inf"),),
+        )
+        self.work_dir_checkouts = Counter(
+            "hardly_work_dir_checkouts",
+            "Checkouts made in work directories, reused (reset) or cloned",
+            ["kind", "reused"],
+            registry=self.registry,
+        )
+        self.work_dir_reset_duration = Histogram(
+            "hardly_work_dir_reset_duration_seconds",
+            "Time of resetting a checkout left in a work directory by a previous job",
+            ["kind"],
+            registry=self.registry,
+            buckets=(0.5, 1, 2, 5, 10, 30, 60, 120, float("inf")),
+        )
+        self.result_backend_size = Histogram(
+            "hardly_result_backend_bytes",
+            "Size of a task result stored in the result backend",
+            ["task"],
+            registry=self.registry,
+            buckets=(256, 1024, 4096, 16384, 65536, 262144, float("inf")),
+        )
+        self.rate_limit_wait = Histogram(
+            "hardly_rate_limit_wait_seconds",
+            "Time a forge API request waited for the rate limiter",
+            ["host"],
+            registry=self.registry,
+            buckets=(0, 0.1, 0.5, 1, 2, 5, 10, 30, float("inf")),
+        )
+        self.circuit_breaker_state = Gauge(
+            "hardly_circuit_breaker_state",
+            "State of the circuit breaker of a dependency: "
+            "0 closed, 1 half-open, 2 open",
+            ["dependency"],
+            registry=self.registry,
+        )
+        self.circuit_breaker_rejections = Counter(
+            "hardly_circuit_breaker_rejections",
+            "Calls of a dependency rejected because its circuit is open",
+            ["dependency"],
+            registry=self.registry,
+        )
+        self.work_dir_evictions = Counter(
+            "hardly_work_dir_evictions",
+            "Checkouts removed from work directories to stay within their quota",
+            registry=self.registry,
+        )
+
+    def push(self):
+        if not (self.pushgateway_address and self.worker_name):
+            logger.debug("Pushgateway address or worker name not defined.")
+            return
+
+        logger.debug("Pushing hardly metrics to pushgateway.")
+        push_to_gateway(
+            self.pushgateway_address,
+            job=f"hardly-{self.worker_name}",
+            registry=self.registry,
+        )
+
+
+pushgateway = Pushgateway()
@@ -0,0 +1,80 @@
+# Copyright Contributors to the Packit project.
+# SPDX-License-Identifier: MIT
+
+"""
+Compact payloads of the handler tasks.
+
+Only the event fields a handler reads are sent to the broker, the package
+config is stored in Redis once and passed by its digest and the task results
+keep only a digest of the event.
+"""
+
+import json
+from hashlib import sha256
+from logging import getLogger
+from typing import Iterable, Optional
+
+from hardly.cache import get_redis
+from hardly.constants import PACKAGE_CONFIG_TTL
+from packit.exceptions import PackitException
+
+logger = getLogger(__name__)
+
+# Fields read by packit-service's EventData, needed by every handler
+EVENT_DATA_FIELDS = (
+    "event_type",
+    "actor",
+    "user_login",
+    "trigger_id",
+    "project_url",
+    "tag_name",
+    "git_ref",
+    "_pr_id",
+    "pr_id",
+    "commit_sha",
+    "identifier",
+    "created_at",
+)
+
+
+def get_digest(data: dict) -> str:
+    return sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def slim_event(event: dict, fields: Iterable[str]) -> dict:
+    """Only the EventData fields and the fields listed (if present in the event)."""
+    return {
+        field: event[field] for field in (*EVENT_DATA_FIELDS, *fields) if field in event
+    }
+
+
+def store_package_config(package_config: Optional[dict]) -> Optional[dict]:
+    """Store the dumped package config in Redis.
+
+    Returns:
+        Reference to pass to the task instead of the config.
+    """
+    if not package_config:
+        return package_config
+    digest = get_digest(package_config)
+    get_redis().set(
+        f"hardly:package-config:{digest}",
+        json.dumps(package_config),
+        ex=PACKAGE_CONFIG_TTL,
+    )
+    return {"digest": digest}
+
+
+def load_package_config_ref(package_config: Optional[dict]) -> Optional[dict]:
+    """Get the dumped package config the reference points to.
+
+    Package configs passed as they are (not by reference) are returned unchanged.
+    """
+    if not package_config or set(package_config) != {"digest"}:
+        return package_config
+    key = f"hardly:package-config:{package_config['digest']}"
+    if (data := get_redis().get(key)) is None:
+        raise PackitException(f"Package config {package_config['digest']} expired.")
+    # keep it while there are tasks using it
+    get_redis().expire(key, PACKAGE_CONFIG_TTL)
+    return json.loads(data)
@@ -0,0 +1,140 @@
+# Copyright Contributors to the Packit project.
+# SPDX-License-Identifier: MIT
+
+"""
+Opt-in profiling of handler tasks.
+
+A fraction of tasks (PROFILE_SAMPLE_RATE) is profiled with cProfile
+and saved as pstats. With PROFILE_LATENCY_THRESHOLD set, stacks of all tasks
+are sampled and saved (in the collapsed format of flamegraph.pl/speedscope)
+for those which take longer. Files are named after the task and the digest
+of its event:
+
+    <PROFILE_DIR>/<time>-<task>-<event digest>.{pstats,collapsed}
+
+Analyse them e.g. with `python -m pstats <file>` or `flamegraph.pl <file>`.
+"""
+
+import cProfile
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from logging import getLogger
+from pathlib import Path
+from types import FrameType
+from typing import Iterator, Optional
+
+from hardly.constants import (
+    PROFILE_DIR,
+    PROFILE_LATENCY_THRESHOLD,
+    PROFILE_MAX_FILES,
+    PROFILE_SAMPLE_RATE,
+    PROFILE_SAMPLING_INTERVAL,
+)
+from hardly.payload import get_digest
+
+logger = getLogger(__name__)
+
+
+def get_collapsed_stack(frame: Optional[FrameType]) -> str:
+    """Stack of the frame, root first, e.g. `run.py:main;api.py:sync_release`."""
+    names = []
+    while frame:
+        names.append(f"{Path(frame.f_code.co_filename).name}:{frame.f_code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler(threading.Thread):
+    """Periodically sample stacks of a thread and of threads it starts."""
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(name="hardly-stack-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        # threads which existed before, e.g. debugpy's
+        self.ignored = set(sys._current_frames()) - {thread_id}
+        self._stop_event = threading.Event()
+
+    def run(self):
+        self.ignored.add(threading.get_ident())
+        while not self._stop_event.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id not in self.ignored:
+                    self.stacks[get_collapsed_stack(frame)] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def get_profile_path(task_name: str, event: Optional[dict], suffix: str) -> Path:
+    digest = get_digest(event)[:16] if event else "no-event"
+    timestamp = time.strftime("%Y%m%d-%H%M%S")
+    return PROFILE_DIR / f"{timestamp}-{task_name}-{digest}{suffix}"
+
+
+def prune_profiles():
+    profiles = sorted(PROFILE_DIR.iterdir(), key=lambda path: path.stat().st_mtime)
+    for path in profiles[:-PROFILE_MAX_FILES]:
+        path.unlink(missing_ok=True)
+
+
+@contextmanager
+def profiled(task_name: str, event: Optional[dict]) -> Iterator[None]:
+    """Profile the block if it's been sampled or when it's slow."""
+    profile = cProfile.Profile() if random.random() < PROFILE_SAMPLE_RATE else None
+    sampler = (
+        StackSampler(threading.get_ident(), PROFILE_SAMPLING_INTERVAL)
+        if PROFILE_LATENCY_THRESHOLD
+        else None
+    )
+    if not (profile or sampler):
+        yield
+        return
+
+    if sampler:
+        sampler.start()
+    if profile:
+        profile.enable()
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        duration = time.monotonic() - started
+        if profile:
+            profile.disable()
+        if sampler:
+            sampler.stop()
+        try:
+            save_profiles(task_name, event, duration, profile, sampler)
+        except OSError as ex:
+            logger.warning(f"Failed to save profiles of {task_name}: {ex}")
+
+
+def save_profiles(
+    task_name: str,
+    event: Optional[dict],
+    duration: float,
+    profile: Optional[cProfile.Profile],
+    sampler: Optional[StackSampler],
+):
+    saved = []
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    if profile:
+        path = get_profile_path(task_name, event, ".pstats")
+        profile.dump_stats(path)
+        saved.append(path)
+    if sampler and duration >= PROFILE_LATENCY_THRESHOLD:
+        path = get_profile_path(task_name, event, ".collapsed")
+        path.write_text(
+            "".join(f"{stack} {count}\n" for stack, count in sampler.stacks.items())
+        )
+        saved.append(path)
+    if saved:
+        logger.info(f"{task_name} took {duration:.1f}s, profiles saved: {saved}")
+        prune_profiles()
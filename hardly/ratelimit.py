@@ -0,0 +1,211 @@
+# Copyright Contributors to the Packit project.
+# SPDX-License-Identifier: MIT
+
+"""
+Rate limiting of forge API requests shared by all workers.
+
+Each forge instance and token has a token bucket in Redis. Requests take
+a token from it, when the bucket is empty they wait until it refills,
+so that the workers together stay within the forge's rate limit.
+"""
+
+import time
+from functools import lru_cache
+from hashlib import sha256
+from logging import getLogger
+from typing import Optional
+from urllib.parse import urlparse
+
+import gitlab
+from requests import PreparedRequest, Response, Session
+from requests.adapters import HTTPAdapter
+
+from hardly.cache import get_redis
+from hardly.circuit_breaker import (
+    CircuitBreaker,
+    get_circuit_breaker,
+    is_unavailable,
+)
+from hardly.constants import FORGE_POOL_MAXSIZE, FORGE_RATE_LIMITS
+from hardly.monitoring import pushgateway
+from ogr.services.gitlab import GitlabService
+from ogr.services.pagure import PagureService
+from packit_service.config import ServiceConfig
+
+logger = getLogger(__name__)
+
+# Take a token, possibly going into debt, and return how long (in seconds)
+# the caller has to wait before the token is there.
+# Redis time is used so that workers' clocks don't matter.
+TAKE_TOKEN = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "updated")
+local tokens = tonumber(bucket[1]) or burst
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate) - 1
+redis.call("HSET", KEYS[1], "tokens", tokens, "updated", now)
+redis.call("EXPIRE", KEYS[1], math.ceil((burst - tokens) / rate) + 1)
+if tokens >= 0 then
+    return "0"
+end
+return tostring(-tokens / rate)
+"""
+
+
+@lru_cache(maxsize=None)
+def get_take_token_script():
+    return get_redis().register_script(TAKE_TOKEN)
+
+
+class TokenBucket:
+    """Token bucket of a forge instance and token, shared via Redis."""
+
+    def __init__(self, host: str, token: Optional[str], rate: float, burst: int):
+        token_hash = sha256((token or "").encode()).hexdigest()[:16]
+        self.key = f"hardly:rate-limit:{host}:{token_hash}"
+        self.host = host
+        self.rate = rate
+        self.burst = burst
+
+    def acquire(self) -> float:
+        """Wait for a token.
+
+        Returns:
+            How long (in seconds) it has been waited.
+        """
+        wait = float(
+            get_take_token_script()(keys=[self.key], args=[self.rate, self.burst])
+        )
+        if wait > 0:
+            logger.debug(f"Rate limit of {self.host} reached, waiting {wait:.2f}s.")
+            time.sleep(wait)
+        pushgateway.rate_limit_wait.labels(host=self.host).observe(wait)
+        return wait
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """Keep-alive connection pool whose requests go through a TokenBucket.
+
+    With a circuit breaker, requests fail fast while the forge is unavailable
+    and connection failures, timeouts and 5xx responses are recorded.
+    """
+
+    def __init__(
+        self,
+        bucket: Optional[TokenBucket],
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        **kwargs,
+    ):
+        self.bucket = bucket
+        self.circuit_breaker = circuit_breaker
+        super().__init__(**kwargs)
+
+    def send(self, request: PreparedRequest, **kwargs) -> Response:
+        if not self.circuit_breaker:
+            return self._send(request, **kwargs)
+        self.circuit_breaker.check()
+        try:
+            response = self._send(request, **kwargs)
+        except Exception as ex:
+            if is_unavailable(ex):
+                self.circuit_breaker.record_failure()
+            raise
+        if response.status_code >= 500:
+            self.circuit_breaker.record_failure()
+        else:
+            self.circuit_breaker.record_success()
+        return response
+
+    def _send(self, request: PreparedRequest, **kwargs) -> Response:
+        if self.bucket:
+            self.bucket.acquire()
+        return super().send(request, **kwargs)
+
+
+class LazyAuthGitlab(gitlab.Gitlab):
+    """Gitlab client authenticating when its user is needed for the first time.
+
+    ogr authenticates right when it creates the client, i.e. before
+    the rate-limited adapter can be mounted into its session.
+    """
+
+    _user = None
+
+    @property
+    def user(self):
+        if self._user is None and self.private_token:
+            self.auth()
+        return self._user
+
+    @user.setter
+    def user(self, user):
+        self._user = user
+
+
+def get_gitlab_session(service: GitlabService) -> Session:
+    """Session of the service's Gitlab client, created without sending any request."""
+    if not service._gitlab_instance:
+        service._gitlab_instance = LazyAuthGitlab(
+            url=service.instance_url,
+            private_token=service.token,
+            ssl_verify=service.ssl_verify,
+        )
+    return service._gitlab_instance.session
+
+
+def mount_rate_limited_adapter(
+    session: Session,
+    instance_url: str,
+    token: Optional[str],
+    dependency: Optional[str] = None,
+):
+    """Mount a RateLimitedAdapter for the instance, keeping the retries of the session.
+
+    Args:
+        session: Session of the ogr service.
+        instance_url: URL of the forge instance.
+        token: Token the service uses, requests with different tokens
+            are limited separately.
+        dependency: Name of the circuit breaker guarding the requests.
+    """
+    host = urlparse(instance_url).netloc
+    if isinstance(session.get_adapter(instance_url), RateLimitedAdapter):
+        return
+    limit = FORGE_RATE_LIMITS.get(host)
+    adapter = RateLimitedAdapter(
+        bucket=TokenBucket(host, token, limit["rate"], limit["burst"])
+        if limit
+        else None,
+        circuit_breaker=get_circuit_breaker(dependency) if dependency else None,
+        max_retries=session.get_adapter(instance_url).max_retries,
+        pool_maxsize=FORGE_POOL_MAXSIZE,
+    )
+    # the more specific prefix wins over the default "https://" adapter
+    session.mount(f"{urlparse(instance_url).scheme}://{host}", adapter)
+    logger.debug(f"Requests to {host} rate limited by {limit}.")
+
+
+def install_rate_limiters(service_config: ServiceConfig):
+    """Route the API requests of the configured forges through rate-limited pools.
+
+    Meant to be called once per process, the sessions stay for its whole life.
+    No request is sent, so it doesn't depend on the forges being available.
+    """
+    for service in service_config.services:
+        if isinstance(service, GitlabService):
+            mount_rate_limited_adapter(
+                get_gitlab_session(service),
+                service.instance_url,
+                service.token,
+                dependency="gitlab",
+            )
+        elif isinstance(service, PagureService):
+            mount_rate_limited_adapter(
+                service.session,
+                service.instance_url,
+                service.token,
+                dependency="pagure",
+            )
@@ -0,0 +1,87 @@
+# Copyright Contributors to the Packit project.
+# SPDX-License-Identifier: MIT
+
+"""
+Priorities of hardly's tasks.
+
+With the Redis broker, 0 is the highest priority and 9 the lowest.
+"""
+
+import time
+from logging import getLogger
+from typing import Optional
+from uuid import uuid4
+
+from hardly.cache import get_redis
+from hardly.constants import FAIR_SHARE_LIMIT, FAIR_SHARE_MAX_PENALTY, FAIR_SHARE_WINDOW
+from hardly.handlers.abstract import TaskName
+from packit_service.worker.events.enums import GitlabEventAction
+from packit_service.worker.reporting import BaseCommitStatus
+
+logger = getLogger(__name__)
+
+HIGHEST_PRIORITY = 0
+LOWEST_PRIORITY = 9
+DEFAULT_PRIORITY = 5
+
+TASK_PRIORITIES = {
+    # a contributor is waiting for the dist-git MR
+    TaskName.dist_git_pr: 2,
+    TaskName.update_source_git: 4,
+    TaskName.sync_from_gitlab_mr: 6,
+    TaskName.sync_from_pagure_pr: 6,
+    TaskName.reconcile_dist_git_statuses: 8,
+    TaskName.reconcile_dist_git_statuses_shard: 8,
+}
+# MR events which create a dist-git MR
+URGENT_ACTIONS = (GitlabEventAction.opened.value, GitlabEventAction.reopen.value)
+INTERMEDIATE_STATES = (BaseCommitStatus.pending, BaseCommitStatus.running)
+
+
+class FairShare:
+    """Sliding window of tasks recently enqueued for a repository.
+
+    A repository with a lot of events (e.g. a mass rebuild) gets its tasks
+    deprioritized, so that it doesn't keep the workers from other repositories.
+    """
+
+    def __init__(self, project_url: str):
+        self.key = f"hardly:fair-share:{project_url}"
+
+    def penalty(self) -> int:
+        """Record a task of the repository and get how much to lower its priority."""
+        if not FAIR_SHARE_LIMIT:
+            return 0
+        now = time.time()
+        pipe = get_redis().pipeline()
+        pipe.zremrangebyscore(self.key, 0, now - FAIR_SHARE_WINDOW)
+        pipe.zadd(self.key, {uuid4().hex: now})
+        pipe.zcard(self.key)
+        pipe.expire(self.key, FAIR_SHARE_WINDOW)
+        _, _, count, _ = pipe.execute()
+        return min(FAIR_SHARE_MAX_PENALTY, (count - 1) // FAIR_SHARE_LIMIT)
+
+
+def get_priority(
+    task_name: TaskName,
+    project_url: Optional[str] = None,
+    action: Optional[str] = None,
+    ci_state: Optional[BaseCommitStatus] = None,
+) -> int:
+    """Priority of a task.
+
+    Args:
+        task_name: Task to be enqueued.
+        project_url: Repository the event came from, for the fair share.
+        action: Action of an MR event, opened/reopened MRs go first.
+        ci_state: State of a dist-git CI event, final states go before
+            the intermediate (pending/running) ones.
+    """
+    priority = TASK_PRIORITIES.get(task_name, DEFAULT_PRIORITY)
+    if action in URGENT_ACTIONS:
+        priority = HIGHEST_PRIORITY
+    elif ci_state and ci_state not in INTERMEDIATE_STATES:
+        priority -= 1
+    if project_url:
+        priority += FairShare(project_url).penalty()
+    return max(HIGHEST_PRIORITY, min(LOWEST_PRIORITY, priority))
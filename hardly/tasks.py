@@ -2,19 +2,56 @@
 # SPDX-License-Identifier: MIT
 
 import logging
+import random
+from datetime import timedelta
 from os import getenv
-from typing import List
+from typing import List, Optional, Tuple, Union
 
 from celery import Task
+from celery.exceptions import Ignore
+from celery.backends.redis import RedisBackend
+from celery.signals import (
+    before_task_publish,
+    task_postrun,
+    task_prerun,
+    worker_process_init,
+)
 
-from hardly.handlers.abstract import TaskName
+from hardly.autoscaling import (
+    TASK_ROUTES,
+    record_finished,
+    record_published,
+    record_started,
+)
+from hardly.backfill import reconcile_shard
+from hardly.circuit_breaker import (
+    CircuitOpenError,
+    find_circuit_open_error,
+    get_circuit_breaker,
+    install_database_circuit_breaker,
+)
+from hardly.constants import (
+    MAX_TASK_DEFERRALS,
+    RECONCILE_INTERVAL,
+    RECONCILE_SHARDS,
+    RESULT_TTL,
+)
+from hardly.handlers.abstract import HandlerBusyError, TaskName
 from hardly.handlers.distgit import (
     DistGitMRHandler,
     SyncFromGitlabMRHandler,
     SyncFromPagurePRHandler,
+    UpdateSourceGitHandler,
 )
 from hardly.jobs import StreamJobs
+from hardly.monitoring import pushgateway
+from hardly.payload import get_digest, load_package_config_ref
+from hardly.profiling import profiled
+from hardly.ratelimit import install_rate_limiters
+from hardly.scheduling import DEFAULT_PRIORITY, LOWEST_PRIORITY, TASK_PRIORITIES
+from hardly.workdir import work_dir_pool
 from packit_service.celerizer import celery_app
+from packit_service.config import ServiceConfig
 from packit_service.constants import (
     DEFAULT_RETRY_LIMIT,
     DEFAULT_RETRY_BACKOFF,
@@ -53,6 +90,46 @@ logging.getLogger("packit").setLevel(logging.DEBUG)
 logging.getLogger("sandcastle").setLevel(logging.DEBUG)
 
 
+# Priorities (see hardly.scheduling) with the Redis broker:
+# a list per priority, the higher priority lists are emptied first.
+celery_app.conf.broker_transport_options = {
+    **celery_app.conf.broker_transport_options,
+    "priority_steps": list(range(LOWEST_PRIORITY + 1)),
+    "sep": ":",
+    "queue_order_strategy": "priority",
+}
+celery_app.conf.task_default_priority = DEFAULT_PRIORITY
+# Don't let a worker process reserve low priority tasks ahead of time.
+celery_app.conf.worker_prefetch_multiplier = 1
+# Heavy and light tasks go to different queues, see hardly.autoscaling.
+celery_app.conf.task_routes = TASK_ROUTES
+before_task_publish.connect(record_published)
+task_prerun.connect(record_started)
+task_postrun.connect(record_finished)
+
+
+@worker_process_init.connect
+def claim_work_dir(**_):
+    # so that each worker process has its work directory ready before its first task
+    work_dir_pool.claim()
+
+
+@worker_process_init.connect
+def setup_forge_sessions(**_):
+    # Celery only logs exceptions of signal handlers, don't let the process
+    # run without the rate limiters and circuit breakers of the forges.
+    try:
+        install_rate_limiters(ServiceConfig.get_service_config())
+    except Exception as ex:
+        logger.exception("Failed to set up rate limiting of the forges.")
+        raise SystemExit(1) from ex
+
+
+@worker_process_init.connect
+def setup_database_circuit_breaker(**_):
+    install_database_circuit_breaker()
+
+
 # Don't import this (or anything) from p_s.worker.tasks,
 # it would create the task from their process_message()
 class HandlerTaskWithRetry(Task):
@@ -61,6 +138,102 @@ class HandlerTaskWithRetry(Task):
         "max_retries": int(getenv("CELERY_RETRY_LIMIT", DEFAULT_RETRY_LIMIT))
     }
     retry_backoff = int(getenv("CELERY_RETRY_BACKOFF", DEFAULT_RETRY_BACKOFF))
+    # Seconds the result is kept in the result backend (at most result_expires),
+    # None = result_expires
+    result_ttl: Optional[int] = None
+    # Whether it's been logged that the result backend is not Redis
+    _backend_unsupported_logged = False
+    # Circuit breakers checked before the task is run, see hardly.circuit_breaker
+    # (git remotes are checked by the handlers, their hosts aren't known up front)
+    dependencies: Tuple[str, ...] = ()
+    # Message header counting how many times the task has been deferred
+    deferrals_header = "hardly_deferrals"
+
+    def __call__(self, *args, **kwargs):
+        if not self.request.called_directly:
+            try:
+                for dependency in self.dependencies:
+                    get_circuit_breaker(dependency).check()
+            except CircuitOpenError as ex:
+                if not self.defer(ex):
+                    raise
+                return None
+        with profiled(self.name, kwargs.get("event")):
+            return super().__call__(*args, **kwargs)
+
+    def retry(self, args=None, kwargs=None, exc=None, **options):
+        if ex := find_circuit_open_error(exc) or (
+            exc if isinstance(exc, HandlerBusyError) else None
+        ):
+            if not self.defer(ex):
+                raise exc
+            raise Ignore()
+        return super().retry(args=args, kwargs=kwargs, exc=exc, **options)
+
+    def defer(self, ex: Union[CircuitOpenError, HandlerBusyError]) -> bool:
+        """Run the task again once the circuit closes (or the handler isn't busy).
+
+        It's a new task, the retries of this one are not used up
+        and all the tasks waiting for the dependency are deferred at once.
+
+        Returns:
+            False if the task has already been deferred MAX_TASK_DEFERRALS times.
+        """
+        deferrals = self.get_deferrals()
+        if deferrals >= MAX_TASK_DEFERRALS:
+            logger.error(f"{ex} {self.name} deferred {deferrals} times, giving up.")
+            return False
+        # don't let them all come back at the same time
+        countdown = ex.retry_in + random.uniform(0, 0.5 * ex.retry_in)
+        logger.info(f"{ex} Deferring {self.name} by {countdown:.0f}s.")
+        self.apply_async(
+            args=self.request.args,
+            kwargs=self.request.kwargs,
+            countdown=countdown,
+            priority=(self.request.delivery_info or {}).get("priority"),
+            headers={self.deferrals_header: deferrals + 1},
+        )
+        return True
+
+    def get_deferrals(self) -> int:
+        """How many times the task has been deferred."""
+        # Custom headers become attributes of the request (message protocol 2).
+        deferrals = getattr(self.request, self.deferrals_header, None) or (
+            self.request.headers or {}
+        ).get(self.deferrals_header)
+        return int(deferrals or 0)
+
+    def get_result_ttl(self) -> Optional[int]:
+        """Seconds the result is kept, None if it's up to result_expires."""
+        if not self.result_ttl:
+            return None
+        expires = self.app.conf.result_expires
+        if isinstance(expires, timedelta):
+            expires = expires.total_seconds()
+        return int(min(self.result_ttl, expires)) if expires else self.result_ttl
+
+    def after_return(self, status, retval, task_id, args, kwargs, einfo):
+        # the result has already been stored at this point
+        if not self.ignore_result:
+            self.bound_result(task_id)
+        pushgateway.push()
+
+    def bound_result(self, task_id: str):
+        """Report the size of the stored result and shorten its TTL."""
+        if not isinstance(self.backend, RedisBackend):
+            if not HandlerTaskWithRetry._backend_unsupported_logged:
+                logger.warning(
+                    "Result TTL and size are supported only with the Redis result "
+                    f"backend, not {type(self.backend).__name__}."
+                )
+                HandlerTaskWithRetry._backend_unsupported_logged = True
+            return
+        key = self.backend.get_key_for_task(task_id)
+        pushgateway.result_backend_size.labels(task=self.name).observe(
+            self.backend.client.strlen(key)
+        )
+        if ttl := self.get_result_ttl():
+            self.backend.expire(key, ttl)
 
 
 @celery_app.task(
@@ -80,40 +253,126 @@ def hardly_process(
     return StreamJobs().process_message(event=event, topic=topic, source=source)
 
 
-@celery_app.task(name=TaskName.dist_git_pr, base=HandlerTaskWithRetry)
+@celery_app.task(
+    name=TaskName.dist_git_pr,
+    base=HandlerTaskWithRetry,
+    result_ttl=RESULT_TTL,
+    dependencies=("gitlab", "postgresql"),
+)
 def run_dist_git_sync_handler(event: dict, package_config: dict, job_config: dict):
     handler = DistGitMRHandler(
-        package_config=load_package_config(package_config),
+        package_config=load_package_config(load_package_config_ref(package_config)),
         job_config=load_job_config(job_config),
         event=event,
     )
-    return get_handlers_task_results(handler.run_job(), event)
+    return get_handlers_task_results(
+        summarize_job_results(handler.run_job(), keep=("branches",)), event
+    )
 
 
-@celery_app.task(name=TaskName.sync_from_gitlab_mr, base=HandlerTaskWithRetry)
+# Nobody reads results of the status syncs.
+@celery_app.task(
+    name=TaskName.sync_from_gitlab_mr,
+    base=HandlerTaskWithRetry,
+    ignore_result=True,
+    dependencies=("gitlab", "postgresql"),
+)
 def run_sync_from_gitlab_mr_handler(
     event: dict, package_config: dict, job_config: dict
 ):
     handler = SyncFromGitlabMRHandler(
-        package_config=load_package_config(package_config),
+        package_config=load_package_config(load_package_config_ref(package_config)),
         job_config=load_job_config(job_config),
         event=event,
     )
     return get_handlers_task_results(handler.run_job(), event)
 
 
-@celery_app.task(name=TaskName.sync_from_pagure_pr, base=HandlerTaskWithRetry)
+@celery_app.task(
+    name=TaskName.sync_from_pagure_pr,
+    base=HandlerTaskWithRetry,
+    ignore_result=True,
+    dependencies=("pagure", "gitlab", "postgresql"),
+)
 def run_sync_from_pagure_pr_handler(
     event: dict, package_config: dict, job_config: dict
 ):
     handler = SyncFromPagurePRHandler(
-        package_config=load_package_config(package_config),
+        package_config=load_package_config(load_package_config_ref(package_config)),
         job_config=load_job_config(job_config),
         event=event,
     )
     return get_handlers_task_results(handler.run_job(), event)
 
 
+@celery_app.task(
+    name=TaskName.update_source_git,
+    base=HandlerTaskWithRetry,
+    result_ttl=RESULT_TTL,
+    dependencies=("gitlab",),
+)
+def run_update_source_git_handler(event: dict, package_config: dict, job_config: dict):
+    handler = UpdateSourceGitHandler(
+        package_config=load_package_config(load_package_config_ref(package_config)),
+        job_config=load_job_config(job_config),
+        event=event,
+    )
+    return get_handlers_task_results(handler.run_job(), event)
+
+
+@celery_app.task(name=TaskName.reconcile_dist_git_statuses, ignore_result=True)
+def run_reconcile_dist_git_statuses(shards: int = RECONCILE_SHARDS):
+    """Periodically reconcile the dist-git CI results with source-git MRs.
+
+    The pairs are split by their dist-git repository into shards,
+    each is reconciled by a separate task, so that workers can share the work.
+    """
+    for shard in range(shards):
+        run_reconcile_dist_git_statuses_shard.apply_async(
+            kwargs={"shard": shard, "shards": shards},
+            priority=TASK_PRIORITIES[TaskName.reconcile_dist_git_statuses_shard],
+        )
+
+
+@celery_app.task(name=TaskName.reconcile_dist_git_statuses_shard, ignore_result=True)
+def run_reconcile_dist_git_statuses_shard(shard: int, shards: int):
+    return reconcile_shard(
+        ServiceConfig.get_service_config(), shard=shard, shards=shards
+    )
+
+
+if RECONCILE_INTERVAL:
+    # Only hardly's tasks are registered in this worker, hence not updating
+    # packit-service's schedule.
+    celery_app.conf.beat_schedule = {
+        "reconcile-dist-git-statuses": {
+            "task": TaskName.reconcile_dist_git_statuses.value,
+            "schedule": RECONCILE_INTERVAL,
+            "options": {
+                "priority": TASK_PRIORITIES[TaskName.reconcile_dist_git_statuses]
+            },
+        },
+    }
+
+
+def summarize_job_results(results: dict, keep: tuple = ()) -> dict:
+    """Compact job results: success, message and only the listed details."""
+    return {
+        key: {
+            "success": result["success"],
+            "details": {
+                name: value
+                for name, value in result.get("details", {}).items()
+                if name in ("msg", *keep)
+            },
+        }
+        for key, result in results.items()
+    }
+
+
 def get_handlers_task_results(results: dict, event: dict) -> dict:
-    # include original event to provide more info
-    return {"job": results, "event": event}
+    # identify the original event, the whole of it would bloat the result backend
+    return {
+        "job": results,
+        "event": {"event_type": event.get("event_type"), "digest": get_digest(event)},
+    }
@@ -0,0 +1,133 @@
+# Copyright Contributors to the Packit project.
+# SPDX-License-Identifier: MIT
+
+import fcntl
+import shutil
+import tempfile
+import time
+from logging import getLogger
+from pathlib import Path
+from typing import IO, Callable, Optional
+
+from hardly.checkout import get_disk_usage
+from hardly.constants import (
+    WORK_DIR_MAX_AGE,
+    WORK_DIR_POOL,
+    WORK_DIR_SLOT_QUOTA,
+    WORK_DIR_SLOTS,
+)
+from hardly.monitoring import pushgateway
+
+logger = getLogger(__name__)
+
+
+def evict(
+    directory: Path,
+    quota: int = 0,
+    max_age: int = 0,
+    in_use: Optional[Callable[[Path], bool]] = None,
+):
+    """Remove the least recently used entries (e.g. checkouts) of a directory.
+
+    Entries which haven't been used for more than max_age seconds are removed,
+    then the least recently used ones until the directory takes at most quota bytes.
+    Entries are used when their modification time is updated (see Checkout.reset()).
+
+    Args:
+        directory: Directory to be cleaned up.
+        quota: Disk space (in bytes) the entries can take, 0 = no limit.
+        max_age: Seconds an entry is kept after it's been used, 0 = no limit.
+        in_use: Tells if an entry is being used (e.g. by another process),
+            such entries are never removed.
+    """
+    entries = sorted(directory.iterdir(), key=lambda path: path.stat().st_mtime)
+    usage = {path: get_disk_usage(path) for path in entries} if quota else {}
+    total = sum(usage.values())
+    now = time.time()
+    for path in entries:
+        expired = max_age and now - path.stat().st_mtime > max_age
+        if not (expired or (quota and total > quota)):
+            break
+        if in_use and in_use(path):
+            continue
+        if expired:
+            logger.info(f"{path} hasn't been used for {max_age}s, removing it.")
+        else:
+            logger.info(
+                f"{directory} takes {total} bytes (quota {quota}), removing {path}."
+            )
+        if path.is_dir():
+            shutil.rmtree(path)
+        else:
+            path.unlink()
+        total -= usage.get(path, 0)
+        pushgateway.work_dir_evictions.inc()
+
+
+class WorkDirPool:
+    """Work directories kept between the jobs, one slot per worker process.
+
+    A worker process claims a free slot (root/slot-<n>, locked by root/slot-<n>.lock)
+    when it starts and keeps it until it exits. Checkouts stay in the slot and
+    the next job resets them (see Checkout.reset()) instead of cloning again.
+    After each job, checkouts older than max_age and the least recently used ones
+    exceeding the slot's quota are removed, see evict().
+
+    If all the slots are taken, the job gets a temporary directory,
+    which is removed afterwards.
+    """
+
+    def __init__(self, root: Path, slots: int, quota: int = 0, max_age: int = 0):
+        self.root = root
+        self.slots = slots
+        self.quota = quota
+        self.max_age = max_age
+        self.slot: Optional[Path] = None
+        self._lock: Optional[IO] = None
+        self._tmp_dir: Optional[Path] = None
+
+    def claim(self) -> Optional[Path]:
+        """Claim a slot for this process, if not claimed already.
+
+        Returns:
+            The slot, None if all of them are taken by other processes.
+        """
+        if self.slot:
+            return self.slot
+        self.root.mkdir(parents=True, exist_ok=True)
+        for number in range(self.slots):
+            lock = (self.root / f"slot-{number}.lock").open("w")
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock.close()
+                continue
+            # released by the OS when the process exits
+            self._lock = lock
+            self.slot = self.root / f"slot-{number}"
+            self.slot.mkdir(exist_ok=True)
+            logger.info(f"Claimed work directory {self.slot}.")
+            return self.slot
+        logger.warning(f"All {self.slots} work directories in {self.root} are taken.")
+        return None
+
+    def get(self) -> Path:
+        """Work directory for the current job."""
+        if slot := self.claim():
+            return slot
+        if not self._tmp_dir:
+            self._tmp_dir = Path(tempfile.mkdtemp(prefix="hardly-"))
+        return self._tmp_dir
+
+    def release(self):
+        """The job is done, remove its temporary directory or enforce the quota."""
+        if self._tmp_dir:
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+            self._tmp_dir = None
+        if self.slot:
+            evict(self.slot, quota=self.quota, max_age=self.max_age)
+
+
+work_dir_pool = WorkDirPool(
+    WORK_DIR_POOL, WORK_DIR_SLOTS, WORK_DIR_SLOT_QUOTA, WORK_DIR_MAX_AGE
+)
@@ -3,6 +3,7 @@
 
 import json
 import pytest
+from tests.fake_forge import FakeForge
 from tests.spellbook import DATA_DIR
 
 
@@ -23,3 +24,9 @@ def fedora_dg_pr_flag_updated_event():
             DATA_DIR / "webhooks" / "gitlab" / "fedora-dg-pr-flag-updated.json"
         ).read_text()
     )
+
+
+@pytest.fixture()
+def fake_forge():
+    with FakeForge() as forge:
+        yield forge
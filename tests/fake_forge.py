@@ -0,0 +1,617 @@
+# Copyright Contributors to the Packit project.
+# SPDX-License-Identifier: MIT
+
+"""
+Local stand-in for the subset of the GitLab and Pagure APIs hardly uses.
+
+One server answers both APIs, GitLab under /api/v4/ and Pagure under /api/0/,
+so the handlers can be run (and benchmarked) end to end without network
+while the forge still behaves like a remote service: every request can be
+delayed, fail randomly and be rate limited per token.
+
+Run it standalone with:
+
+    python -m tests.fake_forge --port 8080 --latency 0.2 --rate-limit 600
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field, asdict
+from hashlib import sha1
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+
+@dataclass
+class ForgeBehaviour:
+    """How the fake forge misbehaves.
+
+    latency: seconds every request is delayed by
+    jitter: maximum of random seconds added to the latency
+    error_rate: probability (0-1) a request fails with error_status
+    error_status: HTTP status of the injected failures
+    rate_limit: number of requests per token allowed in rate_limit_window,
+                None means unlimited
+    rate_limit_window: length of the rate limit window in seconds
+    seed: seed for the random generator to make runs reproducible
+    """
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 500
+    rate_limit: Optional[int] = None
+    rate_limit_window: float = 60.0
+    seed: Optional[int] = None
+
+
+@dataclass
+class FakePullRequest:
+    id: int
+    title: str
+    description: str = ""
+    source_branch: str = "feature"
+    target_branch: str = "main"
+    head_commit: str = ""
+    status: str = "open"
+    author: str = "packit"
+    comments: List[dict] = field(default_factory=list)
+    flags: List[dict] = field(default_factory=list)
+    pipelines: List[dict] = field(default_factory=list)
+
+
+@dataclass
+class FakeProject:
+    namespace: str
+    repo: str
+    branches: List[str] = field(default_factory=lambda: ["main"])
+    pull_requests: Dict[int, FakePullRequest] = field(default_factory=dict)
+    # commit sha -> commit statuses (GitLab) or flags (Pagure)
+    statuses: Dict[str, List[dict]] = field(default_factory=dict)
+    commit_comments: Dict[str, List[dict]] = field(default_factory=dict)
+
+    @property
+    def full_name(self) -> str:
+        return f"{self.namespace}/{self.repo}"
+
+
+# Creation time of everything, GitLab and Pagure format
+CREATED_AT = "2021-01-01T00:00:00.000Z"
+CREATED_TIMESTAMP = "1609459200"
+
+Route = Tuple[str, "re.Pattern", Callable]
+
+
+class FakeForge:
+    """In-memory GitLab + Pagure served over HTTP from a background thread.
+
+    Use it as a context manager, the server is listening inside the block:
+
+        with FakeForge(ForgeBehaviour(latency=0.1)) as forge:
+            forge.add_project("packit-service/src", "open-vm-tools")
+            ... point ogr at forge.url ...
+    """
+
+    def __init__(
+        self,
+        behaviour: Optional[ForgeBehaviour] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.behaviour = behaviour or ForgeBehaviour()
+        self.host = host
+        self.port = port
+        self.projects: Dict[str, FakeProject] = {}
+        self.stats: Dict[str, int] = {
+            "requests": 0,
+            "errors_injected": 0,
+            "rate_limited": 0,
+        }
+        self.route_stats: Dict[str, int] = {}
+
+        self._lock = threading.Lock()
+        self._random = random.Random(self.behaviour.seed)
+        # token -> (window start, requests in window)
+        self._windows: Dict[str, Tuple[float, int]] = {}
+        self._forced_failures: List[int] = []
+        self._last_id = 0
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._routes: List[Route] = self._get_routes()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> "FakeForge":
+        forge = self
+
+        class _Handler(_RequestHandler):
+            fake_forge = forge
+
+        self._server = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="fake-forge", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FakeForge":
+        return self.start()
+
+    def __exit__(self, *_):
+        self.stop()
+
+    def add_project(
+        self, namespace: str, repo: str, branches: Optional[List[str]] = None
+    ) -> FakeProject:
+        project = FakeProject(namespace=namespace, repo=repo)
+        if branches is not None:
+            project.branches = list(branches)
+        with self._lock:
+            self.projects[project.full_name] = project
+        return project
+
+    def add_pull_request(
+        self, namespace: str, repo: str, title: str, **kwargs
+    ) -> FakePullRequest:
+        project = self.projects[f"{namespace}/{repo}"]
+        with self._lock:
+            pr_id = kwargs.pop("id", None) or len(project.pull_requests) + 1
+            pr = FakePullRequest(id=pr_id, title=title, **kwargs)
+            if not pr.head_commit:
+                pr.head_commit = sha1(
+                    f"{project.full_name}#{pr_id}".encode()
+                ).hexdigest()
+            project.pull_requests[pr_id] = pr
+        return pr
+
+    def _next_id(self) -> int:
+        with self._lock:
+            self._last_id += 1
+            return self._last_id
+
+    def fail_next(self, count: int = 1, status: Optional[int] = None):
+        """Make the next `count` requests fail, regardless of error_rate."""
+        with self._lock:
+            self._forced_failures.extend(
+                [status or self.behaviour.error_status] * count
+            )
+
+    # Request processing
+
+    def _throttle(self, token: str) -> Optional[Dict[str, str]]:
+        """Count the request in the token's window.
+
+        Returns:
+            Headers of the 429 response if the token is over the limit, else None.
+        """
+        limit = self.behaviour.rate_limit
+        if limit is None:
+            return None
+        window = self.behaviour.rate_limit_window
+        now = time.monotonic()
+        with self._lock:
+            start, count = self._windows.get(token, (now, 0))
+            if now - start >= window:
+                start, count = now, 0
+            count += 1
+            self._windows[token] = (start, count)
+        if count <= limit:
+            return None
+        reset = max(start + window - now, 0)
+        return {
+            "Retry-After": str(int(reset) + 1),
+            "RateLimit-Limit": str(limit),
+            "RateLimit-Remaining": "0",
+            "RateLimit-Reset": str(int(time.time() + reset)),
+        }
+
+    def _injected_error(self) -> Optional[int]:
+        with self._lock:
+            if self._forced_failures:
+                return self._forced_failures.pop(0)
+            if self._random.random() < self.behaviour.error_rate:
+                return self.behaviour.error_status
+        return None
+
+    def _delay(self):
+        with self._lock:
+            delay = self.behaviour.latency + self._random.uniform(
+                0, self.behaviour.jitter
+            )
+        if delay > 0:
+            time.sleep(delay)
+
+    def handle(
+        self, method: str, path: str, token: str, data: dict
+    ) -> Tuple[int, object, Dict[str, str]]:
+        """Process one request.
+
+        Returns:
+            HTTP status, JSON-serializable body and extra headers.
+        """
+        self._delay()
+        with self._lock:
+            self.stats["requests"] += 1
+
+        if headers := self._throttle(token):
+            with self._lock:
+                self.stats["rate_limited"] += 1
+            return 429, {"message": "429 Too Many Requests"}, headers
+
+        if status := self._injected_error():
+            with self._lock:
+                self.stats["errors_injected"] += 1
+            return status, {"message": "Injected failure"}, {}
+
+        for route_method, pattern, callback in self._routes:
+            if route_method != method or not (m := pattern.fullmatch(path)):
+                continue
+            with self._lock:
+                self.route_stats[callback.__name__] = (
+                    self.route_stats.get(callback.__name__, 0) + 1
+                )
+            try:
+                status, body = callback(data, *[unquote(g) for g in m.groups()])
+            except KeyError:
+                return 404, {"message": "404 Not Found"}, {}
+            return status, body, {}
+        return 404, {"message": "404 Not Found"}, {}
+
+    def _get_routes(self) -> List[Route]:
+        gl_project = r"/api/v4/projects/([^/]+)"
+        gl_mr = gl_project + r"/merge_requests/(\d+)"
+        pg_project = r"/api/0/(.+?)"
+        pg_pr = pg_project + r"/pull-request/(\d+)"
+        routes = [
+            ("GET", r"/api/v4/user", self._gitlab_user),
+            ("GET", gl_project, self._gitlab_project),
+            ("GET", gl_project + r"/repository/branches", self._gitlab_branches),
+            ("GET", gl_project + r"/repository/commits/(\w+)", self._gitlab_commit),
+            ("GET", gl_project + r"/merge_requests", self._gitlab_mr_list),
+            ("POST", gl_project + r"/merge_requests", self._gitlab_mr_create),
+            ("GET", gl_mr, self._gitlab_mr),
+            ("GET", gl_mr + r"/notes", self._gitlab_mr_notes),
+            ("POST", gl_mr + r"/notes", self._gitlab_mr_comment),
+            ("POST", gl_project + r"/statuses/(\w+)", self._gitlab_set_status),
+            (
+                "GET",
+                gl_project + r"/repository/commits/(\w+)/statuses",
+                self._gitlab_statuses,
+            ),
+            (
+                "POST",
+                gl_project + r"/repository/commits/(\w+)/comments",
+                self._gitlab_commit_comment,
+            ),
+            ("POST", r"/api/0/-/whoami", self._pagure_whoami),
+            ("GET", pg_project + r"/git/branches", self._pagure_branches),
+            ("GET", pg_project + r"/pull-requests", self._pagure_pr_list),
+            ("GET", pg_pr, self._pagure_pr),
+            ("POST", pg_pr + r"/comment", self._pagure_pr_comment),
+            ("GET", pg_pr + r"/flag", self._pagure_pr_flags),
+            ("POST", pg_pr + r"/flag", self._pagure_pr_set_flag),
+            ("GET", pg_project + r"/c/(\w+)/flag", self._pagure_commit_flags),
+            ("POST", pg_project + r"/c/(\w+)/flag", self._pagure_commit_flag),
+            ("GET", pg_project, self._pagure_project),
+        ]
+        return [(method, re.compile(p), callback) for method, p, callback in routes]
+
+    # GitLab API
+
+    def _gitlab_project_json(self, project: FakeProject) -> dict:
+        return {
+            "id": project.full_name,
+            "name": project.repo,
+            "path": project.repo,
+            "path_with_namespace": project.full_name,
+            "namespace": {"full_path": project.namespace},
+            "web_url": f"{self.url}/{project.full_name}",
+            "default_branch": project.branches[0] if project.branches else None,
+        }
+
+    def _gitlab_mr_json(self, project: FakeProject, pr: FakePullRequest) -> dict:
+        return {
+            "id": pr.id,
+            "iid": pr.id,
+            "project_id": project.full_name,
+            "source_project_id": project.full_name,
+            "target_project_id": project.full_name,
+            "title": pr.title,
+            "description": pr.description,
+            "state": {"open": "opened"}.get(pr.status, pr.status),
+            "source_branch": pr.source_branch,
+            "target_branch": pr.target_branch,
+            "sha": pr.head_commit,
+            "author": {"username": pr.author},
+            "created_at": CREATED_AT,
+            "updated_at": CREATED_AT,
+            "web_url": f"{self.url}/{project.full_name}/-/merge_requests/{pr.id}",
+            "head_pipeline": pr.pipelines[-1] if pr.pipelines else None,
+        }
+
+    def _gitlab_user(self, _):
+        return 200, {"id": 1, "username": "packit"}
+
+    def _gitlab_project(self, _, full_name):
+        return 200, self._gitlab_project_json(self.projects[full_name])
+
+    def _gitlab_branches(self, _, full_name):
+        project = self.projects[full_name]
+        return 200, [{"name": b} for b in project.branches]
+
+    def _gitlab_mr_list(self, _, full_name):
+        project = self.projects[full_name]
+        return 200, [
+            self._gitlab_mr_json(project, pr) for pr in project.pull_requests.values()
+        ]
+
+    def _gitlab_mr_create(self, data, full_name):
+        project = self.projects[full_name]
+        pr = self.add_pull_request(
+            project.namespace,
+            project.repo,
+            title=data.get("title", ""),
+            description=data.get("description", ""),
+            source_branch=data.get("source_branch", "feature"),
+            target_branch=data.get("target_branch", "main"),
+        )
+        return 201, self._gitlab_mr_json(project, pr)
+
+    def _gitlab_mr(self, _, full_name, pr_id):
+        project = self.projects[full_name]
+        return 200, self._gitlab_mr_json(project, project.pull_requests[int(pr_id)])
+
+    def _gitlab_mr_notes(self, _, full_name, pr_id):
+        return 200, self.projects[full_name].pull_requests[int(pr_id)].comments
+
+    def _gitlab_mr_comment(self, data, full_name, pr_id):
+        pr = self.projects[full_name].pull_requests[int(pr_id)]
+        with self._lock:
+            note = {
+                "id": len(pr.comments) + 1,
+                "body": data.get("body", ""),
+                "author": {"username": "packit"},
+                "created_at": CREATED_AT,
+                "updated_at": CREATED_AT,
+            }
+            pr.comments.append(note)
+        return 201, note
+
+    def _gitlab_commit(self, _, full_name, sha):
+        self.projects[full_name]
+        return 200, {"id": sha, "short_id": sha[:8], "title": "", "message": ""}
+
+    def _gitlab_set_status(self, data, full_name, sha):
+        project = self.projects[full_name]
+        status = {
+            "id": self._next_id(),
+            "sha": sha,
+            "status": data.get("state"),
+            "name": data.get("name") or data.get("context"),
+            "description": data.get("description"),
+            "target_url": data.get("target_url"),
+            "created_at": CREATED_AT,
+        }
+        with self._lock:
+            statuses = project.statuses.setdefault(sha, [])
+            statuses[:] = [s for s in statuses if s["name"] != status["name"]]
+            statuses.append(status)
+        return 201, status
+
+    def _gitlab_statuses(self, _, full_name, sha):
+        return 200, self.projects[full_name].statuses.get(sha, [])
+
+    def _gitlab_commit_comment(self, data, full_name, sha):
+        project = self.projects[full_name]
+        comment = {
+            "note": data.get("note", ""),
+            "path": data.get("path"),
+            "author": {"username": "packit"},
+            "created_at": CREATED_AT,
+        }
+        with self._lock:
+            project.commit_comments.setdefault(sha, []).append(comment)
+        return 201, comment
+
+    # Pagure API
+
+    def _pagure_pr_json(self, project: FakeProject, pr: FakePullRequest) -> dict:
+        return {
+            "id": pr.id,
+            "title": pr.title,
+            "initial_comment": pr.description,
+            "status": pr.status.capitalize(),
+            "branch": pr.target_branch,
+            "branch_from": pr.source_branch,
+            "commit_stop": pr.head_commit,
+            "user": {"name": pr.author},
+            "comments": pr.comments,
+            "project": self._pagure_project_json(project),
+            "repo_from": self._pagure_project_json(project),
+            "date_created": CREATED_TIMESTAMP,
+            "last_updated": CREATED_TIMESTAMP,
+        }
+
+    def _pagure_whoami(self, _):
+        return 200, {"username": "packit"}
+
+    def _pagure_project_json(self, project: FakeProject) -> dict:
+        return {
+            "name": project.repo,
+            "namespace": project.namespace,
+            "fullname": project.full_name,
+            "url_path": project.full_name,
+            "full_url": f"{self.url}/{project.full_name}",
+        }
+
+    @staticmethod
+    def _pagure_flag_json(data: dict, sha: str) -> dict:
+        return {
+            "username": data.get("username"),
+            "comment": data.get("comment"),
+            "status": data.get("status"),
+            "url": data.get("url"),
+            "uid": data.get("uid") or data.get("username"),
+            "commit_hash": sha,
+            "date_created": CREATED_TIMESTAMP,
+            "date_updated": CREATED_TIMESTAMP,
+        }
+
+    def _pagure_project(self, _, full_name):
+        return 200, self._pagure_project_json(self.projects[full_name])
+
+    def _pagure_branches(self, _, full_name):
+        return 200, {"branches": self.projects[full_name].branches}
+
+    def _pagure_pr_list(self, _, full_name):
+        project = self.projects[full_name]
+        requests = [
+            self._pagure_pr_json(project, pr) for pr in project.pull_requests.values()
+        ]
+        return 200, {
+            "requests": requests,
+            "total_requests": len(requests),
+            "pagination": {"next": None},
+        }
+
+    def _pagure_pr(self, _, full_name, pr_id):
+        project = self.projects[full_name]
+        return 200, self._pagure_pr_json(project, project.pull_requests[int(pr_id)])
+
+    def _pagure_pr_comment(self, data, full_name, pr_id):
+        pr = self.projects[full_name].pull_requests[int(pr_id)]
+        with self._lock:
+            pr.comments.append(
+                {
+                    "id": len(pr.comments) + 1,
+                    "comment": data["comment"],
+                    "user": {"name": "packit"},
+                    "date_created": CREATED_TIMESTAMP,
+                    "edited_on": None,
+                }
+            )
+        return 200, {"message": "Comment added"}
+
+    def _pagure_pr_flags(self, _, full_name, pr_id):
+        return 200, {"flags": self.projects[full_name].pull_requests[int(pr_id)].flags}
+
+    def _pagure_pr_set_flag(self, data, full_name, pr_id):
+        pr = self.projects[full_name].pull_requests[int(pr_id)]
+        flag = self._pagure_flag_json(data, pr.head_commit)
+        with self._lock:
+            pr.flags[:] = [f for f in pr.flags if f["uid"] != flag["uid"]]
+            pr.flags.append(flag)
+        return 200, {"flag": flag, "uid": flag["uid"], "message": "Flag added"}
+
+    def _pagure_commit_flag(self, data, full_name, sha):
+        project = self.projects[full_name]
+        flag = self._pagure_flag_json(data, sha)
+        with self._lock:
+            flags = project.statuses.setdefault(sha, [])
+            flags[:] = [f for f in flags if f["uid"] != flag["uid"]]
+            flags.append(flag)
+        return 200, {"flag": flag, "uid": flag["uid"], "message": "Flag added"}
+
+    def _pagure_commit_flags(self, _, full_name, sha):
+        return 200, {"flags": self.projects[full_name].statuses.get(sha, [])}
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    fake_forge: FakeForge
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # keep the test output clean
+        pass
+
+    def _read_data(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        raw = self.rfile.read(length).decode()
+        if "json" in (self.headers.get("Content-Type") or ""):
+            return json.loads(raw)
+        return {key: values[-1] for key, values in parse_qs(raw).items()}
+
+    def _token(self) -> str:
+        return (
+            self.headers.get("PRIVATE-TOKEN")
+            or self.headers.get("Authorization")
+            or self.client_address[0]
+        )
+
+    def _process(self, method: str):
+        url = urlparse(self.path)
+        data = self._read_data()
+        data.update({key: values[-1] for key, values in parse_qs(url.query).items()})
+        # GitLab project IDs are URL-encoded paths, keep them in one path segment
+        path = url.path.rstrip("/")
+        status, body, headers = self.fake_forge.handle(
+            method, path, self._token(), data
+        )
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        self._process("GET")
+
+    def do_POST(self):
+        self._process("POST")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    for name, default in asdict(ForgeBehaviour()).items():
+        parser.add_argument(
+            f"--{name.replace('_', '-')}",
+            type=int if name in ("error_status", "rate_limit", "seed") else float,
+            default=default,
+        )
+    parser.add_argument(
+        "--projects",
+        type=Path,
+        help="JSON file with a list of {namespace, repo, branches} to serve",
+    )
+    args = parser.parse_args()
+
+    behaviour = ForgeBehaviour(
+        **{name: getattr(args, name) for name in asdict(ForgeBehaviour())}
+    )
+    forge = FakeForge(behaviour, host=args.host, port=args.port)
+    if args.projects:
+        for project in json.loads(args.projects.read_text()):
+            forge.add_project(**project)
+    with forge:
+        print(f"Fake forge listening on {forge.url}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
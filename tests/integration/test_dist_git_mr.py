@@ -1,9 +1,15 @@
 # Copyright Contributors to the Packit project.
 # SPDX-License-Identifier: MIT
+from pathlib import Path
+
 import pytest
 from flexmock import flexmock
 
+from hardly.cache import BranchesCache
+from hardly.checkout import Checkout
+from hardly.circuit_breaker import CircuitBreaker
 from hardly.tasks import run_dist_git_sync_handler
+from hardly.workdir import work_dir_pool
 from packit.api import PackitAPI
 from packit.config.job_config import JobConfigTriggerType
 from packit.local_project import LocalProject
@@ -92,6 +98,18 @@ def test_dist_git_mr(
     flexmock(GitlabProject).should_receive("get_file_content").and_return(
         source_git_yaml
     )
+    flexmock(GitlabProject).should_receive("get_git_urls").and_return(
+        {"git": "https://gitlab.com/packit-service/src/open-vm-tools.git"}
+    )
+    git_repo = flexmock(git=flexmock())
+    git_repo.git.should_receive("fetch").with_args(
+        "--tags", "--force", "origin", "refs/merge-requests/5/head"
+    )
+    flexmock(Checkout).should_receive("clone").and_return(git_repo)
+    flexmock(work_dir_pool).should_receive("get").and_return(Path(SANDCASTLE_WORK_DIR))
+    flexmock(work_dir_pool).should_receive("release")
+    flexmock(CircuitBreaker).should_receive("check")
+    flexmock(CircuitBreaker).should_receive("record_success")
 
     flexmock(PullRequestModel).should_receive("get_or_create").and_return(
         flexmock(id=1)
@@ -100,17 +118,17 @@ def test_dist_git_mr(
         "get_by_source_git_id"
     ).and_return(None)
 
-    lp = flexmock(
+    flexmock(
         LocalProject,
         refresh_the_arguments=lambda: None,
         checkout_ref=lambda ref: None,
     )
-    lp.should_receive("fetch").with_args(
-        "https://gitlab.com/packit-service/src/open-vm-tools", force=True
-    )
     flexmock(PagureProject).should_receive("get_branches").and_return(
         downstream_branches
     )
+    flexmock(BranchesCache).should_receive("contains").replace_with(
+        lambda branch, get_branches: branch in get_branches()
+    )
     flexmock(Upstream).should_receive("get_specfile_version").and_return(version)
 
     config = ServiceConfig()
@@ -152,3 +170,6 @@ This MR has been automatically created from
     )
 
     assert first_dict_value(results["job"])["success"]
+    # compact result: no checkout reports, no event
+    assert set(first_dict_value(results["job"])["details"]) <= {"msg", "branches"}
+    assert set(results["event"]) == {"event_type", "digest"}
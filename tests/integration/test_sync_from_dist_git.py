@@ -3,7 +3,10 @@
 import pytest
 from flexmock import flexmock
 
+from hardly.backfill import SourceGitDistGitPair, reconcile_pair
+from hardly.cache import FanoutDistGitMR, FanoutDistGitMRs
 from hardly.handlers import SyncFromPagurePRHandler, SyncFromGitlabMRHandler
+from ogr.services.gitlab import GitlabService
 from packit_service.config import ServiceConfig
 from packit_service.models import SourceGitPRDistGitPRModel
 from packit_service.worker.events.pagure import PullRequestFlagPagureEvent
@@ -12,6 +15,7 @@ from packit_service.worker.reporting import (
     BaseCommitStatus,
     StatusReporter,
 )
+from tests.fake_forge import CREATED_AT
 
 
 @pytest.mark.parametrize(
@@ -89,3 +93,115 @@ def test_sync_from_dist_git(
         event=event.get_dict(),
         job_config=None,
     ).run()
+
+
+def test_sync_from_fanout_dist_git_mr(pipeline_event):
+    event = Parser.parse_event(pipeline_event)
+    src_project_url = "https://gitlab.com/packit-service/src/open-vm-tools"
+    dist_git_pr_model = flexmock(
+        id=2,
+        pr_id=8,
+        project=flexmock(project_url="https://gitlab.com/redhat/rpms/open-vm-tools"),
+    )
+    flexmock(SyncFromGitlabMRHandler).should_receive("dist_git_pr_model").and_return(
+        dist_git_pr_model
+    )
+    flexmock(SourceGitPRDistGitPRModel).should_receive("get_by_dist_git_id").with_args(
+        2
+    ).and_return(None)
+    flexmock(FanoutDistGitMRs).should_receive("get").with_args(
+        "https://gitlab.com/redhat/rpms/open-vm-tools", 8
+    ).and_return(
+        FanoutDistGitMR(
+            src_project_url,
+            123,
+            "c10s",
+            "https://gitlab.com/redhat/rpms/open-vm-tools",
+            8,
+        )
+    )
+    source_git_project = flexmock(get_pr=flexmock(id=123, head_commit="foobar"))
+    flexmock(ServiceConfig).should_receive("get_project").with_args(
+        url=src_project_url
+    ).and_return(source_git_project)
+    status_reporter = flexmock()
+    status_reporter.should_receive("set_status").with_args(
+        state=BaseCommitStatus.failure,
+        description="Changed status to failed",
+        check_name="Dist-git MR CI Pipeline (c10s)",
+        url="https://gitlab.com/packit-as-a-service-stg/open-vm-tools/-/pipelines/497396723",
+    ).once()
+    flexmock(StatusReporter).should_receive("get_instance").and_return(status_reporter)
+
+    SyncFromGitlabMRHandler(
+        package_config=None,
+        event=event.get_dict(),
+        job_config=None,
+    ).run()
+
+
+def test_reconcile_against_fake_forge(fake_forge):
+    source_git = fake_forge.add_project("packit-service/src", "open-vm-tools")
+    fake_forge.add_project("redhat/centos-stream/rpms", "open-vm-tools")
+    source_git_pr = fake_forge.add_pull_request(
+        "packit-service/src", "open-vm-tools", "Source-git MR", id=5
+    )
+    pipeline_url = (
+        f"{fake_forge.url}/redhat/centos-stream/rpms/open-vm-tools/-/pipelines/1"
+    )
+    fake_forge.add_pull_request(
+        "redhat/centos-stream/rpms",
+        "open-vm-tools",
+        "Dist-git MR",
+        id=7,
+        pipelines=[{"id": 1, "status": "failed", "web_url": pipeline_url}],
+    )
+    fanout_pipeline_url = (
+        f"{fake_forge.url}/redhat/centos-stream/rpms/open-vm-tools/-/pipelines/2"
+    )
+    fake_forge.add_pull_request(
+        "redhat/centos-stream/rpms",
+        "open-vm-tools",
+        "Dist-git MR for c10s",
+        id=8,
+        pipelines=[{"id": 2, "status": "success", "web_url": fanout_pipeline_url}],
+    )
+    service = GitlabService(token="token", instance_url=fake_forge.url)
+    service_config = flexmock(get_project=lambda url: service.get_project_from_url(url))
+    pair = SourceGitDistGitPair(
+        id=1,
+        source_git_project_url=f"{fake_forge.url}/packit-service/src/open-vm-tools",
+        source_git_pr_id=5,
+        dist_git_project_url=f"{fake_forge.url}/redhat/centos-stream/rpms/open-vm-tools",
+        dist_git_pr_id=7,
+    )
+    flexmock(FanoutDistGitMRs).should_receive("get_all").and_return(
+        {
+            "c10s": FanoutDistGitMR(
+                pair.source_git_project_url, 5, "c10s", pair.dist_git_project_url, 8
+            )
+        }
+    )
+
+    assert reconcile_pair(service_config, pair) == 2
+    # StatusReporterGitlab set the commit status of the source-git MR
+    assert source_git.statuses[source_git_pr.head_commit] == [
+        {
+            "id": 1,
+            "sha": source_git_pr.head_commit,
+            "status": "failed",
+            "name": "Dist-git MR CI Pipeline",
+            "description": "Changed status to failed",
+            "target_url": pipeline_url,
+            "created_at": CREATED_AT,
+        },
+        {
+            "id": 2,
+            "sha": source_git_pr.head_commit,
+            "status": "success",
+            "name": "Dist-git MR CI Pipeline (c10s)",
+            "description": "Changed status to success",
+            "target_url": fanout_pipeline_url,
+            "created_at": CREATED_AT,
+        },
+    ]
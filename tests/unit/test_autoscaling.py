@@ -0,0 +1,75 @@
+# Copyright Contributors to the Packit project.
+# SPDX-License-Identifier: MIT
+
+import json
+
+import pytest
+from flexmock import flexmock
+
+from hardly import autoscaling
+from hardly.autoscaling import (
+    DURATIONS_KEY,
+    TASK_ROUTES,
+    QueueStats,
+    record_finished,
+    record_published,
+    record_started,
+)
+from hardly.handlers.abstract import TaskName
+
+
+def test_task_routes():
+    assert TASK_ROUTES[TaskName.dist_git_pr.value] == {"queue": "long-running"}
+    assert TASK_ROUTES[TaskName.sync_from_gitlab_mr.value] == {"queue": "short-running"}
+
+
+def message(task: str, published: float) -> str:
+    return json.dumps(
+        {"body": "", "headers": {"task": task, "hardly_published": published}}
+    )
+
+
+def test_queue_stats():
+    flexmock(autoscaling.time).should_receive("time").and_return(1000.0)
+    lists = {
+        # newest first
+        "long-running": [
+            message(TaskName.dist_git_pr.value, 990.0),
+            message(TaskName.update_source_git.value, 900.0),
+        ],
+        "long-running:2": [message(TaskName.dist_git_pr.value, 950.0)],
+    }
+    redis = flexmock(
+        llen=lambda key: len(lists.get(key, [])),
+        lindex=lambda key, index: lists[key][index],
+        lrange=lambda key, start, end: lists[key][start:],
+    )
+    flexmock(autoscaling).should_receive("get_redis").and_return(redis)
+
+    stats = QueueStats("long-running").collect({TaskName.dist_git_pr.value: 100.0})
+
+    assert stats.depth == 3
+    assert stats.oldest_message_age == 100.0
+    # update_source_git hasn't run yet, the default duration is assumed
+    assert stats.work_seconds == 210.0
+
+
+@pytest.mark.parametrize("average, expected", [(None, 50.0), ("10.0", 14.0)])
+def test_record_duration(average, expected):
+    flexmock(autoscaling.time).should_receive("monotonic").and_return(100.0).and_return(
+        150.0
+    )
+    redis = flexmock(hget=lambda key, field: average)
+    redis.should_receive("hset").with_args(
+        DURATIONS_KEY, TaskName.dist_git_pr.value, pytest.approx(expected)
+    ).once()
+    flexmock(autoscaling).should_receive("get_redis").and_return(redis)
+
+    record_started(task_id="123")
+    record_finished(task_id="123", task=flexmock(name=TaskName.dist_git_pr.value))
+
+
+def test_record_published():
+    headers = {"task": TaskName.dist_git_pr.value}
+    record_published(headers=headers)
+    assert "hardly_published" in headers
@@ -0,0 +1,254 @@
+# Copyright Contributors to the Packit project.
+# SPDX-License-Identifier: MIT
+
+import pytest
+from flexmock import flexmock
+
+from hardly import backfill
+from hardly.backfill import (
+    Backfill,
+    BackfillProgress,
+    ShardState,
+    SourceGitDistGitPair,
+    reconcile_pair,
+    reconcile_shard,
+    is_rate_limited,
+)
+from hardly.cache import FanoutDistGitMR, FanoutDistGitMRs
+from hardly.handlers.distgit import DistGitStatus, SyncFromGitlabMRHandler
+from gitlab.exceptions import GitlabHttpError
+from ogr.abstract import PRStatus
+from ogr.exceptions import GitlabAPIException, PagureAPIException
+from ogr.services.gitlab import GitlabProject
+from packit_service.worker.reporting import BaseCommitStatus
+
+SRC_URL = "https://gitlab.com/packit-service/src/open-vm-tools"
+DG_URL = "https://gitlab.com/packit-service/rpms/open-vm-tools"
+
+
+def pair(id_: int) -> SourceGitDistGitPair:
+    return SourceGitDistGitPair(id_, SRC_URL, id_, DG_URL, id_ + 100)
+
+
+@pytest.mark.parametrize(
+    "pr_status, head_pipeline, reported",
+    [
+        pytest.param(
+            PRStatus.open,
+            {
+                "status": "failed",
+                "detailed_status": {"text": "failed"},
+                "web_url": f"{DG_URL}/-/pipelines/497396723",
+            },
+            1,
+            id="open MR with pipeline",
+        ),
+        pytest.param(PRStatus.open, None, 0, id="open MR without pipeline"),
+        pytest.param(
+            PRStatus.open,
+            {"status": "canceling", "web_url": f"{DG_URL}/-/pipelines/497396723"},
+            0,
+            id="unknown pipeline status",
+        ),
+        pytest.param(PRStatus.merged, None, None, id="merged MR"),
+    ],
+)
+def test_reconcile_pair(pr_status, head_pipeline, reported):
+    dist_git_pr = flexmock(
+        status=pr_status,
+        url=f"{DG_URL}/-/merge_requests/101",
+        _raw_pr=flexmock(head_pipeline=head_pipeline),
+    )
+    dist_git_project = GitlabProject(
+        repo="open-vm-tools", service=flexmock(), namespace="packit-service/rpms"
+    )
+    flexmock(dist_git_project).should_receive("get_pr").with_args(101).and_return(
+        dist_git_pr
+    )
+    service_config = flexmock()
+    service_config.should_receive("get_project").with_args(url=DG_URL).and_return(
+        dist_git_project
+    )
+    flexmock(SyncFromGitlabMRHandler).should_receive("report_statuses").with_args(
+        service_config=service_config,
+        source_git_project_url=SRC_URL,
+        source_git_pr_id=1,
+        statuses=[
+            DistGitStatus(
+                state=BaseCommitStatus.failure,
+                description="Changed status to failed",
+                check_name="Dist-git MR CI Pipeline",
+                url=f"{DG_URL}/-/pipelines/497396723",
+            )
+        ],
+        only_changed=False,
+        branch=None,
+    ).times(reported or 0).and_return(reported)
+    flexmock(FanoutDistGitMRs).should_receive("get_all").and_return({})
+
+    assert reconcile_pair(service_config, pair(1)) == reported
+
+
+def test_reconcile_pair_fanout():
+    pipeline = {
+        "status": "success",
+        "detailed_status": {"text": "passed"},
+        "web_url": f"{DG_URL}/-/pipelines/1",
+    }
+    dist_git_prs = {
+        101: flexmock(
+            status=PRStatus.open, url="101", _raw_pr=flexmock(head_pipeline=None)
+        ),
+        102: flexmock(
+            status=PRStatus.open, url="102", _raw_pr=flexmock(head_pipeline=pipeline)
+        ),
+        103: flexmock(status=PRStatus.closed, url="103"),
+    }
+    dist_git_project = GitlabProject(
+        repo="open-vm-tools", service=flexmock(), namespace="packit-service/rpms"
+    )
+    flexmock(dist_git_project).should_receive("get_pr").replace_with(
+        lambda pr_id: dist_git_prs[pr_id]
+    )
+    service_config = flexmock(get_project=lambda url: dist_git_project)
+    flexmock(FanoutDistGitMRs).should_receive("get_all").and_return(
+        {
+            "c10s": FanoutDistGitMR(SRC_URL, 1, "c10s", DG_URL, 102),
+            "c11s": FanoutDistGitMR(SRC_URL, 1, "c11s", DG_URL, 103),
+        }
+    )
+    flexmock(SyncFromGitlabMRHandler).should_receive("report_statuses").with_args(
+        service_config=service_config,
+        source_git_project_url=SRC_URL,
+        source_git_pr_id=1,
+        statuses=[
+            DistGitStatus(
+                state=BaseCommitStatus.success,
+                description="Changed status to passed",
+                check_name="Dist-git MR CI Pipeline",
+                url=f"{DG_URL}/-/pipelines/1",
+            )
+        ],
+        only_changed=False,
+        branch="c10s",
+    ).once().and_return(1)
+
+    assert reconcile_pair(service_config, pair(1)) == 1
+
+
+def test_backfill_resumes(tmp_path):
+    state_file = tmp_path / "backfill.json"
+    BackfillProgress(last_id=2, reconciled=2).save(state_file)
+
+    flexmock(backfill).should_receive("iter_pairs").with_args(after_id=2).and_return(
+        iter([pair(3), pair(4), pair(5)])
+    )
+    flexmock(backfill).should_receive("reconcile_pair").replace_with(
+        lambda service_config, pair, dry_run, only_changed: 1 if pair.id != 4 else None
+    )
+
+    progress = Backfill(
+        service_config=flexmock(),
+        state_file=state_file,
+        batch_size=2,
+        pairs_per_minute=10**6,
+    ).run()
+
+    assert progress == BackfillProgress(last_id=5, reconciled=5, statuses_reported=2)
+    assert BackfillProgress.load(state_file) == progress
+
+
+def gitlab_error(message: str, response_code: int) -> GitlabAPIException:
+    try:
+        raise GitlabAPIException(message) from GitlabHttpError(
+            response_code=response_code
+        )
+    except GitlabAPIException as ex:
+        return ex
+
+
+@pytest.mark.parametrize(
+    "ex, rate_limited",
+    [
+        pytest.param(gitlab_error("Too many requests", 429), True, id="gitlab"),
+        pytest.param(
+            PagureAPIException("Too many requests", response_code=429),
+            True,
+            id="pagure",
+        ),
+        pytest.param(
+            gitlab_error(f"{DG_URL}/-/merge_requests/1429 not found", 404),
+            False,
+            id="429 in the URL",
+        ),
+        pytest.param(Exception("PR 4291 not found"), False, id="429 in the message"),
+    ],
+)
+def test_is_rate_limited(ex, rate_limited):
+    assert is_rate_limited(ex) == rate_limited
+
+
+def test_backfill_retries_rate_limited():
+    calls = []
+
+    def reconcile(service_config, pair, dry_run, only_changed):
+        assert only_changed
+        calls.append(pair.id)
+        if pair.id == 2 and calls.count(pair.id) == 1 or pair.id == 4:
+            raise PagureAPIException("Too many requests", response_code=429)
+        if pair.id == 3:
+            raise PagureAPIException("PR 429 not found", response_code=404)
+        return 0
+
+    flexmock(backfill).should_receive("iter_pairs").and_return(
+        iter([pair(1), pair(2), pair(3), pair(4)])
+    )
+    flexmock(backfill).should_receive("reconcile_pair").replace_with(reconcile)
+    flexmock(backfill.time).should_receive("sleep")
+
+    progress = Backfill(
+        service_config=flexmock(), batch_size=4, max_rate_limited=2
+    ).run()
+
+    # pair 4 is always rate limited, given up after 2 retries
+    assert sorted(calls) == [1, 2, 2, 3, 4, 4, 4]
+    assert progress.reconciled == 2
+    assert progress.failed == [3, 4]
+
+
+def test_reconcile_shard():
+    pages = [[pair(1), pair(2)], [pair(3), pair(4), pair(5)]]
+    flexmock(backfill).should_receive("iter_pair_pages").with_args(
+        after_id=0, shard=1, shards=2
+    ).and_return(iter(pages))
+    lock = flexmock(acquire=lambda blocking: True)
+    lock.should_receive("release").once()
+    flexmock(ShardState).should_receive("lock").and_return(lock)
+    flexmock(ShardState).should_receive("get_watermark").and_return(0)
+    flexmock(ShardState).should_receive("get_inactive").and_return({2}).and_return(
+        set()
+    )
+    flexmock(ShardState).should_receive("add_inactive").with_args(1).once()
+    flexmock(ShardState).should_receive("add_inactive").with_args(4).once()
+    # pairs before the first active one are not queried anymore
+    flexmock(ShardState).should_receive("set_watermark").with_args(2).once()
+    reconciled = []
+
+    def reconcile(service_config, pair, only_changed):
+        assert only_changed
+        reconciled.append(pair.id)
+        return {1: None, 3: 1, 4: None, 5: 2}[pair.id]
+
+    flexmock(backfill).should_receive("reconcile_pair").replace_with(reconcile)
+
+    assert reconcile_shard(flexmock(), shard=1, shards=2) == 3
+    assert reconciled == [1, 3, 4, 5]
+
+
+def test_reconcile_shard_still_running():
+    flexmock(ShardState).should_receive("lock").and_return(
+        flexmock(acquire=lambda blocking: False)
+    )
+    flexmock(backfill).should_receive("iter_pair_pages").never()
+
+    assert reconcile_shard(flexmock(), shard=1, shards=2) == 0
@@ -0,0 +1,95 @@
+# Copyright Contributors to the Packit project.
+# SPDX-License-Identifier: MIT
+
+import pytest
+from flexmock import flexmock
+
+from hardly import cache
+from hardly.cache import BranchesCache, FanoutDistGitMR, FanoutDistGitMRs
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "https://gitlab.com/redhat/centos-stream/rpms/make",
+        "https://gitlab.com/redhat/centos-stream/rpms/make.git",
+        "https://gitlab.com/redhat/centos-stream/rpms/make/",
+    ],
+)
+def test_branches_cache_key(url):
+    assert (
+        BranchesCache(url).key
+        == "hardly:branches:https://gitlab.com/redhat/centos-stream/rpms/make"
+    )
+
+
+@pytest.mark.parametrize(
+    "cached, branch, listed, exists",
+    [
+        pytest.param(False, "c9s", True, True, id="miss"),
+        pytest.param(True, "c9s", False, True, id="hit"),
+        pytest.param(True, "c10s", False, False, id="hit, no branch"),
+    ],
+)
+def test_branches_cache_contains(cached, branch, listed, exists):
+    key = "hardly:branches:https://gitlab.com/redhat/centos-stream/rpms/make"
+    pipe = flexmock(execute=lambda: None)
+    pipe.should_receive("delete").with_args(key).times(int(listed))
+    pipe.should_receive("sadd").with_args(key, "", "c8s", "c9s").times(int(listed))
+    pipe.should_receive("expire").with_args(key, 300).times(int(listed))
+    redis = flexmock(
+        exists=lambda key: cached,
+        pipeline=lambda: pipe,
+        sismember=lambda key, member: member in ("", "c8s", "c9s"),
+    )
+    flexmock(cache).should_receive("get_redis").and_return(redis)
+    calls = []
+
+    def get_branches():
+        calls.append(True)
+        return ["c8s", "c9s"]
+
+    assert (
+        BranchesCache("https://gitlab.com/redhat/centos-stream/rpms/make").contains(
+            branch, get_branches
+        )
+        == exists
+    )
+    assert len(calls) == int(listed)
+
+
+def test_fanout_dist_git_mrs():
+    store = {}
+
+    class Pipeline:
+        def __init__(self):
+            self.results = []
+
+        def hset(self, key, field, value):
+            store.setdefault(key, {})[field] = value
+
+        def hgetall(self, key):
+            self.results.append(store.get(key, {}))
+
+        def set(self, key, value, ex):
+            store[key] = value
+
+        def get(self, key):
+            self.results.append(store.get(key))
+
+        def expire(self, key, ttl):
+            self.results.append(key in store)
+
+        def execute(self):
+            return self.results
+
+    flexmock(cache).should_receive("get_redis").and_return(flexmock(pipeline=Pipeline))
+    src_url = "https://gitlab.com/redhat/centos-stream/src/make"
+    dg_url = "https://gitlab.com/redhat/centos-stream/rpms/make"
+
+    FanoutDistGitMRs(src_url, 5).add("c10s", dg_url, 8)
+
+    mr = FanoutDistGitMR(src_url, 5, "c10s", dg_url, 8)
+    assert FanoutDistGitMRs(src_url, 5).get_all() == {"c10s": mr}
+    assert FanoutDistGitMRs.get(dg_url, 8) == mr
+    assert FanoutDistGitMRs.get(dg_url, 7) is None
@@ -0,0 +1,133 @@
+# Copyright Contributors to the Packit project.
+# SPDX-License-Identifier: MIT
+
+import pytest
+from git import Repo
+
+from hardly import checkout
+from hardly.checkout import Checkout, CloneStrategy
+
+
+@pytest.mark.parametrize(
+    "strategies, overrides, kind, url, expected",
+    [
+        pytest.param(
+            {}, {}, "dist-git", "https://a/rpms/b", CloneStrategy(), id="none"
+        ),
+        pytest.param(
+            {"dist-git": {"depth": 1}, "source-git": {"filter": "blob:none"}},
+            {},
+            "dist-git",
+            "https://a/rpms/b",
+            CloneStrategy(depth=1),
+            id="per kind",
+        ),
+        pytest.param(
+            {"source-git": {"filter": "blob:none"}},
+            {
+                r".+/src/kernel(\.git)?": {
+                    "source-git": {"depth": 10, "sparse_paths": [".distro/"]}
+                }
+            },
+            "source-git",
+            "https://a/src/kernel.git",
+            CloneStrategy(depth=10, filter="blob:none", sparse_paths=[".distro/"]),
+            id="override",
+        ),
+    ],
+)
+def test_clone_strategy(monkeypatch, strategies, overrides, kind, url, expected):
+    monkeypatch.setattr(checkout, "CLONE_STRATEGIES", strategies)
+    monkeypatch.setattr(checkout, "CLONE_STRATEGY_OVERRIDES", overrides)
+    assert CloneStrategy.get(kind, url) == expected
+
+
+def test_clone_args():
+    assert CloneStrategy(
+        depth=1, filter="blob:none", sparse_paths=[".distro/"]
+    ).get_clone_args("c9s") == [
+        "--branch",
+        "c9s",
+        "--depth",
+        "1",
+        "--filter",
+        "blob:none",
+        "--sparse",
+    ]
+
+
+def test_in_work_dir(tmp_path):
+    url = "https://gitlab.com/redhat/centos-stream/rpms/make.git"
+    c9s = Checkout.in_work_dir(tmp_path, "dist-git", url, branch="c9s")
+
+    assert c9s.path.parent == tmp_path
+    assert c9s.name == "dist-git-c9s"
+    assert Checkout.in_work_dir(tmp_path, "dist-git", url, branch="c9s").path == (
+        c9s.path
+    )
+    assert Checkout.in_work_dir(tmp_path, "dist-git", url, branch="c10s").path != (
+        c9s.path
+    )
+    assert Checkout.in_work_dir(tmp_path, "dist-git", f"{url}-other", "c9s").path != (
+        c9s.path
+    )
+
+
+def test_checkout(tmp_path):
+    origin = Repo.init(tmp_path / "origin", initial_branch="c9s")
+    origin.git.config("user.name", "Packit")
+    origin.git.config("user.email", "packit@example.com")
+    (tmp_path / "origin" / ".distro").mkdir()
+    (tmp_path / "origin" / ".distro" / "make.spec").write_text("Name: make\n")
+    (tmp_path / "origin" / "src").mkdir()
+    (tmp_path / "origin" / "src" / "main.c").write_text("int main() {}\n")
+    origin.git.add(".")
+    origin.git.commit("-m", "Initial")
+
+    clone = Checkout(
+        kind="source-git",
+        url=f"file://{tmp_path / 'origin'}",
+        path=tmp_path / "clone",
+        branch="c9s",
+        strategy=CloneStrategy(depth=1, sparse_paths=[".distro/"]),
+    )
+    clone.clone()
+    report = clone.report()
+
+    assert (tmp_path / "clone" / ".distro" / "make.spec").is_file()
+    assert not (tmp_path / "clone" / "src").exists()
+    assert report["clone_seconds"] > 0
+    assert report["disk_bytes"] > 0
+
+
+def test_checkout_reused(tmp_path):
+    origin = Repo.init(tmp_path / "origin", initial_branch="c9s")
+    origin.git.config("user.name", "Packit")
+    origin.git.config("user.email", "packit@example.com")
+    origin.git.commit("--allow-empty", "-m", "Initial")
+    url = f"file://{tmp_path / 'origin'}"
+
+    repo = Checkout(kind="dist-git", url=url, path=tmp_path / "clone").clone()
+    # what a job leaves behind
+    (tmp_path / "clone" / "untracked").write_text("")
+    repo.git.checkout("-b", "c9s-src-1")
+    repo.create_remote("fork", url)
+    origin.git.commit("--allow-empty", "-m", "Second")
+
+    checkout = Checkout(kind="dist-git", url=url, path=tmp_path / "clone")
+    repo = checkout.clone()
+
+    assert checkout.reused
+    assert repo.head.commit.hexsha == origin.head.commit.hexsha
+    assert [head.name for head in repo.heads] == ["c9s"]
+    assert [remote.name for remote in repo.remotes] == ["origin"]
+    assert not (tmp_path / "clone" / "untracked").exists()
+
+    checkout = Checkout(
+        kind="dist-git",
+        url=url,
+        path=tmp_path / "clone",
+        strategy=CloneStrategy(depth=1),
+    )
+    checkout.clone()
+    assert not checkout.reused
@@ -0,0 +1,172 @@
+# Copyright Contributors to the Packit project.
+# SPDX-License-Identifier: MIT
+
+import pytest
+from flexmock import flexmock
+from git.exc import GitCommandError
+from requests.exceptions import ConnectionError, HTTPError
+
+from hardly import circuit_breaker
+from hardly.circuit_breaker import (
+    CircuitBreaker,
+    CircuitOpenError,
+    CircuitState,
+    find_circuit_open_error,
+    get_circuit_breaker,
+    get_git_circuit_breaker,
+    get_git_host,
+    is_git_unavailable,
+    is_unavailable,
+)
+
+
+def wrapped(ex: Exception, cause: Exception) -> Exception:
+    try:
+        raise ex from cause
+    except Exception as raised:
+        return raised
+
+
+@pytest.mark.parametrize(
+    "ex, unavailable",
+    [
+        pytest.param(ConnectionError("refused"), True, id="connection error"),
+        pytest.param(HTTPError("404 Not Found"), False, id="not found"),
+        pytest.param(
+            wrapped(RuntimeError("ogr failed"), ConnectionError("refused")),
+            True,
+            id="wrapped",
+        ),
+        pytest.param(
+            GitCommandError("fetch", 128, stderr="Could not resolve host"),
+            False,
+            id="git",
+        ),
+        pytest.param(None, False, id="none"),
+    ],
+)
+def test_is_unavailable(ex, unavailable):
+    assert is_unavailable(ex) == unavailable
+
+
+@pytest.mark.parametrize(
+    "ex, unavailable",
+    [
+        pytest.param(
+            GitCommandError(
+                "fetch", 128, stderr="fatal: unable to access: Could not resolve host"
+            ),
+            True,
+            id="git remote unavailable",
+        ),
+        pytest.param(
+            GitCommandError("push", 1, stderr="! [rejected] (non-fast-forward)"),
+            False,
+            id="git push rejected",
+        ),
+        pytest.param(
+            wrapped(
+                RuntimeError("sync_release failed"),
+                GitCommandError("push", 128, stderr="Connection timed out"),
+            ),
+            True,
+            id="wrapped",
+        ),
+        pytest.param(ConnectionError("refused"), False, id="forge API"),
+    ],
+)
+def test_is_git_unavailable(ex, unavailable):
+    assert is_git_unavailable(ex) == unavailable
+
+
+def test_find_circuit_open_error():
+    open_error = CircuitOpenError("gitlab", 30)
+    assert find_circuit_open_error(open_error) is open_error
+    assert find_circuit_open_error(wrapped(RuntimeError(), open_error)) is open_error
+    assert find_circuit_open_error(RuntimeError()) is None
+
+
+@pytest.mark.parametrize(
+    "open_ttl, half_open, state",
+    [
+        (-2, 0, CircuitState.closed),
+        (30_000, 1, CircuitState.open),
+        (-2, 1, CircuitState.half_open),
+    ],
+)
+def test_check(open_ttl, half_open, state):
+    pipe = flexmock(
+        pttl=lambda key: None,
+        exists=lambda key: None,
+        execute=lambda: [open_ttl, half_open],
+    )
+    flexmock(circuit_breaker).should_receive("get_redis").and_return(
+        flexmock(pipeline=lambda: pipe)
+    )
+    breaker = CircuitBreaker("gitlab")
+    if state == CircuitState.open:
+        with pytest.raises(CircuitOpenError) as ex:
+            breaker.check()
+        assert ex.value.retry_in == 30
+    else:
+        breaker.check()
+    assert breaker.state == state
+
+
+@pytest.mark.parametrize(
+    "state, failures, opened",
+    [
+        (CircuitState.closed, 1, False),
+        (CircuitState.closed, 5, True),
+        (CircuitState.half_open, None, True),
+    ],
+)
+def test_record_failure(state, failures, opened):
+    breaker = CircuitBreaker("gitlab")
+    flexmock(breaker).should_receive("read_state").and_return(state)
+    redis = flexmock(expire=lambda key, ttl: None)
+    redis.should_receive("incr").and_return(failures).times(int(failures is not None))
+    flexmock(circuit_breaker).should_receive("get_redis").and_return(redis)
+    flexmock(breaker).should_receive("open").times(int(opened))
+
+    breaker.record_failure()
+
+
+def test_context_manager():
+    breaker = get_circuit_breaker("git")
+    flexmock(breaker).should_receive("check").times(3)
+    flexmock(breaker).should_receive("record_success").once()
+    flexmock(breaker).should_receive("record_failure").once()
+
+    with breaker:
+        pass
+    with pytest.raises(GitCommandError):
+        with breaker:
+            raise GitCommandError("clone", 128, stderr="Connection timed out")
+    # forge API failures don't count for git
+    with pytest.raises(ConnectionError):
+        with breaker:
+            raise ConnectionError("refused")
+
+
+@pytest.mark.parametrize(
+    "url, host",
+    [
+        ("https://gitlab.com/redhat/centos-stream/rpms/make.git", "gitlab.com"),
+        ("ssh://git@pkgs.fedoraproject.org/rpms/make.git", "pkgs.fedoraproject.org"),
+        ("git@gitlab.com:redhat/centos-stream/src/make.git", "gitlab.com"),
+        ("https://src.fedoraproject.org/rpms/make", "src.fedoraproject.org"),
+    ],
+)
+def test_get_git_host(url, host):
+    assert get_git_host(url) == host
+
+
+def test_git_circuit_breaker_per_host():
+    gitlab = get_git_circuit_breaker("https://gitlab.com/redhat/centos-stream/src/make")
+    pagure = get_git_circuit_breaker("https://src.fedoraproject.org/rpms/make")
+
+    assert gitlab.dependency == "git:gitlab.com"
+    assert gitlab.open_key != pagure.open_key
+    assert gitlab is get_git_circuit_breaker("git@gitlab.com:redhat/rpms/make.git")
+    assert gitlab.is_failure is is_git_unavailable
@@ -0,0 +1,110 @@
+# Copyright Contributors to the Packit project.
+# SPDX-License-Identifier: MIT
+
+import pytest
+from flexmock import flexmock
+from git import Repo
+
+from hardly import commit_mapping
+from hardly.commit_mapping import CommitMapping, get_trailer
+
+DG_COMMITS = ["a" * 40, "b" * 40, "c" * 40]
+
+
+@pytest.fixture()
+def source_git_repo(tmp_path):
+    repo = Repo.init(tmp_path / "source-git", initial_branch="main")
+    repo.git.config("user.name", "Packit")
+    repo.git.config("user.email", "packit@example.com")
+    repo.git.commit("--allow-empty", "-m", "Upstream commit")
+    for dist_git_commit in DG_COMMITS[:2]:
+        repo.git.commit(
+            "--allow-empty",
+            "-m",
+            f"Dist-git change\n\nFrom-dist-git-commit: {dist_git_commit}",
+        )
+    return repo
+
+
+@pytest.mark.parametrize(
+    "message, expected",
+    [
+        pytest.param(f"Change\n\nFrom-dist-git-commit: {'a' * 40}", "a" * 40, id="one"),
+        pytest.param(
+            f"Change\n\nFrom-dist-git-commit: {'a' * 40}\n"
+            f"From-dist-git-commit: {'b' * 40}\n",
+            "b" * 40,
+            id="last one wins",
+        ),
+        pytest.param(f"Change\n\nFrom-dist-git-commit: {'a' * 12}", None, id="short"),
+        pytest.param("Change", None, id="none"),
+    ],
+)
+def test_get_trailer(message, expected):
+    assert get_trailer(message, "From-dist-git-commit") == expected
+
+
+def test_scan_source_git(tmp_path, source_git_repo):
+    mapping = CommitMapping(tmp_path / "c9s.json")
+    mapping.scan_source_git(source_git_repo, "HEAD")
+
+    assert mapping.merged_dist_git_commit == DG_COMMITS[1]
+    assert mapping.commits[DG_COMMITS[1]] == source_git_repo.head.commit.hexsha
+    assert mapping.scanned_source_git_commit == source_git_repo.head.commit.hexsha
+
+    # only the new commits are scanned
+    source_git_repo.git.commit(
+        "--allow-empty", "-m", f"Change\n\nFrom-dist-git-commit: {DG_COMMITS[2]}"
+    )
+    mapping.commits.clear()
+    mapping.scan_source_git(source_git_repo, "HEAD")
+    assert list(mapping.commits) == [DG_COMMITS[2]]
+    assert mapping.merged_dist_git_commit == DG_COMMITS[2]
+
+
+def test_persistence(tmp_path, source_git_repo):
+    mapping = CommitMapping(tmp_path / "mappings" / "c9s.json")
+    mapping.scan_source_git(source_git_repo, "HEAD~1")
+    source_git_repo.git.checkout("-b", "sync")
+    source_git_repo.git.commit(
+        "--allow-empty", "-m", f"Change\n\nFrom-dist-git-commit: {DG_COMMITS[2]}"
+    )
+    mapping.add_converted(source_git_repo, "main..sync")
+    mapping.pending_pr_id = 7
+    mapping.save()
+
+    loaded = CommitMapping(tmp_path / "mappings" / "c9s.json")
+    assert loaded.merged_dist_git_commit == DG_COMMITS[0]
+    assert loaded.last_dist_git_commit == DG_COMMITS[2]
+    assert loaded.pending_pr_id == 7
+    assert loaded.commits == mapping.commits
+
+
+def test_shared_state(tmp_path, source_git_repo):
+    shared = {}
+
+    def hset(key, mapping):
+        shared.setdefault(key, {}).update({k: str(v) for k, v in mapping.items()})
+
+    redis = flexmock(hgetall=lambda key: dict(shared.get(key, {})))
+    redis.should_receive("hset").replace_with(hset)
+    flexmock(commit_mapping).should_receive("get_redis").and_return(redis)
+
+    mapping = CommitMapping(tmp_path / "worker-1" / "c9s.json", state_key="c9s")
+    mapping.scan_source_git(source_git_repo, "HEAD")
+    mapping.last_dist_git_commit = DG_COMMITS[2]
+    mapping.pending_pr_id = 7
+    mapping.save()
+
+    # a worker which doesn't have the file
+    other = CommitMapping(tmp_path / "worker-2" / "c9s.json", state_key="c9s")
+    assert other.merged_dist_git_commit == DG_COMMITS[1]
+    assert other.last_dist_git_commit == DG_COMMITS[2]
+    assert other.pending_pr_id == 7
+    other.pending_pr_id = None
+    other.save()
+
+    # the shared state wins over the file
+    mapping = CommitMapping(tmp_path / "worker-1" / "c9s.json", state_key="c9s")
+    assert mapping.pending_pr_id is None
+    assert mapping.commits[DG_COMMITS[1]] == source_git_repo.head.commit.hexsha
@@ -1,10 +1,22 @@
 # Copyright Contributors to the Packit project.
 # SPDX-License-Identifier: MIT
 
+import fcntl
+import time
+from contextlib import nullcontext
+from hashlib import sha256
+
 import pytest
 
 from flexmock import flexmock
-from hardly.handlers.distgit import DistGitMRHandler, fix_bz_refs
+from hardly.handlers import distgit
+from hardly.handlers.abstract import HandlerBusyError
+from hardly.handlers.distgit import (
+    DistGitMRHandler,
+    UpdateSourceGitHandler,
+    fix_bz_refs,
+    is_locked,
+)
 
 
 @pytest.mark.parametrize(
@@ -99,3 +111,227 @@ This is a Bugzilla: an ugly one.
 Resolves: #1234
 """
     assert fix_bz_refs(inputstr) == outputstr
+
+
+@pytest.mark.parametrize(
+    "message, expected",
+    [
+        pytest.param("Resolves: rhbz#123", "Resolves: bz#123", id="rhbz"),
+        pytest.param("Resolves: bz#123", "Resolves: bz#123", id="already fixed"),
+        pytest.param(
+            "Resolves: https://bugzilla.redhat.com/123",
+            "Resolves: bz#123",
+            id="short link",
+        ),
+        pytest.param(
+            "Related: https://bugzilla.redhat.com/show_bug.cgi?id=123",
+            "Related: bz#123",
+            id="related",
+        ),
+        pytest.param(
+            "Resolves: rhbz#123, rhbz#456",
+            "Resolves: bz#123\nResolves: bz#456",
+            id="multiple",
+        ),
+        pytest.param(
+            "Bugzilla: 123 456 (both fixed)",
+            "Resolves: bz#123\nResolves: bz#456 (both fixed)",
+            id="multiple with explanation",
+        ),
+        pytest.param("Jira: RHEL-1234", "Resolves: RHEL-1234", id="jira"),
+        pytest.param(
+            "Resolves: https://issues.redhat.com/browse/RHEL-1234, rhbz#123",
+            "Resolves: RHEL-1234\nResolves: bz#123",
+            id="jira link and bz",
+        ),
+        pytest.param("Related: RHEL-1234", "Related: RHEL-1234", id="jira related"),
+        pytest.param("Resolves: 1234", "Resolves: 1234", id="bare number"),
+        pytest.param(
+            "Resolves: rhbz#123, #1234", "Resolves: rhbz#123, #1234", id="unknown ref"
+        ),
+        pytest.param("Jira:RHEL-1234", "Jira:RHEL-1234", id="no space"),
+        pytest.param(
+            "Bugzilla: 123456\r\nNext",
+            "Resolves: bz#123456\r\nNext",
+            id="CRLF",
+        ),
+        pytest.param(
+            "Resolves: rhbz#123, rhbz#456 (both)\r\n",
+            "Resolves: bz#123\r\nResolves: bz#456 (both)\r\n",
+            id="CRLF multiple with explanation",
+        ),
+        pytest.param(
+            "Bugzilla: https://bugzilla.redhat.com/show_bug.cgi?id=123#c5",
+            "Resolves: bz#123",
+            id="link to a comment",
+        ),
+        pytest.param(
+            "Resolves: https://gitlab.com/redhat/x/-/issues?id=42",
+            "Resolves: https://gitlab.com/redhat/x/-/issues?id=42",
+            id="not a Bugzilla link",
+        ),
+        pytest.param(
+            "Related: https://access.redhat.com/errata?id=7",
+            "Related: https://access.redhat.com/errata?id=7",
+            id="not a Bugzilla link related",
+        ),
+    ],
+)
+def test_fix_bz_refs_formats(message, expected):
+    assert fix_bz_refs(message) == expected
+
+
+def test_fix_bz_refs_large_description():
+    paragraph = "A line of a very long description, Bugzilla: not a ref.\n" * 1000
+    message = (paragraph + "Resolves: rhbz#123, RHEL-1234\n") * 200
+    expected = (paragraph + "Resolves: bz#123\nResolves: RHEL-1234\n") * 200
+
+    started = time.monotonic()
+    assert fix_bz_refs(message) == expected
+    # linear: ~10 MB in well under a second
+    assert time.monotonic() - started < 5
+
+    # no catastrophic backtracking on a huge trailer which doesn't match
+    started = time.monotonic()
+    message = "Resolves: " + "rhbz#1, " * 100_000 + "#1"
+    assert fix_bz_refs(message) == message
+    assert time.monotonic() - started < 5
+
+
+@pytest.mark.parametrize(
+    "fanout, target_branch, branches",
+    [
+        pytest.param({}, "c9s", ["c9s"], id="no fan-out"),
+        pytest.param({"c9s": ["c9s", "c10s"]}, "c9s", ["c9s", "c10s"], id="fan-out"),
+        pytest.param(
+            {"c9s": ["c9s", "c10s"]}, "rawhide", ["rawhide"], id="other branch"
+        ),
+    ],
+)
+def test_dist_git_branches(monkeypatch, fanout, target_branch, branches):
+    monkeypatch.setattr(distgit, "DIST_GIT_BRANCHES_FANOUT", fanout)
+    mock_mr_handler = flexmock(target_repo_branch=target_branch)
+    assert DistGitMRHandler.dist_git_branches.fget(mock_mr_handler) == branches
+
+
+def test_create_dist_git_mrs():
+    """The first branch reuses the main clone, the others get a worktree,
+    a failure in one branch doesn't affect the others."""
+    mock_mr_handler = flexmock(
+        packit="clone", get_packit_with_worktree=lambda branch: f"worktree-{branch}"
+    )
+
+    def create_dist_git_mr(packit, branch):
+        if branch == "rawhide":
+            raise RuntimeError("Push failed")
+        return flexmock(url=f"{packit}:{branch}")
+
+    mock_mr_handler.should_receive("create_dist_git_mr").replace_with(
+        create_dist_git_mr
+    )
+
+    results = DistGitMRHandler.create_dist_git_mrs(
+        mock_mr_handler, ["c9s", "c10s", "rawhide"]
+    )
+
+    assert {
+        branch: (dg_mr.url if dg_mr else None, error)
+        for branch, (dg_mr, error) in results.items()
+    } == {
+        "c9s": ("clone:c9s", None),
+        "c10s": ("worktree-c10s:c10s", None),
+        "rawhide": (None, "Push failed"),
+    }
+
+
+@pytest.mark.parametrize(
+    "error, result",
+    [
+        pytest.param(None, "success", id="success"),
+        pytest.param(RuntimeError("Push failed"), "failure", id="failure"),
+    ],
+)
+def test_create_dist_git_mr_duration(error, result):
+    mock_mr_handler = flexmock(
+        mr_url="https://gitlab.com/packit-service/src/open-vm-tools/-/merge_requests/5",
+        mr_title="Title",
+        mr_description="Description",
+        mr_identifier="5",
+        project=flexmock(get_pr=lambda pr_id: flexmock(comment=lambda body: None)),
+        package_config=flexmock(
+            dist_git_package_url="https://gitlab.com/redhat/centos-stream/rpms/open-vm-tools"
+        ),
+    )
+    packit = flexmock(up=flexmock(get_specfile_version=lambda: "11.3.0"))
+    sync_release = packit.should_receive("sync_release").once()
+    if error:
+        sync_release.and_raise(error)
+    else:
+        sync_release.and_return(flexmock(id=7, url="dist-git MR"))
+    flexmock(distgit).should_receive("get_git_circuit_breaker").and_return(
+        nullcontext()
+    )
+    flexmock(distgit.pushgateway.dist_git_mr_branch_duration).should_receive(
+        "labels"
+    ).with_args(branch="c10s", result=result).and_return(
+        flexmock(observe=lambda duration: None)
+    ).once()
+
+    if error:
+        with pytest.raises(RuntimeError):
+            DistGitMRHandler.create_dist_git_mr(mock_mr_handler, packit, "c10s")
+    else:
+        assert DistGitMRHandler.create_dist_git_mr(mock_mr_handler, packit, "c10s")
+
+
+def test_is_locked(tmp_path):
+    assert not is_locked(tmp_path)
+    with open(tmp_path / "lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        assert is_locked(tmp_path)
+    assert not is_locked(tmp_path)
+
+
+@pytest.mark.parametrize(
+    "redis_locked, cache_locked",
+    [
+        pytest.param(True, False, id="branch synced by another worker"),
+        pytest.param(False, True, id="repositories used by another task"),
+    ],
+)
+def test_update_source_git_busy(tmp_path, monkeypatch, redis_locked, cache_locked):
+    source_git_url = "https://gitlab.com/redhat/centos-stream/src/make"
+    monkeypatch.setattr(distgit, "SOURCE_GIT_SYNC_DIR", tmp_path)
+    monkeypatch.setattr(
+        distgit,
+        "DIST_GIT_REPO_PATTERN",
+        "https://gitlab.com/redhat/centos-stream/rpms/(?P<package>.+)",
+    )
+    monkeypatch.setattr(
+        distgit,
+        "SOURCE_GIT_URL_TEMPLATE",
+        "https://gitlab.com/redhat/centos-stream/src/{package}",
+    )
+    lock = flexmock(acquire=lambda blocking_timeout: not redis_locked)
+    lock.should_receive("release").times(int(not redis_locked))
+    flexmock(distgit).should_receive("get_redis").and_return(
+        flexmock(lock=lambda name, timeout: lock)
+    )
+    cache_dir = tmp_path / sha256(source_git_url.encode()).hexdigest()[:16]
+    cache_dir.mkdir()
+    mock_handler = flexmock(
+        dist_git_project_url="https://gitlab.com/redhat/centos-stream/rpms/make",
+        branch="c9s",
+        lock_timeout=3600,
+        lock_wait=10,
+        busy_retry_in=60,
+        get_source_git_url=UpdateSourceGitHandler.get_source_git_url,
+    )
+    mock_handler.should_receive("update_source_git").never()
+
+    with open(cache_dir / "lock", "w") as cache_lock:
+        if cache_locked:
+            fcntl.flock(cache_lock, fcntl.LOCK_EX)
+        with pytest.raises(HandlerBusyError) as ex:
+            UpdateSourceGitHandler.run(mock_handler)
+    assert ex.value.retry_in == 60
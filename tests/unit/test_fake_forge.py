@@ -0,0 +1,171 @@
+# Copyright Contributors to the Packit project.
+# SPDX-License-Identifier: MIT
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+from ogr.abstract import CommitStatus
+from ogr.services.gitlab import GitlabService
+from ogr.services.pagure import PagureService
+
+from tests.fake_forge import CREATED_TIMESTAMP, ForgeBehaviour
+
+
+def call(forge, path, data=None, token="token"):
+    request = Request(
+        f"{forge.url}{path}",
+        data=data.encode() if data else None,
+        headers={"PRIVATE-TOKEN": token},
+    )
+    try:
+        with urlopen(request) as response:
+            return response.status, json.loads(response.read())
+    except HTTPError as ex:
+        return ex.code, dict(ex.headers)
+
+
+@pytest.fixture()
+def project(fake_forge):
+    project = fake_forge.add_project(
+        "packit-service/src", "open-vm-tools", branches=["c9s", "rawhide"]
+    )
+    fake_forge.add_pull_request(
+        "packit-service/src", "open-vm-tools", "Yet another testing MR", id=5
+    )
+    return project
+
+
+def test_gitlab_api(fake_forge, project):
+    gl_project = "/api/v4/projects/packit-service%2Fsrc%2Fopen-vm-tools"
+
+    assert call(fake_forge, f"{gl_project}/repository/branches") == (
+        200,
+        [{"name": "c9s"}, {"name": "rawhide"}],
+    )
+    status, mr = call(fake_forge, f"{gl_project}/merge_requests/5")
+    assert status == 200
+    assert mr["title"] == "Yet another testing MR"
+
+    assert call(fake_forge, f"{gl_project}/merge_requests/5/notes", "body=Hi")[0] == 201
+    sha = project.pull_requests[5].head_commit
+    assert (
+        call(fake_forge, f"{gl_project}/statuses/{sha}", "state=success&name=CI")[0]
+        == 201
+    )
+
+    assert [(c["id"], c["body"]) for c in project.pull_requests[5].comments] == [
+        (1, "Hi")
+    ]
+    assert project.statuses[sha][0]["status"] == "success"
+    assert call(fake_forge, f"{gl_project}/merge_requests/6")[0] == 404
+
+
+def test_pagure_api(fake_forge, project):
+    pg_pr = "/api/0/packit-service/src/open-vm-tools/pull-request/5"
+
+    assert call(fake_forge, pg_pr)[1]["status"] == "Open"
+    assert call(fake_forge, f"{pg_pr}/comment", "comment=Hi")[0] == 200
+    assert call(fake_forge, f"{pg_pr}/flag", "username=Zuul&status=pending")[0] == 200
+    assert call(fake_forge, f"{pg_pr}/flag", "username=Zuul&status=success")[0] == 200
+
+    assert call(fake_forge, f"{pg_pr}/flag")[1]["flags"] == [
+        {
+            "username": "Zuul",
+            "comment": None,
+            "status": "success",
+            "url": None,
+            "uid": "Zuul",
+            "commit_hash": project.pull_requests[5].head_commit,
+            "date_created": CREATED_TIMESTAMP,
+            "date_updated": CREATED_TIMESTAMP,
+        }
+    ]
+
+
+def test_ogr_gitlab(fake_forge, project):
+    service = GitlabService(token="token", instance_url=fake_forge.url)
+    gl_project = service.get_project(
+        namespace="packit-service/src", repo="open-vm-tools"
+    )
+    sha = project.pull_requests[5].head_commit
+
+    assert gl_project.get_branches() == ["c9s", "rawhide"]
+    pr = gl_project.get_pr(5)
+    assert pr.title == "Yet another testing MR"
+    assert pr.head_commit == sha
+    pr.comment("Hi")
+    # what StatusReporterGitlab does, falling back to a commit comment
+    gl_project.set_commit_status(
+        sha, CommitStatus.success, "https://ci", "Passed", "Dist-git MR CI Pipeline"
+    )
+    gl_project.commit_comment(sha, "Dist-git MR CI Pipeline passed")
+    created = gl_project.create_pr("New MR", "Body", "c9s", "feature")
+
+    assert [s.state for s in gl_project.get_commit_statuses(sha)] == [
+        CommitStatus.success
+    ]
+    assert project.commit_comments[sha][0]["note"] == "Dist-git MR CI Pipeline passed"
+    assert project.pull_requests[5].comments[0]["body"] == "Hi"
+    assert [pr.id for pr in gl_project.get_pr_list()] == [5, created.id]
+    assert fake_forge.route_stats["_gitlab_commit"] >= 2
+
+
+def test_ogr_pagure(fake_forge, project):
+    service = PagureService(token="token", instance_url=fake_forge.url)
+    pg_project = service.get_project(
+        namespace="packit-service/src", repo="open-vm-tools"
+    )
+    sha = project.pull_requests[5].head_commit
+
+    assert pg_project.get_branches() == ["c9s", "rawhide"]
+    pr = pg_project.get_pr(5)
+    assert pr.title == "Yet another testing MR"
+    pr.comment("Hi")
+    pr.set_flag("Zuul", "Jobs result is success", "https://ci", CommitStatus.success)
+    pg_project.set_commit_status(
+        sha, CommitStatus.pending, "https://ci", "Running", "CI"
+    )
+
+    assert [(f.context, f.state) for f in pg_project.get_commit_statuses(sha)] == [
+        ("CI", CommitStatus.pending)
+    ]
+    assert project.pull_requests[5].flags[0]["status"] == "success"
+    assert [pr.id for pr in pg_project.get_pr_list()] == [5]
+
+
+def test_rate_limit(fake_forge, project):
+    fake_forge.behaviour.rate_limit = 2
+    path = "/api/0/packit-service/src/open-vm-tools/git/branches"
+
+    assert call(fake_forge, path)[0] == 200
+    assert call(fake_forge, path)[0] == 200
+    status, headers = call(fake_forge, path)
+    assert status == 429
+    assert headers["RateLimit-Remaining"] == "0"
+    # limits are per token
+    assert call(fake_forge, path, token="another")[0] == 200
+    assert fake_forge.stats["rate_limited"] == 1
+
+
+def test_error_injection(fake_forge, project):
+    fake_forge.fail_next(2, status=502)
+    path = "/api/0/packit-service/src/open-vm-tools/git/branches"
+
+    assert [call(fake_forge, path)[0] for _ in range(3)] == [502, 502, 200]
+    assert fake_forge.stats["errors_injected"] == 2
+
+
+def test_latency_is_concurrent(fake_forge, project):
+    fake_forge.behaviour = ForgeBehaviour(latency=0.2)
+    path = "/api/0/packit-service/src/open-vm-tools/git/branches"
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        statuses = list(executor.map(lambda _: call(fake_forge, path)[0], range(5)))
+
+    assert statuses == [200] * 5
+    assert 0.2 <= time.monotonic() - start < 1
@@ -0,0 +1,61 @@
+# Copyright Contributors to the Packit project.
+# SPDX-License-Identifier: MIT
+
+import pytest
+from flexmock import flexmock
+
+from hardly import payload
+from hardly.payload import (
+    get_digest,
+    load_package_config_ref,
+    slim_event,
+    store_package_config,
+)
+from packit.exceptions import PackitException
+
+
+def test_slim_event():
+    event = {
+        "event_type": "MergeRequestGitlabEvent",
+        "project_url": "https://gitlab.com/packit-service/src/open-vm-tools",
+        "identifier": "5",
+        "title": "Yet another testing MR",
+        "description": "A long description" * 1000,
+        "commit_sha": "bf9701dea5a167caa7a1afa0759342aa0bf0d8fd",
+    }
+    assert slim_event(event, ("title", "url")) == {
+        "event_type": "MergeRequestGitlabEvent",
+        "project_url": "https://gitlab.com/packit-service/src/open-vm-tools",
+        "identifier": "5",
+        "title": "Yet another testing MR",
+        "commit_sha": "bf9701dea5a167caa7a1afa0759342aa0bf0d8fd",
+    }
+
+
+def test_get_digest():
+    assert get_digest({"a": 1, "b": 2}) == get_digest({"b": 2, "a": 1})
+    assert get_digest({"a": 1}) != get_digest({"a": 2})
+
+
+def test_package_config_ref():
+    stored = {}
+    redis = flexmock(
+        set=lambda key, value, ex: stored.update({key: value}),
+        get=stored.get,
+        expire=lambda key, ttl: None,
+    )
+    flexmock(payload).should_receive("get_redis").and_return(redis)
+    package_config = {"downstream_package_name": "open-vm-tools"}
+
+    ref = store_package_config(package_config)
+
+    assert ref == {"digest": get_digest(package_config)}
+    assert load_package_config_ref(ref) == package_config
+    # passed as it is
+    assert load_package_config_ref(package_config) == package_config
+    assert store_package_config(None) is None
+    assert load_package_config_ref(None) is None
+
+    stored.clear()
+    with pytest.raises(PackitException):
+        load_package_config_ref(ref)
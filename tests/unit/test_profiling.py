@@ -0,0 +1,73 @@
+# Copyright Contributors to the Packit project.
+# SPDX-License-Identifier: MIT
+
+import os
+import pstats
+import time
+from threading import Thread
+
+import pytest
+
+from hardly import profiling
+from hardly.payload import get_digest
+from hardly.profiling import profiled
+
+EVENT = {"event_type": "PipelineGitlabEvent", "project_url": "https://a/rpms/b"}
+
+
+@pytest.fixture()
+def profile_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", tmp_path)
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLING_INTERVAL", 0.001)
+    return tmp_path
+
+
+def slow_git_call():
+    time.sleep(0.1)
+
+
+def test_profiling_disabled(profile_dir):
+    with profiled("task.run_sync_from_gitlab_mr_handler", EVENT):
+        slow_git_call()
+    assert not list(profile_dir.iterdir())
+
+
+def test_sampled(profile_dir, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_SAMPLE_RATE", 1)
+    with profiled("task.run_sync_from_gitlab_mr_handler", EVENT):
+        slow_git_call()
+
+    (path,) = profile_dir.iterdir()
+    assert path.name.endswith(
+        f"-task.run_sync_from_gitlab_mr_handler-{get_digest(EVENT)[:16]}.pstats"
+    )
+    assert any(
+        function == "slow_git_call" for _, _, function in pstats.Stats(str(path)).stats
+    )
+
+
+@pytest.mark.parametrize("threshold, saved", [(0.05, True), (10, False)])
+def test_slow(profile_dir, monkeypatch, threshold, saved):
+    monkeypatch.setattr(profiling, "PROFILE_LATENCY_THRESHOLD", threshold)
+    with profiled("task.run_dist_git_pr_handler", EVENT):
+        # threads started by the task are sampled too
+        thread = Thread(target=slow_git_call)
+        thread.start()
+        thread.join()
+
+    paths = list(profile_dir.glob("*.collapsed"))
+    assert bool(paths) == saved
+    if saved:
+        assert "test_profiling.py:slow_git_call" in paths[0].read_text()
+
+
+def test_prune(profile_dir, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_MAX_FILES", 2)
+    for number in range(4):
+        (profile_dir / f"{number}.pstats").write_text("")
+        os.utime(profile_dir / f"{number}.pstats", (number, number))
+    profiling.prune_profiles()
+    assert sorted(path.name for path in profile_dir.iterdir()) == [
+        "2.pstats",
+        "3.pstats",
+    ]
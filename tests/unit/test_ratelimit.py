@@ -0,0 +1,89 @@
+# Copyright Contributors to the Packit project.
+# SPDX-License-Identifier: MIT
+
+import pytest
+from flexmock import flexmock
+from requests import Session
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+from hardly import ratelimit
+from hardly.ratelimit import (
+    LazyAuthGitlab,
+    RateLimitedAdapter,
+    TokenBucket,
+    install_rate_limiters,
+    mount_rate_limited_adapter,
+)
+from ogr.services.gitlab import GitlabService
+
+
+@pytest.mark.parametrize("wait", [0.0, 0.25])
+def test_token_bucket_acquire(wait):
+    bucket = TokenBucket("gitlab.com", "secret", rate=5, burst=50)
+    assert bucket.key.startswith("hardly:rate-limit:gitlab.com:")
+    assert "secret" not in bucket.key
+
+    calls = []
+
+    def take_token(keys, args):
+        calls.append((keys, args))
+        return str(wait)
+
+    flexmock(ratelimit).should_receive("get_take_token_script").and_return(take_token)
+    flexmock(ratelimit.time).should_receive("sleep").with_args(wait).times(
+        int(wait > 0)
+    )
+
+    assert bucket.acquire() == wait
+    assert calls == [([bucket.key], [5, 50])]
+
+
+@pytest.mark.parametrize(
+    "limits, limited",
+    [({}, False), ({"gitlab.com": {"rate": 5, "burst": 50}}, True)],
+)
+def test_mount_rate_limited_adapter(monkeypatch, limits, limited):
+    monkeypatch.setattr(ratelimit, "FORGE_RATE_LIMITS", limits)
+    retries = Retry(total=5)
+    session = Session()
+    session.mount("https://", HTTPAdapter(max_retries=retries))
+
+    mount_rate_limited_adapter(session, "https://gitlab.com", "secret")
+
+    adapter = session.get_adapter("https://gitlab.com/api/v4/projects")
+    assert isinstance(adapter, RateLimitedAdapter)
+    assert adapter.max_retries is retries
+    assert bool(adapter.bucket) == limited
+    assert not isinstance(
+        session.get_adapter("https://src.fedoraproject.org/api/0"),
+        RateLimitedAdapter,
+    )
+
+
+def test_install_rate_limiters():
+    service = GitlabService(token="secret", instance_url="https://gitlab.com")
+    flexmock(LazyAuthGitlab).should_receive("auth").never()
+
+    install_rate_limiters(flexmock(services=[service]))
+    adapter = service.gitlab_instance.session.get_adapter("https://gitlab.com/api/v4")
+    assert isinstance(adapter, RateLimitedAdapter)
+    # already installed
+    install_rate_limiters(flexmock(services=[service]))
+    assert (
+        service.gitlab_instance.session.get_adapter("https://gitlab.com/api/v4")
+        is adapter
+    )
+
+
+def test_lazy_auth_gitlab():
+    client = LazyAuthGitlab(url="https://gitlab.com", private_token="secret")
+    user = flexmock(username="packit")
+
+    def auth():
+        client.user = user
+
+    flexmock(client).should_receive("auth").replace_with(auth).once()
+
+    assert client.user is user
+    assert client.user is user
@@ -0,0 +1,106 @@
+# Copyright Contributors to the Packit project.
+# SPDX-License-Identifier: MIT
+
+import pytest
+from flexmock import flexmock
+
+from hardly import scheduling
+from hardly.handlers.abstract import TaskName
+from hardly.jobs import StreamJobs
+from hardly.scheduling import FairShare, get_priority
+from packit_service.worker.events import PipelineGitlabEvent
+from packit_service.worker.events.enums import GitlabEventAction
+from packit_service.worker.reporting import BaseCommitStatus
+
+
+@pytest.mark.parametrize(
+    "task_name, action, ci_state, priority",
+    [
+        pytest.param(
+            TaskName.dist_git_pr,
+            GitlabEventAction.opened.value,
+            None,
+            0,
+            id="opened MR",
+        ),
+        pytest.param(
+            TaskName.dist_git_pr,
+            GitlabEventAction.reopen.value,
+            None,
+            0,
+            id="reopened MR",
+        ),
+        pytest.param(
+            TaskName.dist_git_pr,
+            GitlabEventAction.update.value,
+            None,
+            2,
+            id="updated MR",
+        ),
+        pytest.param(
+            TaskName.sync_from_gitlab_mr,
+            None,
+            BaseCommitStatus.success,
+            5,
+            id="final state",
+        ),
+        pytest.param(
+            TaskName.sync_from_gitlab_mr,
+            None,
+            BaseCommitStatus.running,
+            6,
+            id="intermediate state",
+        ),
+        pytest.param(TaskName.reconcile_dist_git_statuses, None, None, 8, id="other"),
+    ],
+)
+def test_get_priority(task_name, action, ci_state, priority):
+    assert get_priority(task_name, action=action, ci_state=ci_state) == priority
+
+
+@pytest.mark.parametrize(
+    "penalty, priority",
+    [(0, 6), (2, 8), (5, 9)],
+)
+def test_get_priority_fair_share(penalty, priority):
+    flexmock(FairShare).should_receive("penalty").and_return(penalty)
+    assert (
+        get_priority(
+            TaskName.sync_from_gitlab_mr,
+            project_url="https://gitlab.com/redhat/centos-stream/rpms/make",
+        )
+        == priority
+    )
+
+
+@pytest.mark.parametrize(
+    "count, penalty",
+    [(1, 0), (20, 0), (21, 1), (41, 2), (1000, 3)],
+)
+def test_fair_share_penalty(count, penalty):
+    pipe = flexmock(
+        zremrangebyscore=lambda *args: None,
+        zadd=lambda *args: None,
+        zcard=lambda key: None,
+        expire=lambda key, ttl: None,
+        execute=lambda: [0, 1, count, True],
+    )
+    flexmock(scheduling).should_receive("get_redis").and_return(
+        flexmock(pipeline=lambda: pipe)
+    )
+    assert FairShare("https://gitlab.com/redhat/centos-stream/rpms/make").penalty() == (
+        penalty
+    )
+
+
+@pytest.mark.parametrize(
+    "status, ci_state",
+    [
+        ("success", BaseCommitStatus.success),
+        ("running", BaseCommitStatus.running),
+        ("waiting_for_callback", None),
+    ],
+)
+def test_get_ci_state(status, ci_state):
+    event = flexmock(PipelineGitlabEvent.__new__(PipelineGitlabEvent), status=status)
+    assert StreamJobs.get_ci_state(event) == ci_state
@@ -0,0 +1,79 @@
+# Copyright Contributors to the Packit project.
+# SPDX-License-Identifier: MIT
+
+from datetime import timedelta
+
+import pytest
+from flexmock import flexmock
+
+from hardly.circuit_breaker import CircuitOpenError
+from hardly.constants import MAX_TASK_DEFERRALS
+from hardly.tasks import run_dist_git_sync_handler, summarize_job_results
+
+
+@pytest.mark.parametrize(
+    "result_ttl, result_expires, ttl",
+    [
+        (None, timedelta(days=1), None),
+        (3600, timedelta(days=1), 3600),
+        (7 * 24 * 3600, timedelta(days=1), 24 * 3600),
+        (3600, 600, 600),
+        (3600, None, 3600),
+    ],
+)
+def test_get_result_ttl(monkeypatch, result_ttl, result_expires, ttl):
+    monkeypatch.setattr(run_dist_git_sync_handler, "result_ttl", result_ttl)
+    monkeypatch.setattr(
+        run_dist_git_sync_handler.app.conf, "result_expires", result_expires
+    )
+    assert run_dist_git_sync_handler.get_result_ttl() == ttl
+
+
+def test_summarize_job_results():
+    results = {
+        "dist_git_pr-2022-01-01": {
+            "success": False,
+            "details": {
+                "msg": "Creating dist-git MR for c10s failed.",
+                "branches": {"c10s": {"dist_git_mr": None, "error": "Push failed"}},
+                "checkouts": {"source-git": {"disk_bytes": 123456789}},
+            },
+        }
+    }
+    assert summarize_job_results(results, keep=("branches",)) == {
+        "dist_git_pr-2022-01-01": {
+            "success": False,
+            "details": {
+                "msg": "Creating dist-git MR for c10s failed.",
+                "branches": {"c10s": {"dist_git_mr": None, "error": "Push failed"}},
+            },
+        }
+    }
+
+
+@pytest.mark.parametrize(
+    "deferrals, deferred",
+    [
+        pytest.param(0, True, id="first time"),
+        pytest.param(MAX_TASK_DEFERRALS, False, id="too many times"),
+    ],
+)
+def test_defer(deferrals, deferred):
+    task = run_dist_git_sync_handler
+    task.push_request(
+        args=(),
+        kwargs={"event": {}},
+        delivery_info={"priority": 3},
+        hardly_deferrals=deferrals,
+    )
+    try:
+        flexmock(task).should_receive("apply_async").with_args(
+            args=(),
+            kwargs={"event": {}},
+            countdown=float,
+            priority=3,
+            headers={"hardly_deferrals": deferrals + 1},
+        ).times(int(deferred))
+        assert task.defer(CircuitOpenError("git:gitlab.com", 30)) == deferred
+    finally:
+        task.pop_request()
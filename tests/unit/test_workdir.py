@@ -0,0 +1,54 @@
+# Copyright Contributors to the Packit project.
+# SPDX-License-Identifier: MIT
+
+import os
+import time
+
+from hardly.workdir import WorkDirPool, evict
+
+
+def test_claim(tmp_path):
+    first = WorkDirPool(tmp_path, slots=1)
+    second = WorkDirPool(tmp_path, slots=1)
+
+    assert first.get() == tmp_path / "slot-0"
+    assert first.claim() == tmp_path / "slot-0"
+    assert second.claim() is None
+
+    tmp_dir = second.get()
+    assert tmp_dir.is_dir() and tmp_dir.parent != tmp_path
+    second.release()
+    assert not tmp_dir.exists()
+
+
+def test_enforce_quota(tmp_path):
+    pool = WorkDirPool(tmp_path, slots=1, quota=150)
+    slot = pool.get()
+    for age, name in enumerate(["recent", "old", "oldest"]):
+        (slot / name).mkdir()
+        (slot / name / "file").write_bytes(b"x" * 100)
+        os.utime(slot / name, (1000 - age, 1000 - age))
+
+    pool.release()
+
+    assert [path.name for path in slot.iterdir()] == ["recent"]
+
+
+def test_evict_max_age(tmp_path):
+    for name, used in [("recent", time.time()), ("old", time.time() - 3600)]:
+        (tmp_path / name).mkdir()
+        os.utime(tmp_path / name, (used, used))
+
+    evict(tmp_path, max_age=600)
+
+    assert [path.name for path in tmp_path.iterdir()] == ["recent"]
+
+
+def test_evict_in_use(tmp_path):
+    for name in ["used", "unused"]:
+        (tmp_path / name).mkdir()
+        os.utime(tmp_path / name, (1000, 1000))
+
+    evict(tmp_path, max_age=600, in_use=lambda path: path.name == "used")
+
+    assert [path.name for path in tmp_path.iterdir()] == ["used"]